@@ -0,0 +1,566 @@
+"""
+API JSON sin Streamlit
+Servicio HTTP para clientes móviles y widgets sobre DatabaseManager,
+HabitValidator, MetricsCalculator y ReportGenerator: estado del día, marcar y
+desmarcar, métricas, rachas, perfil, badges y reportes
+
+- Bucle asyncio con HTTP/1.1 keep-alive (solo biblioteca estándar)
+- Las consultas corren en un pool acotado de hilos con conexiones reutilizadas
+  (database.pool); las escrituras se serializan para no competir por el lock de SQLite
+- Cada GET lleva un ETag derivado del último evento del usuario, del cierre
+  diario y de la fecha: con If-None-Match igual se responde 304 sin calcular nada
+
+Rutas:
+    GET    /v1/salud
+    GET    /v1/usuarios/{usuario}/dias/{fecha}
+    POST   /v1/usuarios/{usuario}/dias/{fecha}/habitos/{habito}     (marcar)
+    DELETE /v1/usuarios/{usuario}/dias/{fecha}/habitos/{habito}     (desmarcar)
+    GET    /v1/usuarios/{usuario}/metricas?dias=90&meta=85
+    GET    /v1/usuarios/{usuario}/rachas
+    GET    /v1/usuarios/{usuario}/rachas/{habito}
+    GET    /v1/usuarios/{usuario}/perfil
+    GET    /v1/usuarios/{usuario}/badges
+    GET    /v1/usuarios/{usuario}/reportes/{tipo}?fecha=AAAA-MM-DD
+    POST   /v1/usuarios/{usuario}/sync        {"version": ..., "operaciones": [...]} (database.sync)
+    GET    /v1/usuarios/{usuario}/eventos     (text/event-stream, utils.change_bus)
+
+Las escrituras aceptan el header Idempotency-Key (o {"clave_idempotencia": ...}
+en el cuerpo): los reintentos con la misma clave se aplican una sola vez
+
+/eventos deja la conexión abierta y empuja cada cambio del usuario como un
+evento SSE (habito, badges, perfil). Al reconectar, el cliente se pone al día
+con /sync y su última versión; 'resincronizar' avisa que se perdieron cambios
+
+Sin autenticación: cualquier cliente que llegue al puerto lee y modifica los
+datos de cualquier {usuario}. Por eso escucha solo en 127.0.0.1; exponerlo en
+otra interfaz exige --permitir-remoto y un proxy delante que autentique y
+limite cada cliente a su propio usuario
+
+Uso:
+    python -m api.server --puerto 8080 --hilos 4
+    python -m api.server --db database/tracker.db --host 0.0.0.0 --permitir-remoto
+"""
+
+import argparse
+import asyncio
+import hashlib
+import ipaddress
+import json
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from http import HTTPStatus
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from database.day_closer import DayCloser
+from database.pool import PooledDatabaseManager
+from database.sync import DeltaSync
+from utils.badge_engine import BadgeEngine
+from utils.change_bus import ChangeBus
+from utils.gamification import GamificationSystem
+from utils.metrics import MetricsCalculator
+from utils.reports import ReportGenerator
+from utils.validators import HabitValidator
+
+# Cuerpo máximo aceptado en POST/DELETE (un lote de sincronización de semanas sin conexión)
+MAX_CUERPO = 512 * 1024
+
+# Trabajos en vuelo por hilo del pool antes de dejar de leer nuevas peticiones
+EN_VUELO_POR_HILO = 8
+
+# Cuerpos ya serializados por ETag: el segundo dispositivo del mismo usuario
+# (teléfono y widget) recibe un 200 sin recalcular
+CUERPOS_EN_CACHE = 4096
+
+TIPOS_REPORTE = ('diario', 'semanal', 'mensual', 'trimestral', 'semestral', 'anual')
+
+# Cambios encolados por conexión SSE antes de descartarlos y pedir resincronizar
+COLA_EVENTOS = 256
+
+# Comentario SSE periódico: mantiene vivos los proxies y detecta clientes que se fueron
+LATIDO_SEGUNDOS = 15
+
+_USUARIO = r"(?P<usuario>[\w.@-]{1,64})"
+_FECHA = r"(?P<fecha>\d{4}-\d{2}-\d{2})"
+_HABITO = r"(?P<habito>[\w-]{1,64})"
+
+# (métodos, patrón, nombre del manejador)
+RUTAS = [
+    (('GET',), r"/v1/salud", 'salud'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/dias/{_FECHA}", 'dia'),
+    (('POST', 'DELETE'), rf"/v1/usuarios/{_USUARIO}/dias/{_FECHA}/habitos/{_HABITO}", 'toggle'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/metricas", 'metricas'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/rachas", 'rachas'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/rachas/{_HABITO}", 'racha'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/perfil", 'perfil'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/badges", 'badges'),
+    (('GET',), rf"/v1/usuarios/{_USUARIO}/reportes/(?P<tipo>\w+)", 'reporte'),
+    (('POST',), rf"/v1/usuarios/{_USUARIO}/sync", 'sincronizar'),
+]
+_RUTAS = [(metodos, re.compile(patron), nombre) for metodos, patron, nombre in RUTAS]
+_EVENTOS = re.compile(rf"/v1/usuarios/{_USUARIO}/eventos")
+
+
+class ErrorAPI(Exception):
+    """Error con código HTTP que se responde como {"error": mensaje}"""
+
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+def _a_json(valor):
+    """Tipos que devuelven los reportes (numpy, pandas, fechas) en JSON"""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if hasattr(valor, 'item'):
+        return valor.item()
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    return str(valor)
+
+
+def _a_bytes(cuerpo: Dict) -> bytes:
+    return json.dumps(cuerpo, ensure_ascii=False, default=_a_json).encode("utf-8")
+
+
+def _fecha(texto: str) -> date:
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise ErrorAPI(400, f"Fecha inválida: {texto}")
+
+
+def _entero(consulta: Dict, nombre: str, default: int, minimo: int, maximo: int) -> int:
+    try:
+        valor = int(consulta.get(nombre, default))
+    except ValueError:
+        raise ErrorAPI(400, f"'{nombre}' debe ser un entero")
+    if not minimo <= valor <= maximo:
+        raise ErrorAPI(400, f"'{nombre}' debe estar entre {minimo} y {maximo}")
+    return valor
+
+
+class TrackerAPI:
+    """
+    Manejadores síncronos de las rutas (corren en los hilos del pool). Cada
+    uno recibe los parámetros de la ruta y la query string y retorna un dict
+    """
+
+    def __init__(self, db: PooledDatabaseManager, config: Dict):
+        self.db = db
+        self.config = config
+        self.validador = HabitValidator(config)
+        self.habitos = {h['id']: (bloque['id'], h['puntos'])
+                        for bloque in config['bloques'] for h in bloque['habitos']}
+        self.max_puntos = sum(puntos for _, puntos in self.habitos.values() if puntos > 0)
+        # El bus se suscribe antes que el motor: el badge llega después del hábito que lo desbloqueó
+        self.bus = ChangeBus(db)
+        self.motor_badges = BadgeEngine(db)
+        self.sync = DeltaSync(db, config)
+        self._escritura = threading.Lock()
+        self._cerrado_el: Optional[date] = None
+        self._cuerpos: OrderedDict = OrderedDict()
+        self._lock_cuerpos = threading.Lock()
+
+    # ========================
+    # VERSIONES (ETag)
+    # ========================
+
+    def cerrar_dias(self, hoy: date):
+        """Cierre diario (idempotente) la primera vez que se atiende cada fecha"""
+        with self._escritura:
+            if self._cerrado_el != hoy:
+                DayCloser(self.db).cerrar(hoy)
+                self._cerrado_el = hoy
+
+    def version(self, usuario_id: str) -> Tuple:
+        """
+        Todo lo que exponen los GET de un usuario cambia con un evento suyo
+        (marcar, desmarcar, importación) o con el cierre diario; los cálculos
+        relativos a hoy cambian además con la fecha
+        """
+        conn = self.db._get_connection()
+        try:
+            row = conn.execute("""
+                SELECT (SELECT MAX(id) FROM eventos WHERE usuario_id = ?),
+                       (SELECT cerrado_hasta FROM cierre_dia WHERE id = 1)
+            """, (usuario_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] or 0, row[1], date.today().isoformat()
+
+    def etag(self, destino: str, usuario_id: str) -> str:
+        clave = f"{destino}|{self.version(usuario_id)}".encode("utf-8")
+        return f'W/"{hashlib.blake2b(clave, digest_size=12).hexdigest()}"'
+
+    # ========================
+    # MANEJADORES
+    # ========================
+
+    def _gestor(self, usuario: str):
+        return self.db.para_usuario(usuario)
+
+    def _habito(self, habito: str) -> Tuple[str, int]:
+        if habito not in self.habitos:
+            raise ErrorAPI(404, f"Hábito desconocido: {habito}")
+        return self.habitos[habito]
+
+    def salud(self, consulta: Dict) -> Dict:
+        return {'ok': True, 'conexiones': self.db.pool.abiertas}
+
+    def dia(self, consulta: Dict, usuario: str, fecha: str) -> Dict:
+        gestor, dia = self._gestor(usuario), _fecha(fecha)
+        completados = gestor.obtener_habitos_dia(dia)
+        return {
+            'fecha': dia.isoformat(),
+            'completados': completados,
+            'bloqueados': self.validador.obtener_habitos_bloqueados(completados),
+            'metricas': gestor.obtener_metricas_dia(dia),
+            'max_puntos': self.max_puntos
+        }
+
+    def toggle(self, consulta: Dict, metodo: str, cabeceras: Dict, cuerpo: bytes,
+               usuario: str, fecha: str, habito: str) -> Dict:
+        gestor, dia = self._gestor(usuario), _fecha(fecha)
+        bloque_id, puntos = self._habito(habito)
+        clave_idempotencia = cabeceras.get('idempotency-key') or self._json_del_cuerpo(cuerpo).get('clave_idempotencia')
+        clave_idempotencia = str(clave_idempotencia) if clave_idempotencia else None
+        with self._escritura:
+            completados = gestor.obtener_habitos_dia(dia)
+            if metodo == 'POST':
+                permitido, mensaje = self.validador.puede_marcar_habito(habito, completados)
+                if not permitido:
+                    raise ErrorAPI(409, mensaje)
+                ok = gestor.marcar_habito(dia, habito, bloque_id, puntos, max_puntos=self.max_puntos,
+                                          clave_idempotencia=clave_idempotencia)
+            else:
+                permitido, mensaje = self.validador.validar_desmarcar_habito(habito, completados)
+                if not permitido:
+                    raise ErrorAPI(409, mensaje)
+                ok = gestor.desmarcar_habito(dia, habito, max_puntos=self.max_puntos,
+                                             clave_idempotencia=clave_idempotencia)
+        if not ok:
+            raise ErrorAPI(500, "No se pudo guardar el cambio")
+        return {**self.dia(consulta, usuario, fecha), 'mensaje': mensaje or None}
+
+    def sincronizar(self, consulta: Dict, metodo: str, cabeceras: Dict, cuerpo: bytes, usuario: str) -> Dict:
+        datos = self._json_del_cuerpo(cuerpo)
+        operaciones = datos.get('operaciones', [])
+        if not isinstance(operaciones, list):
+            raise ErrorAPI(400, "'operaciones' debe ser una lista")
+        try:
+            with self._escritura:
+                delta = self.sync.sincronizar(usuario, operaciones, datos.get('version'))
+        except ValueError as e:
+            raise ErrorAPI(413, str(e))
+        if delta is None:
+            raise ErrorAPI(500, "No se pudo guardar el lote")
+        return delta
+
+    def metricas(self, consulta: Dict, usuario: str) -> Dict:
+        dias = _entero(consulta, 'dias', 90, 1, 3660)
+        meta = _entero(consulta, 'meta', 85, 1, 100)
+        historico = self._gestor(usuario).obtener_historico(dias=dias)
+        return {
+            'dias': dias,
+            'semana': MetricsCalculator.calcular_porcentaje_semanal(historico, meta),
+            'racha_perfecta': MetricsCalculator.calcular_racha_perfecta(historico, meta),
+            'tendencia': MetricsCalculator.analizar_tendencia(historico),
+            'estadisticas': MetricsCalculator.calcular_estadisticas_generales(historico),
+            'prediccion': MetricsCalculator.predecir_cumplimiento_semanal(historico, meta),
+            'historico': historico
+        }
+
+    def rachas(self, consulta: Dict, usuario: str) -> Dict:
+        gestor = self._gestor(usuario)
+        return {habito: gestor.obtener_racha_habito(habito) for habito in self.habitos}
+
+    def racha(self, consulta: Dict, usuario: str, habito: str) -> Dict:
+        self._habito(habito)
+        return {'habito': habito, **self._gestor(usuario).obtener_racha_habito(habito)}
+
+    def perfil(self, consulta: Dict, usuario: str) -> Dict:
+        perfil = self._gestor(usuario).obtener_perfil()
+        return {**perfil, 'nivel': GamificationSystem.calcular_progreso_nivel(perfil.get('puntos_totales', 0))}
+
+    def badges(self, consulta: Dict, usuario: str) -> Dict:
+        return {'badges': self.motor_badges.badges_usuario(usuario)}
+
+    def reporte(self, consulta: Dict, usuario: str, tipo: str) -> Dict:
+        if tipo not in TIPOS_REPORTE:
+            raise ErrorAPI(404, f"Tipo de reporte desconocido: {tipo} ({', '.join(TIPOS_REPORTE)})")
+        gestor = self._gestor(usuario)
+        dia = _fecha(consulta['fecha']) if 'fecha' in consulta else date.today()
+        if tipo == 'diario':
+            return ReportGenerator.generar_reporte_diario(gestor, dia)
+        if tipo == 'semanal':
+            return ReportGenerator.generar_reporte_semanal(gestor, dia)
+        if tipo == 'mensual':
+            return ReportGenerator.generar_reporte_mensual(gestor, dia.year, dia.month)
+        if tipo == 'trimestral':
+            return ReportGenerator.generar_reporte_trimestral(gestor, dia.year, (dia.month - 1) // 3 + 1)
+        if tipo == 'semestral':
+            return ReportGenerator.generar_reporte_semestral(gestor, dia.year, 1 if dia.month <= 6 else 2)
+        return ReportGenerator.generar_reporte_anual(gestor, dia.year)
+
+    # ========================
+    # DESPACHO
+    # ========================
+
+    def atender(self, metodo: str, destino: str, cabeceras: Dict, cuerpo: bytes) -> Tuple[int, Dict, Optional[bytes]]:
+        """
+        Resuelve una petición completa (en un hilo del pool)
+
+        Returns:
+            (estado, cabeceras extra, cuerpo JSON serializado o None)
+        """
+        partes = urlsplit(destino)
+        ruta = unquote(partes.path)
+        consulta = dict(parse_qsl(partes.query))
+        permitidos = []
+        for metodos, patron, nombre in _RUTAS:
+            encontrada = patron.fullmatch(ruta)
+            if encontrada is None:
+                continue
+            if metodo not in metodos:
+                permitidos += metodos
+                continue
+            parametros = encontrada.groupdict()
+            try:
+                if metodo == 'GET':
+                    return self._get(getattr(self, nombre), destino, cabeceras, consulta, parametros)
+                return 200, {}, _a_bytes(getattr(self, nombre)(consulta, metodo, cabeceras, cuerpo, **parametros))
+            except ErrorAPI as e:
+                return e.estado, {}, _a_bytes({'error': e.mensaje})
+        if permitidos:
+            return 405, {'Allow': ", ".join(permitidos)}, _a_bytes({'error': f"Método no permitido: {metodo}"})
+        return 404, {}, _a_bytes({'error': f"Ruta desconocida: {ruta}"})
+
+    def _get(self, manejador: Callable, destino: str, cabeceras: Dict, consulta: Dict,
+             parametros: Dict) -> Tuple[int, Dict, Optional[bytes]]:
+        if 'usuario' not in parametros:
+            return 200, {'Cache-Control': 'no-store'}, _a_bytes(manejador(consulta, **parametros))
+        # La versión se lee antes del cuerpo: si una escritura se cuela entre ambos
+        # el ETag queda viejo y la siguiente petición recalcula (nunca al revés)
+        etag = self.etag(destino, parametros['usuario'])
+        encabezados = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in (e.strip() for e in cabeceras.get('if-none-match', '').split(',')):
+            return 304, encabezados, None
+        with self._lock_cuerpos:
+            datos = self._cuerpos.get(etag)
+            if datos is not None:
+                self._cuerpos.move_to_end(etag)
+        if datos is None:
+            datos = _a_bytes(manejador(consulta, **parametros))
+            with self._lock_cuerpos:
+                self._cuerpos[etag] = datos
+                if len(self._cuerpos) > CUERPOS_EN_CACHE:
+                    self._cuerpos.popitem(last=False)
+        return 200, encabezados, datos
+
+    @staticmethod
+    def _json_del_cuerpo(cuerpo: bytes) -> Dict:
+        if not cuerpo:
+            return {}
+        try:
+            datos = json.loads(cuerpo)
+        except ValueError:
+            raise ErrorAPI(400, "El cuerpo no es JSON válido")
+        if not isinstance(datos, dict):
+            raise ErrorAPI(400, "El cuerpo debe ser un objeto JSON")
+        return datos
+
+
+# ========================
+# HTTP
+# ========================
+
+def _respuesta(estado: int, cabeceras: Dict, cuerpo: Optional[bytes], mantener: bool) -> bytes:
+    datos = cuerpo or b""
+    lineas = [f"HTTP/1.1 {estado} {HTTPStatus(estado).phrase}"]
+    if cuerpo is not None:
+        lineas.append("Content-Type: application/json; charset=utf-8")
+    if estado != 304:
+        lineas.append(f"Content-Length: {len(datos)}")
+    lineas += [f"{nombre}: {valor}" for nombre, valor in cabeceras.items()]
+    lineas.append("Connection: keep-alive" if mantener else "Connection: close")
+    return ("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + datos
+
+
+class ServidorAPI:
+    """Conexiones HTTP/1.1 en asyncio; cada petición se resuelve en el pool de hilos"""
+
+    def __init__(self, api: TrackerAPI, hilos: int = 4):
+        self.api = api
+        self.hilos = hilos
+        self.executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="atomic-api")
+        self.atendidas = 0
+        self._cupos: Optional[asyncio.Semaphore] = None
+
+    async def _resolver(self, metodo: str, destino: str, cabeceras: Dict, cuerpo: bytes):
+        loop = asyncio.get_running_loop()
+        hoy = date.today()
+        if self.api._cerrado_el != hoy:
+            await loop.run_in_executor(self.executor, self.api.cerrar_dias, hoy)
+        async with self._cupos:
+            try:
+                return await loop.run_in_executor(self.executor, self.api.atender, metodo, destino, cabeceras, cuerpo)
+            except Exception as e:
+                print(f"Error atendiendo {metodo} {destino}: {e}")
+                return 500, {}, _a_bytes({'error': "Error interno"})
+
+    async def _transmitir(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, usuario: str):
+        """Conexión SSE: empuja los deltas del usuario hasta que el cliente se va"""
+        loop = asyncio.get_running_loop()
+        cola: asyncio.Queue = asyncio.Queue(maxsize=COLA_EVENTOS)
+
+        def encolar(delta: Dict):
+            try:
+                cola.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Cliente lento: mejor una relectura que una cola sin límite
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait({'tipo': 'resincronizar', 'usuario_id': usuario})
+
+        suscripcion = self.api.bus.suscribir(usuario, lambda delta: loop.call_soon_threadsafe(encolar, delta))
+        # El cliente no manda nada más: fin de lectura es que se fue (sin esperar al latido)
+        cerrada = asyncio.ensure_future(reader.read(1))
+        try:
+            writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                          "Cache-Control: no-store\r\nConnection: close\r\n\r\n"
+                          "retry: 3000\n\n").encode("latin-1"))
+            await writer.drain()
+            while not cerrada.done():
+                siguiente = asyncio.ensure_future(cola.get())
+                await asyncio.wait({siguiente, cerrada}, timeout=LATIDO_SEGUNDOS,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if siguiente.done():
+                    delta = siguiente.result()
+                    writer.write(b"event: " + delta['tipo'].encode() + b"\ndata: " + _a_bytes(delta) + b"\n\n")
+                else:
+                    siguiente.cancel()
+                    if cerrada.done():
+                        break
+                    writer.write(b": latido\n\n")
+                await writer.drain()
+        finally:
+            cerrada.cancel()
+            suscripcion.cancelar()
+
+    async def _conexion(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    cabecera = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(_respuesta(431, {}, _a_bytes({'error': "Cabeceras demasiado grandes"}), False))
+                    break
+                lineas = cabecera.decode("latin-1").split("\r\n")
+                try:
+                    metodo, destino, version = lineas[0].split(" ")
+                except ValueError:
+                    writer.write(_respuesta(400, {}, _a_bytes({'error': "Línea de petición inválida"}), False))
+                    break
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    nombre, _, valor = linea.partition(":")
+                    if nombre:
+                        cabeceras[nombre.strip().lower()] = valor.strip()
+                conexion = cabeceras.get('connection', '').lower()
+                mantener = conexion != 'close' if version == "HTTP/1.1" else conexion == 'keep-alive'
+
+                largo = cabeceras.get('content-length', '0')
+                if not largo.isdigit() or int(largo) > MAX_CUERPO:
+                    writer.write(_respuesta(413, {}, _a_bytes({'error': "Cuerpo demasiado grande"}), False))
+                    break
+                cuerpo = await reader.readexactly(int(largo)) if int(largo) else b""
+
+                eventos = _EVENTOS.fullmatch(unquote(urlsplit(destino).path)) if metodo == 'GET' else None
+                if eventos:
+                    await self._transmitir(reader, writer, eventos['usuario'])
+                    break
+
+                estado, extra, datos = await self._resolver(metodo, destino, cabeceras, cuerpo)
+                self.atendidas += 1
+                writer.write(_respuesta(estado, extra, datos, mantener))
+                await writer.drain()
+                if not mantener:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def iniciar(self, host: str, puerto: int) -> asyncio.AbstractServer:
+        self._cupos = asyncio.Semaphore(self.hilos * EN_VUELO_POR_HILO)
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.api.cerrar_dias, date.today())
+        return await asyncio.start_server(self._conexion, host, puerto, backlog=1024)
+
+    async def servir(self, host: str, puerto: int, listo: Callable[[int], None] = None):
+        servidor = await self.iniciar(host, puerto)
+        puerto_real = servidor.sockets[0].getsockname()[1]
+        if listo:
+            listo(puerto_real)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def cerrar(self):
+        self.executor.shutdown(wait=True)
+        self.api.db.cerrar()
+
+
+def crear_servidor(db_path: str = "database/tracker.db", config_path: str = "config/habitos.json",
+                   hilos: int = 4) -> ServidorAPI:
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    db = PooledDatabaseManager(db_path, max_ociosas=4)
+    return ServidorAPI(TrackerAPI(db, config), hilos)
+
+
+def es_loopback(host: str) -> bool:
+    """True si el host solo acepta conexiones de la misma máquina"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz (la API no autentica: default solo local)")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="Aceptar un --host que no sea loopback (detrás de un proxy que autentique)")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--hilos", type=int, default=4, help="Hilos del pool de base de datos")
+    parser.add_argument("--db", default="database/tracker.db")
+    parser.add_argument("--config", default="config/habitos.json")
+    args = parser.parse_args()
+    if not args.permitir_remoto and not es_loopback(args.host):
+        parser.error(f"--host {args.host} expone una API sin autenticación; agregar --permitir-remoto "
+                     "solo si un proxy delante autentica a cada usuario")
+
+    servidor = crear_servidor(args.db, args.config, args.hilos)
+
+    def listo(puerto: int):
+        print(f"API escuchando en http://{args.host}:{puerto}/v1 ({args.hilos} hilos)", flush=True)
+
+    try:
+        asyncio.run(servidor.servir(args.host, args.puerto, listo))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,8 @@ Diseño inspirado en @my_habitts con mejoras para Ingeniería de Sistemas
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+# pandas y plotly se importan en las funciones que dibujan: un worker nuevo no los
+# carga hasta el primer gráfico o reporte con datos (ver benchmarks.bench_startup)
 from datetime import datetime, date, timedelta
 import json
 import os
@@ -16,10 +15,18 @@ import pytz
 
 # Imports locales
 from database.db_manager import DatabaseManager
+from database.backup import BackupManager, SnapshotDatabase
+from database.day_closer import DayCloser
+from database.write_buffer import WriteBuffer
+from database import query_log
 from utils.gamification import GamificationSystem, NIVELES, BADGES
 from utils.validators import HabitValidator
 from utils.metrics import MetricsCalculator
 from utils.reports import ReportGenerator
+from utils.badge_engine import BadgeEngine
+from utils.change_bus import ChangeBus
+from utils.chart_data import ChartData, HORIZONTES
+from utils import profiling, telemetry, tracing
 
 # ===========================
 # CONFIGURACIÓN DE LA PÁGINA
@@ -32,6 +39,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Panel de rendimiento opcional (ATOMIC_PERF=1 o ?perf=1): sin él no se instrumenta nada
+PANEL_PERF = profiling.habilitado(st.query_params)
+profiling.iniciar_rerun(PANEL_PERF)
+
+# Métricas Prometheus opcionales (ATOMIC_METRICS_PORT / ATOMIC_METRICS_FILE)
+METRICAS = telemetry.configuracion_entorno()
+
+# Trazas opcionales de cada interacción, de punta a punta (ATOMIC_TRACE=1 o ?trace=1)
+TRAZAS = tracing.habilitado(st.query_params)
+if TRAZAS:
+    for clase in (DatabaseManager, SnapshotDatabase):
+        tracing.instrumentar_clase(clase, privados=True, db=True)
+    for clase in (HabitValidator, MetricsCalculator, ReportGenerator):
+        tracing.instrumentar_clase(clase)
+tracing.iniciar_rerun(TRAZAS, st.session_state)
+
+# Cada cuántos segundos una sesión revisa los cambios hechos desde otras (en memoria, sin consultar la base)
+INTERVALO_CAMBIOS = 2
+
 # Cargar CSS personalizado
 def load_css():
     css_file = "assets/style.css"
@@ -46,15 +72,91 @@ load_css()
 # ===========================
 
 @st.cache_resource
+def init_metricas():
+    return telemetry.activar(**METRICAS)
+
+@st.cache_resource
+def init_registro_consultas():
+    # Consultas lentas opcionales (ATOMIC_SLOW_QUERY_MS / ATOMIC_SLOW_QUERY_LOG), uno por proceso
+    return query_log.configuracion_entorno()
+
+@st.cache_resource
+@profiling.fallo_cache("init_database")
 def init_database():
     return DatabaseManager()
 
 @st.cache_data(ttl=3600)
+@profiling.fallo_cache("load_config")
 def load_config():
     with open("config/habitos.json", "r", encoding="utf-8") as f:
         return json.load(f)
 
+@st.cache_resource
+@profiling.fallo_cache("init_change_bus")
+def init_change_bus():
+    # Antes que el motor de badges: el badge llega después del hábito que lo desbloqueó
+    return ChangeBus(db)
+
+@st.cache_resource
+@profiling.fallo_cache("init_badge_engine")
+def init_badge_engine():
+    # Se suscribe a las escrituras de db; la reevaluación inicial cubre el histórico previo
+    engine = BadgeEngine(db)
+    engine.reevaluar(db.usuario_id)
+    return engine
+
+@st.cache_resource
+@profiling.fallo_cache("init_write_buffer")
+def init_write_buffer(max_puntos: int):
+    # Compartido por las sesiones: una ráfaga de clics es una transacción, no una por clic
+    return WriteBuffer(db, max_puntos=max_puntos)
+
+@st.cache_resource
+@profiling.fallo_cache("init_chart_data")
+def init_chart_data():
+    # Agregados y series reducidas compartidos por las sesiones, invalidados por versión de datos
+    return ChartData(db)
+
+@st.cache_resource
+@profiling.fallo_cache("init_backup_manager")
+def init_backup_manager():
+    return BackupManager(db)
+
+@st.cache_data(ttl=3600)
+@profiling.fallo_cache("cerrar_dias_pendientes")
+def cerrar_dias_pendientes(hoy: date):
+    # Respaldo del cron: el cierre es idempotente y sin cambios no toca ningún usuario
+    return DayCloser(db).cerrar(hoy)
+
+CACHES_PERF = ["init_database", "load_config", "init_change_bus", "init_badge_engine", "init_write_buffer",
+               "init_chart_data", "init_backup_manager", "cerrar_dias_pendientes"]
+
+SECCIONES_PERF = [
+    "render_sidebar", "render_dashboard", "render_alertas_sistema", "render_kpis_principales",
+    "render_grid_habitos", "render_grafico_tendencia_avanzado", "render_reportes",
+    "render_reporte_diario", "render_reporte_semanal", "render_reporte_mensual",
+    "render_reporte_trimestral", "render_reporte_semestral", "render_reporte_anual"
+]
+
+if METRICAS:
+    init_metricas()
+
+DatabaseManager.registro_consultas = init_registro_consultas()
+
+if PANEL_PERF:
+    for clase in (DatabaseManager, SnapshotDatabase):
+        profiling.instrumentar_clase(clase)
+
+if PANEL_PERF or METRICAS:
+    profiling.instrumentar_cache_metodo(BackupManager, "snapshot_reportes",
+                                        "snapshot_para_reportes", "actualizar_snapshot")
+    profiling.instrumentar_namespace(globals(), caches=CACHES_PERF)
+
 db = init_database()
+change_bus = init_change_bus()
+badge_engine = init_badge_engine()
+chart_data = init_chart_data()
+backup_manager = init_backup_manager()
 config = load_config()
 validator = HabitValidator(config)
 gamification = GamificationSystem()
@@ -66,6 +168,13 @@ if 'fecha_actual' not in st.session_state:
     tz = pytz.timezone('America/Lima')
     st.session_state.fecha_actual = datetime.now(tz).date()
 
+cerrar_dias_pendientes(st.session_state.fecha_actual)
+
+# Cambios de otras sesiones del mismo usuario; antes de leer el día para no perder ninguno.
+# Si la anterior venció (sesión inactiva) pudo perder cambios: la primera revisión relee el día
+if 'cambios' not in st.session_state or not st.session_state.cambios.activa:
+    st.session_state.cambios = change_bus.suscribir(db.usuario_id, releer='cambios' in st.session_state)
+
 if 'habitos_completados' not in st.session_state:
     st.session_state.habitos_completados = db.obtener_habitos_dia(st.session_state.fecha_actual)
 
@@ -85,9 +194,44 @@ def calcular_puntos_maximos():
     return total
 
 PUNTOS_MAXIMOS = calcular_puntos_maximos()
+write_buffer = init_write_buffer(PUNTOS_MAXIMOS)
 
 def refrescar_habitos():
     st.session_state.habitos_completados = db.obtener_habitos_dia(st.session_state.fecha_actual)
+    # Lo que llegó hasta acá (incluido el eco de la propia escritura) ya está en la relectura
+    st.session_state.cambios.pendientes()
+
+def sincronizar_casillas():
+    # Una casilla con estado viejo desharía el cambio remoto en el siguiente rerun
+    for bloque in config['bloques']:
+        for habito in bloque['habitos']:
+            clave = f"habit_{bloque['id']}_{habito['id']}"
+            if clave in st.session_state:
+                st.session_state[clave] = habito['id'] in st.session_state.habitos_completados
+
+@st.fragment(run_every=INTERVALO_CAMBIOS)
+def vigilar_cambios():
+    """Aplica los toggles hechos en otra sesión (laptop, teléfono, API) y redibuja"""
+    deltas = st.session_state.cambios.pendientes()
+    if deltas == []:
+        return
+    if deltas is None:
+        refrescar_habitos()
+    else:
+        fecha = st.session_state.fecha_actual.isoformat()
+        completados = list(st.session_state.habitos_completados)
+        # Un clic todavía en el búfer es más nuevo que cualquier eco guardado del mismo hábito
+        sin_guardar = write_buffer.pendientes()
+        for delta in deltas:
+            if delta['tipo'] != 'habito' or delta['fecha'] != fecha or (fecha, delta['habito_id']) in sin_guardar:
+                continue
+            if delta['completado'] and delta['habito_id'] not in completados:
+                completados.append(delta['habito_id'])
+            elif not delta['completado'] and delta['habito_id'] in completados:
+                completados.remove(delta['habito_id'])
+        st.session_state.habitos_completados = completados
+    sincronizar_casillas()
+    st.rerun()
 
 def toggle_habito(habito_id: str, bloque_id: str, puntos: int):
     fecha = st.session_state.fecha_actual
@@ -96,18 +240,21 @@ def toggle_habito(habito_id: str, bloque_id: str, puntos: int):
     if habito_id in habitos_actuales:
         puede_desmarcar, mensaje = validator.validar_desmarcar_habito(habito_id, habitos_actuales)
         if puede_desmarcar:
-            if db.desmarcar_habito(fecha, habito_id, max_puntos=PUNTOS_MAXIMOS):
-                if mensaje:
-                    st.toast(mensaje, icon="⚠️")
-                refrescar_habitos()
-                st.rerun()
+            # Optimista: el búfer guarda en segundo plano y el eco del bus trae las métricas
+            write_buffer.desmarcar(fecha, habito_id)
+            if mensaje:
+                st.toast(mensaje, icon="⚠️")
+            st.session_state.habitos_completados = [h for h in habitos_actuales if h != habito_id]
+            tracing.continuar_en_siguiente_rerun(st.session_state)
+            st.rerun()
     else:
         puede_marcar, mensaje_error = validator.puede_marcar_habito(habito_id, habitos_actuales)
         if puede_marcar:
-            if db.marcar_habito(fecha, habito_id, bloque_id, puntos, max_puntos=PUNTOS_MAXIMOS):
-                st.toast(f"✓ ¡Hábito completado! +{puntos} pts", icon="✅")
-                refrescar_habitos()
-                st.rerun()
+            write_buffer.marcar(fecha, habito_id, bloque_id, puntos)
+            st.toast(f"✓ ¡Hábito completado! +{puntos} pts", icon="✅")
+            st.session_state.habitos_completados = habitos_actuales + [habito_id]
+            tracing.continuar_en_siguiente_rerun(st.session_state)
+            st.rerun()
         else:
             st.error(mensaje_error)
             st.stop()
@@ -197,14 +344,7 @@ def render_sidebar():
         st.markdown("---")
         st.markdown("### 🏆 Badges Desbloqueados")
         
-        perfil_badges = {
-            'dias_activos': perfil.get('dias_activos', 0),
-            'racha_perfecta': racha,
-            'racha_cero_porno': db.obtener_racha_habito('cero_porno')['actual'],
-            'racha_peaje_ejercicio': db.obtener_racha_habito('peaje_ejercicio')['actual']
-        }
-        
-        badges_desbloqueados = gamification.obtener_badges_desbloqueados(perfil_badges)
+        badges_desbloqueados = badge_engine.badges_usuario(db.usuario_id)
         
         if badges_desbloqueados:
             for badge in badges_desbloqueados[-3:]:  # Últimos 3
@@ -477,31 +617,38 @@ def render_habito_card(habito: dict, bloque: dict, habitos_completados: list, ha
 def render_grafico_tendencia_avanzado():
     st.markdown("## 📈 Análisis de Tendencia")
     
-    historico = db.obtener_historico(dias=30)
+    horizonte = st.radio("Horizonte", list(HORIZONTES), horizontal=True,
+                         key="horizonte_tendencia", label_visibility="collapsed")
     
-    if not historico:
+    # Serie ya agregada y reducida: nunca más de PRESUPUESTO_PUNTOS puntos por gráfico
+    serie = chart_data.serie(HORIZONTES[horizonte])
+    
+    if not serie['fechas']:
         st.info("📊 Completa más días para ver el análisis de tendencia")
         return
     
-    df = pd.DataFrame(historico)
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    df = df.sort_values('fecha')
+    import plotly.graph_objects as go
+    
+    periodo = {'dia': '%{x|%d %b %Y}', 'semana': 'Semana del %{x|%d %b %Y}', 'mes': '%{x|%B %Y}'}
     
     # Crear gráfico con área sombreada
     fig = go.Figure()
     
     # Área de progreso
     fig.add_trace(go.Scatter(
-        x=df['fecha'],
-        y=df['porcentaje_cumplimiento'],
+        x=serie['fechas'],
+        y=serie['porcentajes'],
+        customdata=serie['dias'],
         mode='lines+markers',
         name='% Cumplimiento',
         line=dict(color='#00ff88', width=3, shape='spline'),
-        marker=dict(size=10, color='#00ff88', symbol='circle',
+        marker=dict(size=10 if len(serie['fechas']) <= 40 else 5, color='#00ff88', symbol='circle',
                    line=dict(color='#0A0E1A', width=2)),
         fill='tozeroy',
         fillcolor='rgba(0, 255, 136, 0.2)',
-        hovertemplate='<b>%{x|%d %b}</b><br>Progreso: %{y:.1f}%<extra></extra>'
+        hovertemplate=(f"<b>{periodo[serie['resolucion']]}</b><br>Progreso: %{{y:.1f}}%"
+                       + ("" if serie['resolucion'] == 'dia' else " (%{customdata} días)")
+                       + "<extra></extra>")
     ))
     
     # Línea de meta
@@ -528,7 +675,8 @@ def render_grafico_tendencia_avanzado():
     
     fig.update_layout(
         title={
-            'text': "Progreso de los Últimos 30 Días",
+            'text': "Progreso de Todo el Histórico" if HORIZONTES[horizonte] is None
+                    else f"Progreso: Últimos {horizonte}",
             'font': {'size': 24, 'color': '#FFFFFF'}
         },
         xaxis_title="Fecha",
@@ -558,7 +706,10 @@ def render_grafico_tendencia_avanzado():
     
     st.plotly_chart(fig, use_container_width=True)
     
-    # Análisis de tendencia
+    # Análisis de tendencia (siempre sobre los últimos 30 días)
+    historico = db.obtener_historico(dias=30)
+    if not historico:
+        return
     col1, col2, col3 = st.columns(3)
     
     tendencia = metrics_calc.analizar_tendencia(historico)
@@ -585,6 +736,13 @@ def render_reportes():
     </div>
     """, unsafe_allow_html=True)
     
+    # Los reportes de períodos largos leen del snapshot, no de la base primaria
+    fuente = backup_manager.snapshot_para_reportes()
+    if hasattr(fuente, 'obtener_info_snapshot'):
+        creado_en = fuente.obtener_info_snapshot()['creado_en']
+        minutos = int((datetime.now() - creado_en).total_seconds() // 60)
+        st.caption(f"📸 Reportes semanales a anuales con datos de las {creado_en:%H:%M} (hace {minutos} min)")
+    
     # Tabs para diferentes períodos
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "📅 Diario", "📆 Semanal", "📊 Mensual", 
@@ -595,19 +753,19 @@ def render_reportes():
         render_reporte_diario()
     
     with tab2:
-        render_reporte_semanal()
+        render_reporte_semanal(fuente)
     
     with tab3:
-        render_reporte_mensual()
+        render_reporte_mensual(fuente)
     
     with tab4:
-        render_reporte_trimestral()
+        render_reporte_trimestral(fuente)
     
     with tab5:
-        render_reporte_semestral()
+        render_reporte_semestral(fuente)
     
     with tab6:
-        render_reporte_anual()
+        render_reporte_anual(fuente)
 
 def render_reporte_diario():
     st.markdown("### 📅 Reporte del Día")
@@ -659,10 +817,10 @@ def render_reporte_diario():
                         break
                 if found: break
 
-def render_reporte_semanal():
+def render_reporte_semanal(fuente):
     st.markdown("### 📆 Reporte Semanal")
     
-    reporte = reports.generar_reporte_semanal(db)
+    reporte = reports.generar_reporte_semanal(fuente)
     
     if reporte.get('dias_registrados', 0) == 0:
         st.info("No hay datos para esta semana")
@@ -686,9 +844,9 @@ def render_reporte_semanal():
     c1.info(f"🏅 Mejor día: {reporte['mejor_dia']['fecha']} ({reporte['mejor_dia']['porcentaje']}%)")
     c2.warning(f"📉 Peor día: {reporte['peor_dia']['fecha']} ({reporte['peor_dia']['porcentaje']}%)")
 
-def render_reporte_mensual():
+def render_reporte_mensual(fuente):
     st.markdown("### 📊 Reporte Mensual")
-    reporte = reports.generar_reporte_mensual(db)
+    reporte = reports.generar_reporte_mensual(fuente)
     
     if reporte.get('dias_registrados', 0) == 0:
         st.info("No hay datos para este mes")
@@ -708,6 +866,8 @@ def render_reporte_mensual():
     
     # Gráfico diario del mes
     if reporte['datos_diarios']:
+        import pandas as pd
+        import plotly.express as px
         df = pd.DataFrame(reporte['datos_diarios'])
         fig = px.bar(df, x='fecha', y='porcentaje_cumplimiento', 
                      title="Progreso Diario del Mes",
@@ -715,9 +875,9 @@ def render_reporte_mensual():
         fig.add_hline(y=85, line_dash="dash", line_color="green", annotation_text="Meta 85%")
         st.plotly_chart(fig, use_container_width=True)
 
-def render_reporte_trimestral():
+def render_reporte_trimestral(fuente):
     st.markdown("### 📈 Reporte Trimestral")
-    reporte = reports.generar_reporte_trimestral(db)
+    reporte = reports.generar_reporte_trimestral(fuente)
     
     if reporte.get('dias_registrados', 0) == 0:
         st.info("No hay datos para este trimestre")
@@ -734,9 +894,9 @@ def render_reporte_trimestral():
     if reporte['promedio_por_mes']:
         st.bar_chart(reporte['promedio_por_mes'])
 
-def render_reporte_semestral():
+def render_reporte_semestral(fuente):
     st.markdown("### 📉 Reporte Semestral")
-    reporte = reports.generar_reporte_semestral(db)
+    reporte = reports.generar_reporte_semestral(fuente)
     
     if reporte.get('dias_registrados', 0) == 0:
         st.info("No hay datos para este semestre")
@@ -750,9 +910,9 @@ def render_reporte_semestral():
     with col2:
         st.metric("Racha Máxima", f"{reporte['racha_maxima']} días")
 
-def render_reporte_anual():
+def render_reporte_anual(fuente):
     st.markdown("### 📕 Reporte Anual")
-    reporte = reports.generar_reporte_anual(db)
+    reporte = reports.generar_reporte_anual(fuente)
     
     if reporte.get('dias_registrados', 0) == 0:
         st.info("No hay datos para este año")
@@ -776,9 +936,48 @@ def render_reporte_anual():
 # FUNCIÓN PRINCIPAL
 # ===========================
 
+def render_panel_rendimiento():
+    perfil = profiling.actual()
+    if perfil is None:
+        return
+    resumen = perfil.resumen()
+    import pandas as pd
+    with st.sidebar.expander(f"⏱️ Rendimiento del rerun: {resumen['total_ms']:.0f} ms", expanded=True):
+        st.markdown("**Secciones**")
+        st.dataframe(pd.DataFrame([
+            {'sección': "\u2003" * fila['nivel'] + fila['seccion'], 'ms': round(fila['ms'], 1)}
+            for fila in resumen['secciones']
+        ]), hide_index=True)
+
+        conexiones = sum(resumen['conexiones'].values())
+        st.markdown(f"**DatabaseManager:** {resumen['db_llamadas']} llamadas, "
+                    f"{resumen['db_ms']:.1f} ms, {conexiones} conexiones")
+        if resumen['db']:
+            st.dataframe(pd.DataFrame(resumen['db']).round({'total_ms': 2}),
+                         hide_index=True)
+
+        st.markdown("**Cachés**")
+        st.dataframe(pd.DataFrame(resumen['caches']).round({'tasa': 2}),
+                     hide_index=True)
+
+        registro = DatabaseManager.registro_consultas
+        if registro is not None and registro.lentas:
+            st.markdown(f"**Consultas lentas (>{registro.umbral * 1000:.0f} ms)**")
+            for entrada in list(registro.lentas)[-5:]:
+                st.code(f"{entrada['ms']:.1f} ms  {entrada['sql']}\n" + "\n".join(entrada['plan'] or []),
+                        language="sql")
+
 def main():
     """Función principal de la aplicación"""
     
+    if PANEL_PERF:
+        profiling.instrumentar_namespace(globals(), secciones=SECCIONES_PERF)
+    if TRAZAS:
+        tracing.instrumentar_namespace(
+            globals(), SECCIONES_PERF + ["render_bloque_habitos_grid", "render_habito_card", "toggle_habito"]
+        )
+
+    vigilar_cambios()
 
     # Renderizar sidebar siempre
     render_sidebar()
@@ -835,6 +1034,10 @@ def main():
     """
     st.components.v1.html(components_html, height=0)
 
+    # Al final, para que incluya todo el rerun
+    render_panel_rendimiento()
+    tracing.terminar_rerun()
+
 # ===========================
 # EJECUCIÓN
 # ===========================
@@ -0,0 +1,186 @@
+"""
+Prueba de Carga de la API
+Levanta api.server en otro proceso sobre una base sintética y lo golpea con
+conexiones keep-alive concurrentes (asyncio) que imitan a los clientes
+móviles: consultan el día, el perfil, métricas, rachas, badges y reportes
+revalidando con If-None-Match, y marcan o desmarcan hábitos. Reporta
+peticiones por segundo, latencias p50/p99, códigos de estado y qué fracción
+se resolvió con 304
+
+Uso:
+    python -m benchmarks.bench_api --conexiones 64 --duracion 10
+    python -m benchmarks.bench_api --escrituras 0.3 --hilos 2
+    python -m benchmarks.bench_api --url http://127.0.0.1:8080 --usuarios 50
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmarks.synthetic_data import cargar_habitos, poblar
+
+# Peso de cada lectura en la mezcla (las escrituras se agregan con --escrituras)
+LECTURAS = (
+    ('dia', 55), ('perfil', 12), ('metricas', 10), ('rachas', 8), ('badges', 8), ('reporte', 7),
+)
+
+
+def _servir(db_path: str, config: str, hilos: int, puertos: multiprocessing.Queue):
+    """Proceso del servidor: avisa el puerto elegido por el sistema y atiende hasta que lo terminan"""
+    from api.server import crear_servidor
+    servidor = crear_servidor(db_path, config, hilos)
+    asyncio.run(servidor.servir("127.0.0.1", 0, puertos.put))
+
+
+class ClienteSimulado:
+    """Una conexión keep-alive de un usuario, con su caché de ETags y el estado del día"""
+
+    def __init__(self, usuario: str, habitos: List[Dict], rng: random.Random, escrituras: float):
+        self.usuario = usuario
+        self.habitos = habitos
+        self.rng = rng
+        self.escrituras = escrituras
+        self.etags: Dict[str, Tuple[str, bytes]] = {}
+        self.completados: set = set()
+        self.hoy = date.today().isoformat()
+
+    def siguiente(self) -> Tuple[str, str]:
+        base = f"/v1/usuarios/{self.usuario}"
+        if self.rng.random() < self.escrituras:
+            habito = self.rng.choice(self.habitos)['id']
+            metodo = 'DELETE' if habito in self.completados else 'POST'
+            return metodo, f"{base}/dias/{self.hoy}/habitos/{habito}"
+        tipo = self.rng.choices([n for n, _ in LECTURAS], [p for _, p in LECTURAS])[0]
+        if tipo == 'dia':
+            return 'GET', f"{base}/dias/{self.hoy}"
+        if tipo == 'metricas':
+            return 'GET', f"{base}/metricas?dias=90"
+        if tipo == 'reporte':
+            return 'GET', f"{base}/reportes/semanal"
+        return 'GET', f"{base}/{tipo}"
+
+    async def pedir(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    metodo: str, ruta: str) -> int:
+        extra = ""
+        if metodo == 'GET' and ruta in self.etags:
+            extra = f"If-None-Match: {self.etags[ruta][0]}\r\n"
+        writer.write(f"{metodo} {ruta} HTTP/1.1\r\nHost: atomic\r\n{extra}Content-Length: 0\r\n\r\n".encode())
+        cabecera = await reader.readuntil(b"\r\n\r\n")
+        lineas = cabecera.decode("latin-1").split("\r\n")
+        estado = int(lineas[0].split(" ")[1])
+        cabeceras = {}
+        for linea in lineas[1:]:
+            nombre, _, valor = linea.partition(":")
+            cabeceras[nombre.strip().lower()] = valor.strip()
+        largo = int(cabeceras.get('content-length', 0))
+        cuerpo = await reader.readexactly(largo) if largo else b""
+
+        if estado == 304:
+            cuerpo = self.etags[ruta][1]
+        elif estado == 200 and 'etag' in cabeceras:
+            self.etags[ruta] = (cabeceras['etag'], cuerpo)
+        if estado in (200, 304) and '/dias/' in ruta:
+            self.completados = set(json.loads(cuerpo)['completados'])
+        return estado
+
+
+async def _conexion(host: str, puerto: int, cliente: ClienteSimulado, fin: float,
+                    latencias: List[float], estados: Counter, tipos: Counter):
+    reader, writer = await asyncio.open_connection(host, puerto)
+    try:
+        while time.perf_counter() < fin:
+            metodo, ruta = cliente.siguiente()
+            inicio = time.perf_counter()
+            estado = await cliente.pedir(reader, writer, metodo, ruta)
+            latencias.append(time.perf_counter() - inicio)
+            estados[estado] += 1
+            tipos['escritura' if metodo != 'GET' else 'lectura'] += 1
+            tipos['304'] += estado == 304
+    finally:
+        writer.close()
+
+
+async def _cargar(host: str, puerto: int, conexiones: int, usuarios: int, duracion: float,
+                  escrituras: float, config: str) -> Dict:
+    habitos = cargar_habitos(config)
+    latencias: List[float] = []
+    estados, tipos = Counter(), Counter()
+    inicio = time.perf_counter()
+    fin = inicio + duracion
+    await asyncio.gather(*[
+        _conexion(host, puerto,
+                  ClienteSimulado(f"usuario_{n % usuarios:04d}", habitos, random.Random(n), escrituras),
+                  fin, latencias, estados, tipos)
+        for n in range(conexiones)
+    ])
+    segundos = time.perf_counter() - inicio
+    valores = np.array(latencias) * 1000
+    return {
+        'peticiones': len(latencias),
+        'por_segundo': len(latencias) / segundos if segundos > 0 else 0.0,
+        'p50_ms': float(np.percentile(valores, 50)) if len(valores) else 0.0,
+        'p99_ms': float(np.percentile(valores, 99)) if len(valores) else 0.0,
+        'estados': dict(sorted(estados.items())),
+        'escrituras': tipos['escritura'],
+        'tasa_304': tipos['304'] / tipos['lectura'] if tipos['lectura'] else 0.0
+    }
+
+
+def ejecutar(url: Optional[str], db_path: Optional[str], conexiones: int, usuarios: int, duracion: float,
+             escrituras: float, hilos: int, config: str) -> Dict:
+    """Carga contra `url`, o contra un servidor propio sobre `db_path` si no hay url"""
+    if url:
+        partes = urlsplit(url)
+        return asyncio.run(_cargar(partes.hostname, partes.port or 80, conexiones, usuarios,
+                                   duracion, escrituras, config))
+
+    puertos = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=_servir, args=(db_path, config, hilos, puertos), daemon=True)
+    proceso.start()
+    try:
+        puerto = puertos.get(timeout=60)
+        return asyncio.run(_cargar("127.0.0.1", puerto, conexiones, usuarios, duracion, escrituras, config))
+    finally:
+        proceso.terminate()
+        proceso.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conexiones", type=int, default=64, help="Conexiones keep-alive concurrentes")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument("--escrituras", type=float, default=0.05, help="Fracción de peticiones que marcan/desmarcan")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--hilos", type=int, default=4, help="Hilos del pool de base del servidor")
+    parser.add_argument("--url", default=None, help="Servidor ya levantado (si no, uno propio)")
+    parser.add_argument("--db", default=None, help="Base existente (si no, una sintética temporal)")
+    parser.add_argument("--config", default="config/habitos.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = args.db or os.path.join(tmp, "api.db")
+        if not args.url and not os.path.exists(ruta):
+            print(f"Base sintética: {poblar(ruta, args.usuarios, 1, args.config)['filas']:,} filas")
+        r = ejecutar(args.url, ruta, args.conexiones, args.usuarios, args.duracion,
+                     args.escrituras, args.hilos, args.config)
+
+    print(f"{args.conexiones} conexiones, {args.usuarios} usuarios, {args.escrituras:.0%} escrituras, "
+          f"{args.hilos} hilos de base")
+    print(f"  {r['peticiones']:,} peticiones - {r['por_segundo']:,.1f}/s ({r['escrituras']:,} escrituras)")
+    print(f"  p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms")
+    print(f"  estados {r['estados']}  lecturas resueltas con 304: {r['tasa_304']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark del Archivo Columnar
+Compara leer años de histórico desde SQLite contra el archivo mmap + cola viva
+
+Uso:
+    python -m benchmarks.bench_archive --dias 3650 --repeticiones 50
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from database.column_archive import ColumnArchive
+from database.db_manager import DatabaseManager
+from database.importer import HistoricalImporter
+from benchmarks.bench_import import generar_filas
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Milisegundos promedio por llamada"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dias", type=int, default=3650)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db")).para_usuario("usuario_0000")
+        HistoricalImporter(db).importar(generar_filas(1, args.dias))
+
+        archivo = ColumnArchive(db, os.path.join(tmp, "archivo"))
+        inicio = time.perf_counter()
+        archivo.compactar()
+        print(f"Compactación: {time.perf_counter() - inicio:.2f}s")
+        lector = archivo.lector()
+
+        sqlite_ms = medir(lambda: db.obtener_historico(dias=args.dias), args.repeticiones)
+        lista_ms = medir(lambda: lector.obtener_historico(dias=args.dias), args.repeticiones)
+        columnas_ms = medir(lambda: lector.columnas(), args.repeticiones)
+        matriz_ms = medir(lambda: lector.matriz_habitos(), args.repeticiones)
+        print(f"SQLite obtener_historico:        {sqlite_ms:8.2f} ms")
+        print(f"Archivo obtener_historico:       {lista_ms:8.2f} ms")
+        print(f"Archivo columnas (numpy):        {columnas_ms:8.2f} ms  ({sqlite_ms / columnas_ms:.0f}x)")
+        print(f"Archivo matriz de hábitos:       {matriz_ms:8.2f} ms")
+        lector.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de Métricas en Lote
+Compara BatchMetricsCalculator contra el cálculo usuario por usuario
+
+Uso:
+    python -m benchmarks.bench_batch_metrics --usuarios 10000 --dias 365
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from database.db_manager import DatabaseManager
+from utils.batch_metrics import BatchMetricsCalculator
+from utils.gamification import GamificationSystem
+from utils.metrics import MetricsCalculator
+
+
+def poblar_base(db_path: str, usuarios: int, dias: int, puntos_maximos: int = 355, semilla: int = 42):
+    """Llena registros y perfil con datos aleatorios para N usuarios x D días"""
+    rng = random.Random(semilla)
+    hoy = date.today()
+    fechas = [(hoy - timedelta(days=d)).isoformat() for d in range(dias)]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for u in range(usuarios):
+            usuario_id = f"usuario_{u:06d}"
+            disciplina = rng.random()
+            filas = []
+            total = 0
+            for fecha in fechas:
+                if rng.random() > 0.2 + disciplina * 0.75:
+                    continue
+                puntos = int(puntos_maximos * min(1.0, max(0.0, rng.gauss(disciplina, 0.15))))
+                total += puntos
+                filas.append((usuario_id, fecha, puntos, min(100.0, puntos / puntos_maximos * 100)))
+            conn.executemany(
+                "INSERT INTO registros (usuario_id, fecha, puntos_totales, porcentaje_cumplimiento) VALUES (?, ?, ?, ?)",
+                filas
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO perfil (usuario_id, puntos_totales, dias_activos) VALUES (?, ?, ?)",
+                (usuario_id, total, len(filas))
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def kpis_por_usuario(db: DatabaseManager, usuario_id: str) -> dict:
+    """Cálculo de referencia con las funciones por usuario (sin efectos secundarios)"""
+    gestor = db.para_usuario(usuario_id)
+    historico = gestor.obtener_historico(dias=BatchMetricsCalculator.DIAS_HISTORICO)
+    hoy = date.today().isoformat()
+    fila_hoy = next((r for r in historico if r['fecha'] == hoy), None)
+    perfil = gestor.obtener_perfil()
+    nivel, info_nivel = GamificationSystem.calcular_nivel(perfil.get('puntos_totales', 0))
+    return {
+        'puntos_hoy': fila_hoy['puntos_totales'] if fila_hoy else 0,
+        'porcentaje_hoy': fila_hoy['porcentaje_cumplimiento'] if fila_hoy else 0.0,
+        'racha_perfecta': MetricsCalculator.calcular_racha_perfecta(historico, 85),
+        'semana': MetricsCalculator.calcular_porcentaje_semanal(historico, 85),
+        'puntos_totales': perfil.get('puntos_totales', 0),
+        'nivel': nivel,
+        'nombre_nivel': info_nivel['nombre']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=10000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--muestra", type=int, default=200, help="Usuarios para el cálculo por usuario")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = DatabaseManager(db_path)
+
+        inicio = time.perf_counter()
+        poblar_base(db_path, args.usuarios, args.dias)
+        print(f"Datos generados: {args.usuarios} usuarios x {args.dias} días en {time.perf_counter() - inicio:.1f}s")
+
+        inicio = time.perf_counter()
+        lote = BatchMetricsCalculator.calcular_kpis_usuarios(db)
+        t_lote = time.perf_counter() - inicio
+        print(f"Lote:        {len(lote)} usuarios en {t_lote:.2f}s")
+
+        muestra = random.Random(7).sample(sorted(lote), min(args.muestra, len(lote)))
+        inicio = time.perf_counter()
+        referencia = {u: kpis_por_usuario(db, u) for u in muestra}
+        t_muestra = time.perf_counter() - inicio
+        t_estimado = t_muestra / len(muestra) * len(lote)
+        print(f"Por usuario: {len(muestra)} usuarios en {t_muestra:.2f}s "
+              f"(estimado {t_estimado:.1f}s para {len(lote)}, {t_estimado / t_lote:.0f}x más lento)")
+
+        diferencias = [u for u in muestra if referencia[u] != lote[u]]
+        print(f"Coincidencias: {len(muestra) - len(diferencias)}/{len(muestra)}")
+        if diferencias:
+            u = diferencias[0]
+            print(f"  {u}: lote={lote[u]} referencia={referencia[u]}")
+
+
+if __name__ == "__main__":
+    main()
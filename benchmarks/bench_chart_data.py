@@ -0,0 +1,62 @@
+"""
+Benchmark de los Datos del Gráfico de Tendencia
+Genera años de histórico y compara, por horizonte, la serie diaria cruda
+(obtener_historico, un punto por día) contra ChartData: puntos enviados al
+gráfico, resolución elegida, tiempo en frío (agregados por calcular) y con
+la caché caliente
+
+Uso:
+    python -m benchmarks.bench_chart_data --dias 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from database.db_manager import DatabaseManager
+from database.importer import HistoricalImporter
+from utils.chart_data import ChartData, HORIZONTES
+from benchmarks.synthetic_data import cargar_habitos
+
+
+def _ms(funcion, repeticiones: int = 1) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dias", type=int, default=2000, help="Días de histórico a generar")
+    parser.add_argument("--config", default="config/habitos.json")
+    args = parser.parse_args()
+
+    habitos = cargar_habitos(args.config)
+    hoy = date.today()
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        HistoricalImporter(db).importar(
+            {'fecha': (hoy - timedelta(days=d)).isoformat(), 'habito_id': h['id'],
+             'bloque_id': h['bloque_id'], 'puntos': h['puntos']}
+            for d in range(1, args.dias + 1) for h in habitos if rng.random() < 0.6
+        )
+
+        print(f"{'Horizonte':<10} {'crudo':>7} {'ms':>7}   {'ChartData':>9} {'resolución':<10} {'frío ms':>8} {'caché ms':>9}")
+        for etiqueta, dias in HORIZONTES.items():
+            crudo = []
+            ms_crudo = _ms(lambda: crudo.extend(db.obtener_historico(dias=dias)))
+            chart_data = ChartData(db)
+            serie = {}
+            ms_frio = _ms(lambda: serie.update(chart_data.serie(dias)))
+            ms_cache = _ms(lambda: chart_data.serie(dias), repeticiones=50)
+            print(f"{etiqueta:<10} {len(crudo):>7,} {ms_crudo:>7.1f}   {len(serie['fechas']):>9,} "
+                  f"{serie['resolucion']:<10} {ms_frio:>8.1f} {ms_cache:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark del Cierre Diario
+Cierra los días de una flota sintética, repite el cierre (no debe haber
+usuarios afectados) y vuelve a cerrar tras editar días ya cerrados
+
+Uso:
+    python -m benchmarks.bench_day_close --usuarios 1000 --dias 180
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+
+from database.day_closer import DayCloser
+from database.db_manager import DatabaseManager
+from database.importer import HistoricalImporter
+from benchmarks.bench_import import generar_filas
+
+# Perfiles que no coinciden con los días cerrados
+PERFILES_DISTINTOS = """
+SELECT p.usuario_id, p.puntos_totales, COALESCE(SUM(r.puntos_totales), 0) AS esperado
+FROM perfil p
+LEFT JOIN registros r ON r.usuario_id = p.usuario_id AND r.fecha <= ?
+GROUP BY p.usuario_id
+HAVING p.puntos_totales != esperado OR p.dias_activos != COALESCE(SUM(r.puntos_totales > 0), 0)
+"""
+
+
+def imprimir(etiqueta: str, resultado: dict):
+    print(f"{etiqueta:<22} {resultado['usuarios']:>6,} usuarios  {resultado['lotes']:>3} lotes  "
+          f"{resultado['badges']:>6,} badges  {resultado['segundos']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--dias", type=int, default=180)
+    parser.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args()
+
+    hoy = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.db")
+        db = DatabaseManager(ruta)
+        importado = HistoricalImporter(db).importar(generar_filas(args.usuarios, args.dias, habitos=6))
+        print(f"Flota: {args.usuarios:,} usuarios, {importado['filas']:,} hábitos completados")
+
+        cierre = DayCloser(db, tamaño_lote=args.lote)
+        imprimir("Primer cierre", cierre.cerrar(hoy))
+        imprimir("Cierre repetido", cierre.cerrar(hoy))
+
+        for u in range(3):
+            db.para_usuario(f"usuario_{u:04d}").marcar_habito(
+                hoy - timedelta(days=10), "habito_extra", "bloque", 25, max_puntos=355
+            )
+        imprimir("Tras 3 ediciones", cierre.cerrar(hoy))
+        imprimir("Día siguiente", cierre.cerrar(hoy + timedelta(days=1)))
+
+        conn = sqlite3.connect(ruta)
+        try:
+            distintos = conn.execute(PERFILES_DISTINTOS, (hoy.isoformat(),)).fetchall()
+        finally:
+            conn.close()
+        print(f"Perfiles distintos a sus días cerrados: {len(distintos)}")
+
+
+if __name__ == "__main__":
+    main()
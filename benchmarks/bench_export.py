@@ -0,0 +1,85 @@
+"""
+Benchmark de Exportación en Streaming
+Exporta millones de filas de habitos_completados en cada formato y reporta
+filas/s, tamaño del archivo y memoria pico (que no debe crecer con las filas)
+
+Uso:
+    python -m benchmarks.bench_export --usuarios 500 --dias 730
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+from database.db_manager import DatabaseManager
+from database.exporter import StreamingExporter, leer_columnar
+
+
+def poblar_habitos(db_path: str, usuarios: int, dias: int, habitos: int = 12, semilla: int = 42) -> int:
+    """Inserta hábitos completados sintéticos (y sus registros) directamente"""
+    rng = random.Random(semilla)
+    hoy = date.today()
+    fechas = [(hoy - timedelta(days=d)).isoformat() for d in range(dias)]
+    total = 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for u in range(usuarios):
+            usuario_id = f"usuario_{u:05d}"
+            disciplina = 0.3 + rng.random() * 0.7
+            filas = [
+                (usuario_id, fecha, f"habito_{h:02d}", "bloque", 30, "08:00:00")
+                for fecha in fechas for h in range(habitos) if rng.random() < disciplina
+            ]
+            conn.executemany(
+                "INSERT INTO registros (usuario_id, fecha) VALUES (?, ?)",
+                ((usuario_id, fecha) for fecha in fechas)
+            )
+            conn.executemany("""
+                INSERT INTO habitos_completados (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, filas)
+            total += len(filas)
+        conn.commit()
+    finally:
+        conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=500)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--memoria", action="store_true", help="Medir memoria pico (tracemalloc, más lento)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = DatabaseManager(db_path)
+        total = poblar_habitos(db_path, args.usuarios, args.dias)
+        print(f"Datos generados: {total:,} hábitos completados")
+
+        exportador = StreamingExporter(db)
+        for nombre in ("salida.csv", "salida.ndjson", "salida.atc", "salida.csv.gz", "salida.atc.gz"):
+            ruta = os.path.join(tmp, nombre)
+            if args.memoria:
+                tracemalloc.start()
+            resultado = exportador.exportar("habitos_completados", ruta, todos_los_usuarios=True)
+            memoria = ""
+            if args.memoria:
+                memoria = f"  pico {tracemalloc.get_traced_memory()[1] / 1e6:.1f} MB"
+                tracemalloc.stop()
+            print(f"{nombre:15} {resultado['filas']:>10,} filas en {resultado['segundos']:6.2f}s "
+                  f"({resultado['filas_por_segundo']:>9,.0f} filas/s)  "
+                  f"{os.path.getsize(ruta) / 1e6:7.1f} MB{memoria}")
+
+        leidas = sum(len(b['usuario_id']) for b in leer_columnar(os.path.join(tmp, "salida.atc.gz")))
+        print(f"Relectura columnar: {leidas:,} filas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark del Importador de Histórico
+Compara HistoricalImporter contra reproducir el mismo histórico con marcar_habito
+
+Uso:
+    python -m benchmarks.bench_import --usuarios 20 --dias 1095 --muestra 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator
+
+from database.db_manager import DatabaseManager
+from database.importer import HistoricalImporter
+
+
+def generar_filas(usuarios: int, dias: int, habitos: int = 12, semilla: int = 42) -> Iterator[Dict]:
+    """Genera hábitos completados sintéticos en orden cronológico por usuario"""
+    rng = random.Random(semilla)
+    inicio = date.today() - timedelta(days=dias)
+    for u in range(usuarios):
+        disciplina = rng.random()
+        for d in range(dias):
+            fecha = (inicio + timedelta(days=d)).isoformat()
+            for h in range(habitos):
+                if rng.random() < disciplina:
+                    yield {
+                        'usuario_id': f"usuario_{u:04d}", 'fecha': fecha, 'habito_id': f"habito_{h:02d}",
+                        'bloque_id': 'bloque', 'puntos': 30, 'max_puntos': 355
+                    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--dias", type=int, default=1095)
+    parser.add_argument("--muestra", type=int, default=2000, help="Filas para medir marcar_habito")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "importado.db"))
+        resultado = HistoricalImporter(db).importar(generar_filas(args.usuarios, args.dias))
+        print(f"Importador:    {resultado['filas']:,} filas en {resultado['segundos']:.2f}s "
+              f"({resultado['filas_por_segundo']:,.0f} filas/s)")
+
+        db = DatabaseManager(os.path.join(tmp, "marcado.db"))
+        filas = generar_filas(args.usuarios, args.dias)
+        inicio = time.perf_counter()
+        n = 0
+        for fila in filas:
+            if n >= args.muestra:
+                break
+            db.para_usuario(fila['usuario_id']).marcar_habito(
+                date.fromisoformat(fila['fecha']), fila['habito_id'], fila['bloque_id'], fila['puntos'],
+                max_puntos=fila['max_puntos']
+            )
+            n += 1
+        segundos = time.perf_counter() - inicio
+        por_segundo = n / segundos
+        print(f"marcar_habito: {n:,} filas en {segundos:.2f}s ({por_segundo:,.0f} filas/s, "
+              f"{resultado['filas_por_segundo'] / por_segundo:.0f}x más lento)")
+
+
+if __name__ == "__main__":
+    main()
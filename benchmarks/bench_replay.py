@@ -0,0 +1,83 @@
+"""
+Benchmark de Replay del Log de Eventos
+Mide eventos/segundo al reconstruir todas las proyecciones desde `eventos`,
+secuencial y con el pool de procesos
+
+Uso:
+    python -m benchmarks.bench_replay --usuarios 2000 --dias 180 --procesos 4
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from database.db_manager import DatabaseManager
+from database.event_log import EventLog
+
+
+def poblar_eventos(db_path: str, usuarios: int, dias: int, habitos: int = 12,
+                   max_puntos: int = 355, semilla: int = 42) -> int:
+    """Inserta un log sintético (marcar y algunos desmarcar) para N usuarios x D días"""
+    rng = random.Random(semilla)
+    hoy = date.today()
+    fechas = [(hoy - timedelta(days=d)).isoformat() for d in range(dias - 1, -1, -1)]
+    total = 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for u in range(usuarios):
+            usuario_id = f"usuario_{u:06d}"
+            disciplina = rng.random()
+            filas = []
+            for fecha in fechas:
+                for h in range(habitos):
+                    if rng.random() > disciplina:
+                        continue
+                    habito_id = f"habito_{h:02d}"
+                    fila = (usuario_id, 'marcar', fecha, habito_id, 'bloque', 30, max_puntos, '08:00:00',
+                            f"{usuario_id}:{fecha}:{habito_id}:m")
+                    filas.append(fila)
+                    if rng.random() < 0.05:
+                        filas.append((usuario_id, 'desmarcar', fecha, habito_id, None, None, max_puntos, None,
+                                      f"{usuario_id}:{fecha}:{habito_id}:d"))
+            conn.executemany("""
+                INSERT INTO eventos (usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora,
+                                     clave_idempotencia)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, filas)
+            total += len(filas)
+        conn.commit()
+    finally:
+        conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--dias", type=int, default=180)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = DatabaseManager(db_path)
+
+        inicio = time.perf_counter()
+        total = poblar_eventos(db_path, args.usuarios, args.dias)
+        print(f"Log generado: {total} eventos ({args.usuarios} usuarios x {args.dias} días) "
+              f"en {time.perf_counter() - inicio:.1f}s")
+
+        log = EventLog(db)
+        for procesos in sorted({1, args.procesos}):
+            resultado = log.reconstruir(procesos=procesos)
+            print(f"Replay con {procesos} proceso(s): {resultado['segundos']:.2f}s, "
+                  f"{resultado['eventos_por_segundo']:,.0f} eventos/s")
+
+
+if __name__ == "__main__":
+    main()
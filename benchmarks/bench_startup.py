@@ -0,0 +1,137 @@
+"""
+Benchmark del Arranque en Frío
+Cada medición corre en un intérprete nuevo, como un worker de Streamlit
+recién levantado:
+
+- importación: los módulos de app.py, la API y los reportes, y qué
+  dependencias pesadas (pandas, numpy, plotly.express) quedaron cargadas
+- DatabaseManager: abrir una base nueva (DDL completo) y una existente
+  (PRAGMA user_version al día, sin DDL)
+- primer render: app.py completo con streamlit.testing (AppTest), sobre una
+  base vacía y sobre una con histórico (ahí sí se cargan los reportes)
+
+Uso:
+    python -m benchmarks.bench_startup --repeticiones 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from database.db_manager import DatabaseManager
+from benchmarks.synthetic_data import cargar_habitos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PESADOS = ('pandas', 'numpy', 'plotly.express')
+
+IMPORTAR = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulos}
+print(json.dumps({{'segundos': time.perf_counter() - inicio,
+                  'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+ABRIR = """
+import json, time
+from database.db_manager import DatabaseManager
+inicio = time.perf_counter()
+DatabaseManager({ruta!r})
+print(json.dumps({{'segundos': time.perf_counter() - inicio}}))
+"""
+
+RENDER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+inicio = time.perf_counter()
+app = AppTest.from_file({app!r}, default_timeout=300)
+app.run()
+print(json.dumps({{'segundos': time.perf_counter() - inicio, 'error': bool(app.exception),
+                  'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+# Lo que app.py importa de este repositorio, más streamlit
+MODULOS_APP = ("streamlit, database.db_manager, database.backup, database.day_closer, database.write_buffer, "
+               "utils.gamification, utils.validators, utils.metrics, utils.reports, utils.badge_engine, "
+               "utils.change_bus, utils.profiling, utils.telemetry, utils.tracing")
+
+
+def _correr(codigo: str, cwd: str = RAIZ) -> dict:
+    entorno = {**os.environ, 'PYTHONPATH': RAIZ}
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=cwd, env=entorno,
+                            capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def medir(codigo: str, repeticiones: int, cwd: str = RAIZ, preparar=None) -> dict:
+    """Mediana de `repeticiones` intérpretes nuevos (preparar() corre antes de cada uno)"""
+    resultados = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        resultados.append(_correr(codigo, cwd))
+    return {**resultados[-1], 'segundos': statistics.median(r['segundos'] for r in resultados)}
+
+
+def _directorio_app(tmp: str) -> str:
+    """Copia mínima de trabajo: config y assets enlazados, la base se crea adentro"""
+    for nombre in ("config", "assets"):
+        os.symlink(os.path.join(RAIZ, nombre), os.path.join(tmp, nombre))
+    os.makedirs(os.path.join(tmp, "database"))
+    return tmp
+
+
+def imprimir(etiqueta: str, resultado: dict):
+    pesados = resultado.get('pesados')
+    detalle = f"  carga: {', '.join(pesados) or 'ninguna dependencia pesada'}" if pesados is not None else ""
+    error = "  (¡el script falló!)" if resultado.get('error') else ""
+    print(f"{etiqueta:<34} {resultado['segundos'] * 1000:>8.1f} ms{detalle}{error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--dias", type=int, default=120, help="Días de histórico para el render con datos")
+    parser.add_argument("--sin-render", action="store_true", help="Omitir el primer render (el más lento)")
+    args = parser.parse_args()
+    n = args.repeticiones
+
+    imprimir("import utils.reports", medir(IMPORTAR.format(modulos="utils.reports", pesados=PESADOS), n))
+    imprimir("import api.server", medir(IMPORTAR.format(modulos="api.server", pesados=PESADOS), n))
+    imprimir("import módulos de app.py", medir(IMPORTAR.format(modulos=MODULOS_APP, pesados=PESADOS), n))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.db")
+
+        def borrar():
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+        imprimir("DatabaseManager base nueva", medir(ABRIR.format(ruta=ruta), n, preparar=borrar))
+        imprimir("DatabaseManager base existente", medir(ABRIR.format(ruta=ruta), n))
+
+    if args.sin_render:
+        return
+
+    app = os.path.join(RAIZ, "app.py")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = _directorio_app(tmp)
+        imprimir("Primer render, base vacía", medir(RENDER.format(app=app, pesados=PESADOS), n, cwd))
+
+        db = DatabaseManager(os.path.join(cwd, "database", "tracker.db"))
+        habitos = cargar_habitos(os.path.join(RAIZ, "config", "habitos.json"))
+        hoy = date.today()
+        for d in range(1, args.dias + 1):
+            for habito in habitos[:(d % len(habitos)) + 1]:
+                db.marcar_habito(hoy - timedelta(days=d), habito['id'], habito['bloque_id'], habito['puntos'])
+        imprimir(f"Primer render, {args.dias} días", medir(RENDER.format(app=app, pesados=PESADOS), n, cwd))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de los Triggers de Agregados
+Mide marcar/desmarcar con los agregados del día mantenidos por SQLite y
+comprueba que registros coincide con un recálculo completo desde
+habitos_completados (nivel caliente más los años archivados) después de
+cada tanda de toggles aleatorios. tests/test_aggregates.py usa el mismo recálculo
+
+Uso:
+    python -m benchmarks.bench_triggers --toggles 2000 --tandas 5
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import List
+
+from database.db_manager import DatabaseManager
+from database.importer import HistoricalImporter
+from benchmarks.bench_import import generar_filas
+
+# Agregados recalculados desde cero, solo para los días que no coinciden.
+# temp.todos_habitos junta el nivel caliente con todos los archivos fríos: un
+# día que quedó en los dos niveles a la vez también aparece como diferencia
+DIFERENCIAS = """
+SELECT r.usuario_id, r.fecha,
+       r.puntos_totales, COALESCE(t.total, 0) AS puntos_esperados,
+       r.total_habitos, COALESCE(t.habitos, 0) AS habitos_esperados,
+       r.porcentaje_cumplimiento,
+       CASE WHEN r.max_puntos > 0
+            THEN MIN(100.0, COALESCE(t.total, 0) * 100.0 / r.max_puntos) ELSE 0.0 END AS porcentaje_esperado
+FROM registros r
+LEFT JOIN (
+    SELECT usuario_id, fecha, SUM(puntos) AS total, COUNT(*) AS habitos
+    FROM temp.todos_habitos
+    GROUP BY usuario_id, fecha
+) t ON t.usuario_id = r.usuario_id AND t.fecha = r.fecha
+WHERE r.puntos_totales != COALESCE(t.total, 0)
+   OR r.total_habitos != COALESCE(t.habitos, 0)
+   OR r.porcentaje_cumplimiento != porcentaje_esperado
+"""
+
+
+def diferencias(db_path: str) -> List[tuple]:
+    """Días cuyos agregados no coinciden con el recálculo completo"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("""
+            CREATE TEMP TABLE todos_habitos AS
+            SELECT usuario_id, fecha, puntos FROM main.habitos_completados
+        """)
+        for (ruta,) in conn.execute("SELECT ruta FROM archivo_anual").fetchall():
+            conn.execute("ATTACH DATABASE ? AS frio", (ruta,))
+            try:
+                conn.execute("""
+                    INSERT INTO temp.todos_habitos
+                    SELECT usuario_id, fecha, puntos FROM frio.habitos_completados
+                """)
+                conn.commit()
+            finally:
+                conn.execute("DETACH DATABASE frio")
+        return conn.execute(DIFERENCIAS).fetchall()
+    finally:
+        conn.close()
+
+
+def toggles_aleatorios(db: DatabaseManager, n: int, rng: random.Random) -> float:
+    """Marca, remarca con otros puntos y desmarca al azar; retorna toggles/s"""
+    hoy = date.today()
+    usuarios = [db.para_usuario(f"usuario_{u:04d}") for u in range(4)]
+    inicio = time.perf_counter()
+    for _ in range(n):
+        gestor = rng.choice(usuarios)
+        fecha = hoy - timedelta(days=rng.randrange(45))
+        habito = f"habito_{rng.randrange(12):02d}"
+        max_puntos = rng.choice((355, 355, 355, 175))
+        if rng.random() < 0.6:
+            gestor.marcar_habito(fecha, habito, 'bloque', rng.choice((10, 20, 30, 40)), max_puntos=max_puntos)
+        else:
+            gestor.desmarcar_habito(fecha, habito, max_puntos=max_puntos)
+    return n / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--toggles", type=int, default=2000)
+    parser.add_argument("--tandas", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.db")
+        db = DatabaseManager(ruta)
+        HistoricalImporter(db).importar(generar_filas(args.usuarios, args.dias))
+        print(f"Tras importar: {len(diferencias(ruta))} días con agregados distintos al recálculo")
+
+        for tanda in range(1, args.tandas + 1):
+            velocidad = toggles_aleatorios(db, args.toggles, rng)
+            malos = diferencias(ruta)
+            print(f"Tanda {tanda}: {args.toggles:,} toggles a {velocidad:,.0f}/s - "
+                  f"{len(malos)} días distintos al recálculo")
+            for fila in malos[:5]:
+                print("   ", fila)
+            if malos:
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark del Búfer de Escrituras
+Repite ráfagas de clics (marcar y desmarcar al azar, con el mismo hábito
+varias veces) directo contra DatabaseManager y a través de WriteBuffer.
+Compara transacciones, tiempo hasta que todo está guardado y verifica que
+ambos caminos dejan el mismo estado final
+
+Uso:
+    python -m benchmarks.bench_write_buffer --rafagas 200 --clics 8
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from database.db_manager import DatabaseManager
+from database.write_buffer import WriteBuffer
+from benchmarks.synthetic_data import cargar_habitos
+
+
+def generar_clics(rafagas: int, clics: int, habitos: list, semilla: int = 7) -> list:
+    """Ráfagas de (hábito, bloque, puntos) elegidos entre pocos hábitos para que se repitan"""
+    rng = random.Random(semilla)
+    return [[rng.choice(habitos[:4]) for _ in range(clics)] for _ in range(rafagas)]
+
+
+def reproducir(db: DatabaseManager, rafagas: list, hoy: date, buffer: WriteBuffer = None) -> float:
+    completados = set(db.obtener_habitos_dia(hoy))
+    inicio = time.perf_counter()
+    for rafaga in rafagas:
+        for habito in rafaga:
+            if habito['id'] in completados:
+                completados.discard(habito['id'])
+                if buffer:
+                    buffer.desmarcar(hoy, habito['id'])
+                else:
+                    db.desmarcar_habito(hoy, habito['id'])
+            else:
+                completados.add(habito['id'])
+                if buffer:
+                    buffer.marcar(hoy, habito['id'], habito['bloque_id'], habito['puntos'])
+                else:
+                    db.marcar_habito(hoy, habito['id'], habito['bloque_id'], habito['puntos'])
+        if buffer:
+            # Fin de la ráfaga: lo que haría el hilo al pasar la ventana
+            buffer.vaciar()
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rafagas", type=int, default=200)
+    parser.add_argument("--clics", type=int, default=8, help="Clics por ráfaga")
+    parser.add_argument("--config", default="config/habitos.json")
+    args = parser.parse_args()
+
+    hoy = date.today()
+    rafagas = generar_clics(args.rafagas, args.clics, cargar_habitos(args.config))
+    total = args.rafagas * args.clics
+    with tempfile.TemporaryDirectory() as tmp:
+        directo = DatabaseManager(os.path.join(tmp, "directo.db"))
+        segundos = reproducir(directo, rafagas, hoy)
+        print(f"{'Directo':<12} {total:>6,} clics  {total:>6,} transacciones  {segundos:.2f}s")
+
+        con_buffer = DatabaseManager(os.path.join(tmp, "buffer.db"))
+        buffer = WriteBuffer(con_buffer)
+        segundos = reproducir(con_buffer, rafagas, hoy, buffer)
+        buffer.cerrar()
+        e = buffer.estadisticas()
+        print(f"{'WriteBuffer':<12} {e['operaciones']:>6,} clics  {e['transacciones']:>6,} transacciones  {segundos:.2f}s  "
+              f"({e['colapsadas']:,} colapsadas)")
+
+        iguales = sorted(directo.obtener_habitos_dia(hoy)) == sorted(con_buffer.obtener_habitos_dia(hoy))
+        print(f"Estado final idéntico: {'sí' if iguales else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
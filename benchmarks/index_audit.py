@@ -0,0 +1,248 @@
+"""
+Auditoría de Índices
+Corre la mezcla real de consultas de la app (sesiones del dashboard, reportes,
+cierre diario y leaderboard) sobre una base sintética grande con el registro
+de consultas activo, y para cada sentencia distinta revisa su EXPLAIN QUERY
+PLAN: marca recorridos completos (SCAN) y ordenamientos en B-tree temporal.
+También marca índices redundantes (prefijo de otro índice o de un UNIQUE) o
+que ninguna consulta usa, y prueba índices candidatos midiendo las consultas
+cuyo plan cambia
+
+Uso:
+    python -m benchmarks.index_audit --usuarios 200 --años 3
+    python -m benchmarks.index_audit --db grande.db --crear
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from database.day_closer import DayCloser
+from database.db_manager import DatabaseManager
+from database.query_log import SlowQueryLog, plan_consulta
+from utils.leaderboard import Leaderboard
+from utils.reports import ReportGenerator
+from utils.validators import HabitValidator
+from benchmarks.load_test import SesionSimulada
+from benchmarks.synthetic_data import cargar_habitos, poblar
+
+# (nombre, tabla, columnas). Sobre el esquema multiusuario las dos propuestas
+# originales, (fecha, puntos) y (habito_id, fecha), llevan usuario_id adelante;
+# también se prueban tal cual para las consultas que cruzan usuarios
+CANDIDATOS = (
+    ('idx_habitos_dia_puntos', 'habitos_completados', 'usuario_id, fecha, puntos'),
+    ('idx_habitos_habito_fecha', 'habitos_completados', 'usuario_id, habito_id, fecha'),
+    ('idx_habitos_fecha_puntos', 'habitos_completados', 'fecha, puntos'),
+    ('idx_habitos_habito', 'habitos_completados', 'habito_id, fecha'),
+)
+
+# Un índice candidato se conserva si alguna consulta que lo usa mejora al menos este factor
+MEJORA_MINIMA = 1.1
+
+
+def ejecutar_mezcla(db: DatabaseManager, config: Dict, sesiones: int, interacciones: int, semilla: int = 7):
+    """Lo que hace la app en producción, sobre usuarios al azar de la base"""
+    rng = random.Random(semilla)
+    usuarios = db.listar_usuarios()
+    validador = HabitValidator(config)
+    habitos = cargar_habitos()
+    hoy = date.today()
+
+    for usuario_id in rng.sample(usuarios, min(sesiones, len(usuarios))):
+        gestor = db.para_usuario(usuario_id)
+        sesion = SesionSimulada(gestor, validador, habitos, hoy, rng)
+        for _ in range(interacciones):
+            sesion.toggle()
+            sesion.rerun()
+        ayer = hoy - timedelta(days=1)
+        ReportGenerator.generar_reporte_diario(gestor, ayer)
+        ReportGenerator.generar_reporte_semanal(gestor, ayer)
+        ReportGenerator.generar_reporte_mensual(gestor, ayer.year, ayer.month)
+        ReportGenerator.generar_reporte_trimestral(gestor, ayer.year)
+        ReportGenerator.generar_reporte_semestral(gestor, ayer.year)
+        ReportGenerator.generar_reporte_anual(gestor, ayer.year)
+        gestor.obtener_habitos_rango(hoy - timedelta(days=90), hoy)
+        gestor.obtener_leaderboard_usuario()
+
+    DayCloser(db).cerrar(hoy + timedelta(days=1))
+    Leaderboard(db)
+    db.expirar_rachas_leaderboard(hoy)
+
+
+def problemas_del_plan(plan: List[str]) -> List[str]:
+    """Recorridos completos de tablas o índices y ordenamientos temporales"""
+    problemas = []
+    for linea in plan:
+        detalle = linea.strip()
+        if detalle.startswith("SCAN ") and "VIRTUAL TABLE" not in detalle and "CONSTANT ROW" not in detalle:
+            problemas.append(detalle)
+        elif "TEMP B-TREE" in detalle:
+            problemas.append(detalle)
+    return problemas
+
+
+def indices(conn: sqlite3.Connection) -> List[Dict]:
+    """Índices de las tablas de la base: nombre, tabla, columnas, origen (c=CREATE INDEX, u=UNIQUE, pk)"""
+    resultado = []
+    tablas = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+    for tabla in tablas:
+        for _, nombre, _, origen, _ in conn.execute(f"PRAGMA index_list('{tabla}')"):
+            columnas = [row[2] for row in conn.execute(f"PRAGMA index_info('{nombre}')")]
+            resultado.append({'nombre': nombre, 'tabla': tabla, 'columnas': columnas, 'origen': origen})
+    return resultado
+
+
+def indices_sospechosos(lista: List[Dict], usados: set) -> List[Tuple[str, str]]:
+    """(índice, motivo) de los índices creados a mano que sobran o que nadie usa"""
+    sospechosos = []
+    for indice in lista:
+        if indice['origen'] != 'c':
+            continue
+        for otro in lista:
+            if (otro is not indice and otro['tabla'] == indice['tabla']
+                    and len(otro['columnas']) >= len(indice['columnas'])
+                    and otro['columnas'][:len(indice['columnas'])] == indice['columnas']):
+                sospechosos.append((indice['nombre'], f"redundante: prefijo de {otro['nombre']} "
+                                                      f"({', '.join(otro['columnas'])})"))
+                break
+        else:
+            if indice['nombre'] not in usados:
+                unicos = [o for o in lista if o['tabla'] == indice['tabla'] and o['origen'] == 'u']
+                motivo = "ninguna consulta de la mezcla lo usa"
+                if unicos:
+                    motivo += f"; las búsquedas van por UNIQUE({', '.join(unicos[0]['columnas'])})"
+                sospechosos.append((indice['nombre'], motivo))
+    return sospechosos
+
+
+def medir_consulta(conn: sqlite3.Connection, sql: str, parametros, repeticiones: int = 20) -> float:
+    """Mediana en ms de ejecutar y consumir una sentencia de lectura"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conn.execute(sql, parametros).fetchall()
+        tiempos.append(time.perf_counter() - inicio)
+    return sorted(tiempos)[len(tiempos) // 2] * 1000
+
+
+def es_lectura(sql: str) -> bool:
+    return bool(re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE)) and "frio." not in sql
+
+
+def probar_candidatos(ruta: str, sentencias: Dict[str, Dict], crear: bool) -> List[Dict]:
+    """
+    Crea cada candidato, vuelve a planificar las lecturas y mide las que pasan
+    a usarlo. Se borra salvo que mejore alguna y se haya pedido --crear
+    """
+    conn = sqlite3.connect(ruta)
+    resultados = []
+    try:
+        lecturas = {sql: datos for sql, datos in sentencias.items() if es_lectura(sql)}
+        for nombre, tabla, columnas in CANDIDATOS:
+            antes = {sql: medir_consulta(conn, sql, datos['parametros']) for sql, datos in lecturas.items()
+                     if datos['plan'] and any(tabla in linea for linea in datos['plan'])}
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla}({columnas})")
+            mejoras = []
+            for sql in antes:
+                plan = plan_consulta(conn, sql, lecturas[sql]['parametros']) or []
+                if any(nombre in linea for linea in plan):
+                    despues = medir_consulta(conn, sql, lecturas[sql]['parametros'])
+                    mejoras.append((sql, antes[sql], despues))
+            util = any(a / d >= MEJORA_MINIMA for _, a, d in mejoras if d > 0)
+            if not (util and crear):
+                conn.execute(f"DROP INDEX {nombre}")
+            conn.commit()
+            resultados.append({'nombre': nombre, 'ddl': f"CREATE INDEX {nombre} ON {tabla}({columnas})",
+                               'mejoras': mejoras, 'util': util})
+    finally:
+        conn.close()
+    return resultados
+
+
+def auditar(ruta: str, config: Dict, sesiones: int, interacciones: int, crear: bool) -> Dict:
+    registro = SlowQueryLog(umbral_ms=float("inf"))
+    DatabaseManager.registro_consultas = registro
+    try:
+        ejecutar_mezcla(DatabaseManager(ruta), config, sesiones, interacciones)
+    finally:
+        DatabaseManager.registro_consultas = None
+
+    conn = sqlite3.connect(ruta)
+    try:
+        sentencias = {}
+        for sql, datos in registro.estadisticas.items():
+            plan = plan_consulta(conn, sql, datos['parametros'])
+            sentencias[sql] = {**datos, 'plan': plan, 'problemas': problemas_del_plan(plan or [])}
+        usados = {nombre for datos in sentencias.values() for linea in datos['plan'] or []
+                  for nombre in re.findall(r"INDEX (\w+)", linea)}
+        lista = indices(conn)
+    finally:
+        conn.close()
+
+    return {
+        'sentencias': sentencias,
+        'sospechosos': indices_sospechosos(lista, usados),
+        'candidatos': probar_candidatos(ruta, sentencias, crear)
+    }
+
+
+def imprimir(resultado: Dict):
+    sentencias = resultado['sentencias']
+    print(f"\n{len(sentencias)} sentencias distintas, "
+          f"{sum(d['llamadas'] for d in sentencias.values()):,} ejecuciones")
+
+    print("\nPlanes con recorridos completos o B-tree temporal (por tiempo acumulado):")
+    marcadas = sorted(((sql, d) for sql, d in sentencias.items() if d['problemas']),
+                      key=lambda par: -par[1]['segundos'])
+    for sql, datos in marcadas:
+        print(f"  {datos['llamadas']:>6} x {datos['segundos'] * 1000 / datos['llamadas']:8.3f} ms  {sql[:110]}")
+        for problema in datos['problemas']:
+            print(f"      - {problema}")
+    if not marcadas:
+        print("  (ninguno)")
+
+    print("\nÍndices sospechosos:")
+    for nombre, motivo in resultado['sospechosos']:
+        print(f"  {nombre}: {motivo}")
+    if not resultado['sospechosos']:
+        print("  (ninguno)")
+
+    print("\nÍndices candidatos:")
+    for candidato in resultado['candidatos']:
+        estado = "ÚTIL" if candidato['util'] else "sin efecto"
+        print(f"  [{estado}] {candidato['ddl']}")
+        for sql, antes, despues in candidato['mejoras']:
+            print(f"      {antes:8.3f} -> {despues:8.3f} ms  {sql[:90]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--años", type=int, default=3)
+    parser.add_argument("--sesiones", type=int, default=20, help="Usuarios que usan la app en la mezcla")
+    parser.add_argument("--interacciones", type=int, default=10, help="Toggles por sesión")
+    parser.add_argument("--db", default=None, help="Base existente (si no, una sintética temporal)")
+    parser.add_argument("--config", default="config/habitos.json")
+    parser.add_argument("--crear", action="store_true", help="Dejar creados los candidatos útiles")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = args.db or os.path.join(tmp, "auditoria.db")
+        if not os.path.exists(ruta):
+            print(f"Base sintética: {poblar(ruta, args.usuarios, args.años, args.config)['filas']:,} filas")
+        imprimir(auditar(ruta, config, args.sesiones, args.interacciones, args.crear))
+
+
+if __name__ == "__main__":
+    main()
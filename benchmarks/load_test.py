@@ -0,0 +1,226 @@
+"""
+Prueba de Carga Concurrente
+Simula muchas sesiones de Streamlit que marcan hábitos a la vez, con hilos
+dentro de varios procesos y tiempos de pensamiento configurables, y reporta
+throughput, latencias p50/p99 y errores `database is locked`
+
+Uso:
+    python -m benchmarks.load_test --procesos 4 --hilos 8 --duracion 20 --pensar 0.5
+    python -m benchmarks.load_test --modo db --procesos 2 --hilos 16 --pensar 0
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+
+from database.db_manager import DatabaseManager
+from utils.metrics import MetricsCalculator
+from utils.validators import HabitValidator
+from benchmarks.synthetic_data import cargar_habitos, poblar, puntos_maximos
+
+MODOS = ('app', 'db')
+
+
+class _ContadorSalida(io.TextIOBase):
+    """
+    Reemplazo de sys.stdout que cuenta los mensajes de error de DatabaseManager
+    (que imprime y retorna False en vez de propagar) sin mostrarlos
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bloqueos = 0
+        self.errores = 0
+
+    def write(self, texto: str) -> int:
+        if texto.startswith("Error"):
+            with self._lock:
+                self.errores += 1
+                if "database is locked" in texto:
+                    self.bloqueos += 1
+        return len(texto)
+
+
+class SesionSimulada:
+    """
+    Una sesión de app.py sin Streamlit: toggle_habito (validar, marcar o
+    desmarcar, refrescar hábitos) seguido de las lecturas de un rerun del
+    dashboard (sidebar, KPIs, grilla y gráfico de tendencia)
+    """
+
+    def __init__(self, db: DatabaseManager, validador: HabitValidator, habitos: List[Dict],
+                 fecha: date, rng: random.Random):
+        self.db = db
+        self.validador = validador
+        self.habitos = habitos
+        self.fecha = fecha
+        self.rng = rng
+        self.maximo = puntos_maximos(habitos)
+        self.completados = db.obtener_habitos_dia(fecha)
+
+    def toggle(self) -> bool:
+        """Marca o desmarca un hábito al azar; retorna False si la escritura falló"""
+        habito = self.rng.choice(self.habitos)
+        if habito['id'] in self.completados:
+            puede, _ = self.validador.validar_desmarcar_habito(habito['id'], self.completados)
+            ok = not puede or self.db.desmarcar_habito(self.fecha, habito['id'], max_puntos=self.maximo)
+        else:
+            puede, _ = self.validador.puede_marcar_habito(habito['id'], self.completados)
+            ok = not puede or self.db.marcar_habito(
+                self.fecha, habito['id'], habito['bloque_id'], habito['puntos'], max_puntos=self.maximo
+            )
+        self.completados = self.db.obtener_habitos_dia(self.fecha)
+        return ok
+
+    def rerun(self):
+        """Lecturas que hace un rerun del dashboard después del toggle"""
+        self.db.obtener_metricas_dia(self.fecha)
+        historico = self.db.obtener_historico(dias=90)
+        MetricsCalculator.calcular_racha_perfecta(historico, 85)
+        MetricsCalculator.calcular_porcentaje_semanal(historico, 85)
+        self.db.obtener_perfil()
+        self.db.obtener_badges_desbloqueados()
+        self.validador.obtener_habitos_bloqueados(self.completados)
+        historico = self.db.obtener_historico(dias=30)
+        MetricsCalculator.analizar_tendencia(historico)
+        MetricsCalculator.calcular_estadisticas_generales(historico)
+
+
+def _ejecutar_proceso(db_path: str, indice: int, hilos: int, usuarios: int, duracion: float,
+                      pensar: float, modo: str, config: str) -> Dict:
+    """Corre `hilos` sesiones durante `duracion` segundos en este proceso"""
+    salida = _ContadorSalida()
+    sys.stdout = salida
+    with open(config, "r", encoding="utf-8") as f:
+        validador = HabitValidator(json.load(f))
+    habitos = cargar_habitos(config)
+    base = DatabaseManager(db_path)
+    hoy = date.today()
+
+    latencias: List[float] = []
+    escrituras: List[float] = []
+    fallos = [0]
+    lock = threading.Lock()
+    fin = time.perf_counter() + duracion
+
+    def sesion(n: int):
+        rng = random.Random(indice * 1000 + n)
+        usuario = f"usuario_{(indice * hilos + n) % usuarios:04d}"
+        simulada = SesionSimulada(base.para_usuario(usuario), validador, habitos, hoy, rng)
+        propias, propias_escritura, propios_fallos = [], [], 0
+        while time.perf_counter() < fin:
+            if pensar:
+                time.sleep(rng.expovariate(1 / pensar))
+            inicio = time.perf_counter()
+            try:
+                ok = simulada.toggle()
+                propias_escritura.append(time.perf_counter() - inicio)
+                if modo == 'app':
+                    simulada.rerun()
+            except Exception as e:
+                # Las lecturas no capturan errores: se cuentan igual que los de escritura
+                salida.write(f"Error en lectura: {e}")
+                ok = False
+            propias.append(time.perf_counter() - inicio)
+            propios_fallos += not ok
+        with lock:
+            latencias.extend(propias)
+            escrituras.extend(propias_escritura)
+            fallos[0] += propios_fallos
+
+    trabajadores = [threading.Thread(target=sesion, args=(n,)) for n in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    sys.stdout = sys.__stdout__
+    return {
+        'latencias': latencias, 'escrituras': escrituras, 'fallos': fallos[0],
+        'errores': salida.errores, 'bloqueos': salida.bloqueos
+    }
+
+
+def _percentil(valores: np.ndarray, p: float) -> float:
+    return float(np.percentile(valores, p)) if len(valores) else 0.0
+
+
+def ejecutar_carga(db_path: str, procesos: int = 2, hilos: int = 8, usuarios: int = 50, duracion: float = 10.0,
+                   pensar: float = 0.5, modo: str = 'app', config: str = "config/habitos.json") -> Dict:
+    """
+    Lanza procesos x hilos sesiones simuladas contra una base
+
+    Args:
+        pensar: Media en segundos del tiempo de pensamiento entre interacciones (exponencial)
+        modo: 'app' (toggle + lecturas del rerun) o 'db' (solo marcar/desmarcar)
+
+    Returns:
+        Dict con sesiones, interacciones, por_segundo, p50/p99 de interacción y
+        de escritura (ms), fallos, errores y bloqueos
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo}")
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        partes = list(pool.map(
+            _ejecutar_proceso, [db_path] * procesos, range(procesos), [hilos] * procesos,
+            [usuarios] * procesos, [duracion] * procesos, [pensar] * procesos,
+            [modo] * procesos, [config] * procesos
+        ))
+    segundos = time.perf_counter() - inicio
+
+    latencias = np.array([x for p in partes for x in p['latencias']]) * 1000
+    escrituras = np.array([x for p in partes for x in p['escrituras']]) * 1000
+    return {
+        'sesiones': procesos * hilos,
+        'interacciones': len(latencias),
+        'por_segundo': len(latencias) / segundos if segundos > 0 else 0.0,
+        'p50_ms': _percentil(latencias, 50),
+        'p99_ms': _percentil(latencias, 99),
+        'escritura_p50_ms': _percentil(escrituras, 50),
+        'escritura_p99_ms': _percentil(escrituras, 99),
+        'fallos': sum(p['fallos'] for p in partes),
+        'errores': sum(p['errores'] for p in partes),
+        'bloqueos': sum(p['bloqueos'] for p in partes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=2)
+    parser.add_argument("--hilos", type=int, default=8, help="Sesiones por proceso")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument("--pensar", type=float, default=0.5, help="Tiempo de pensamiento medio (s)")
+    parser.add_argument("--modo", choices=MODOS, default='app')
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--db", default=None, help="Base existente (si no, una sintética temporal)")
+    parser.add_argument("--config", default="config/habitos.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = args.db or os.path.join(tmp, "carga.db")
+        if not os.path.exists(ruta):
+            print(f"Base sintética: {poblar(ruta, args.usuarios, 1, args.config)['filas']:,} filas")
+        r = ejecutar_carga(ruta, args.procesos, args.hilos, args.usuarios, args.duracion,
+                           args.pensar, args.modo, args.config)
+
+    print(f"{r['sesiones']} sesiones ({args.procesos} procesos x {args.hilos} hilos), modo {args.modo}, "
+          f"pensar {args.pensar}s")
+    print(f"  {r['interacciones']:,} interacciones - {r['por_segundo']:,.1f}/s")
+    print(f"  interacción p50 {r['p50_ms']:.1f} ms  p99 {r['p99_ms']:.1f} ms")
+    print(f"  escritura   p50 {r['escritura_p50_ms']:.1f} ms  p99 {r['escritura_p99_ms']:.1f} ms")
+    print(f"  fallos {r['fallos']}  errores {r['errores']}  'database is locked' {r['bloqueos']}")
+
+
+if __name__ == "__main__":
+    main()
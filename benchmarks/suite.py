@@ -0,0 +1,197 @@
+"""
+Suite de Benchmarks
+Mide con percentiles las operaciones de escritura, lectura, reportes, métricas
+y validación sobre una base sintética, y guarda los resultados en JSON para
+comparar contra una línea base
+
+Uso:
+    python -m benchmarks.suite --usuarios 20 --años 3
+    python -m benchmarks.suite --guardar benchmarks/baselines/main.json
+    python -m benchmarks.suite --comparar benchmarks/baselines/main.json --solo reporte
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from database.db_manager import DatabaseManager
+from utils.metrics import MetricsCalculator
+from utils.reports import ReportGenerator
+from utils.validators import HabitValidator
+from benchmarks.synthetic_data import poblar
+
+PERCENTILES = (50, 90, 99)
+
+# Una regresión es un p50 más lento que la línea base en más de este factor
+UMBRAL_REGRESION = 1.2
+
+
+def medir(funcion: Callable[[int], object], repeticiones: int, calentamiento: int = 3) -> Dict:
+    """
+    Ejecuta funcion(i) `repeticiones` veces y resume las duraciones
+
+    Returns:
+        Dict con n, media_ms, p50_ms, p90_ms, p99_ms y max_ms
+    """
+    for i in range(calentamiento):
+        funcion(i)
+    duraciones = np.empty(repeticiones)
+    for i in range(repeticiones):
+        inicio = time.perf_counter_ns()
+        funcion(i)
+        duraciones[i] = time.perf_counter_ns() - inicio
+    duraciones /= 1e6
+    resumen = {'n': repeticiones, 'media_ms': float(duraciones.mean())}
+    for p, valor in zip(PERCENTILES, np.percentile(duraciones, PERCENTILES)):
+        resumen[f'p{p}_ms'] = float(valor)
+    resumen['max_ms'] = float(duraciones.max())
+    return resumen
+
+
+def casos(db: DatabaseManager, config: Dict) -> List[Tuple[str, Callable[[int], object], int]]:
+    """(nombre, función, repeticiones relativas) de cada operación medida"""
+    hoy = date.today()
+    ayer = hoy - timedelta(days=1)
+    historico = db.obtener_historico(365)
+    completados = db.obtener_habitos_dia(ayer)
+    validador = HabitValidator(config)
+    # marcar inserta un hábito nuevo en un día distinto cada vez; desmarcar lo quita después
+    dias_toggle = [hoy - timedelta(days=i % 60) for i in range(100000)]
+
+    return [
+        ('escritura.marcar_habito',
+         lambda i: db.marcar_habito(dias_toggle[i], 'benchmark', 'benchmark', 10, max_puntos=355), 1),
+        ('escritura.desmarcar_habito',
+         lambda i: db.desmarcar_habito(dias_toggle[i], 'benchmark', max_puntos=355), 1),
+        ('lectura.obtener_historico_30', lambda i: db.obtener_historico(30), 1),
+        ('lectura.obtener_historico_365', lambda i: db.obtener_historico(365), 1),
+        ('reporte.diario', lambda i: ReportGenerator.generar_reporte_diario(db, ayer), 1),
+        ('reporte.semanal', lambda i: ReportGenerator.generar_reporte_semanal(db, ayer), 1),
+        ('reporte.mensual', lambda i: ReportGenerator.generar_reporte_mensual(db, ayer.year, ayer.month), 1),
+        ('reporte.trimestral', lambda i: ReportGenerator.generar_reporte_trimestral(db, ayer.year), 1),
+        ('reporte.semestral', lambda i: ReportGenerator.generar_reporte_semestral(db, ayer.year), 1),
+        ('reporte.anual', lambda i: ReportGenerator.generar_reporte_anual(db, ayer.year), 1),
+        ('metricas.porcentaje_semanal', lambda i: MetricsCalculator.calcular_porcentaje_semanal(historico), 10),
+        ('metricas.racha_perfecta', lambda i: MetricsCalculator.calcular_racha_perfecta(historico), 10),
+        ('metricas.tendencia', lambda i: MetricsCalculator.analizar_tendencia(historico), 10),
+        ('metricas.estadisticas_generales',
+         lambda i: MetricsCalculator.calcular_estadisticas_generales(historico), 10),
+        ('metricas.prediccion_semanal',
+         lambda i: MetricsCalculator.predecir_cumplimiento_semanal(historico), 10),
+        ('validacion.puede_marcar', lambda i: validador.puede_marcar_habito('dota2', completados), 100),
+        ('validacion.bloqueados', lambda i: validador.obtener_habitos_bloqueados(completados), 100),
+        ('validacion.desmarcar',
+         lambda i: validador.validar_desmarcar_habito('peaje_ejercicio', completados), 100),
+    ]
+
+
+def metadatos(args: argparse.Namespace) -> Dict:
+    """Entorno de la ejecución, para saber qué se compara"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'usuarios': args.usuarios,
+        'años': args.años,
+        'repeticiones': args.repeticiones
+    }
+
+
+def comparar(actual: Dict, base: Dict, umbral: float = UMBRAL_REGRESION) -> List[str]:
+    """
+    Imprime la razón p50 actual / p50 base por caso
+
+    Returns:
+        Nombres de los casos con regresión
+    """
+    regresiones = []
+    print(f"\nComparación con {base['meta'].get('commit')} ({base['meta'].get('fecha')})")
+    for nombre, resumen in actual['casos'].items():
+        anterior = base['casos'].get(nombre)
+        if anterior is None:
+            print(f"  {nombre:<36} (nuevo)")
+            continue
+        razon = resumen['p50_ms'] / anterior['p50_ms'] if anterior['p50_ms'] > 0 else float('inf')
+        marca = ""
+        if razon > umbral:
+            marca = "  REGRESIÓN"
+            regresiones.append(nombre)
+        elif razon < 1 / umbral:
+            marca = "  mejora"
+        print(f"  {nombre:<36} {anterior['p50_ms']:>9.3f} -> {resumen['p50_ms']:>9.3f} ms  x{razon:.2f}{marca}")
+    return regresiones
+
+
+def ejecutar(db_path: str, args: argparse.Namespace) -> Dict:
+    """Corre los casos (filtrados por --solo) sobre la base dada"""
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    db = DatabaseManager(db_path).para_usuario("usuario_0000")
+
+    resultados = {}
+    print(f"{'caso':<36} {'n':>6} {'media':>9} " + " ".join(f"{f'p{p}':>9}" for p in PERCENTILES) + f" {'max':>9}")
+    for nombre, funcion, factor in casos(db, config):
+        if args.solo and not any(filtro in nombre for filtro in args.solo):
+            continue
+        resumen = medir(funcion, args.repeticiones * factor)
+        resultados[nombre] = resumen
+        print(f"{nombre:<36} {resumen['n']:>6} {resumen['media_ms']:>9.3f} " +
+              " ".join(f"{resumen[f'p{p}_ms']:>9.3f}" for p in PERCENTILES) + f" {resumen['max_ms']:>9.3f}")
+    return {'meta': metadatos(args), 'casos': resultados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--años", type=int, default=3)
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones base por caso")
+    parser.add_argument("--db", default=None, help="Base sintética existente (si no, se genera una temporal)")
+    parser.add_argument("--config", default="config/habitos.json")
+    parser.add_argument("--solo", nargs="*", help="Solo los casos que contengan alguno de estos textos")
+    parser.add_argument("--guardar", default=None, help="Ruta JSON donde guardar los resultados")
+    parser.add_argument("--comparar", default=None, help="Línea base JSON contra la que comparar")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    args = parser.parse_args()
+
+    if args.db:
+        if not os.path.exists(args.db):
+            print(f"Generando {args.db}: {poblar(args.db, args.usuarios, args.años, args.config)['filas']:,} filas")
+        resultado = ejecutar(args.db, args)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, "suite.db")
+            print(f"Base sintética: {poblar(ruta, args.usuarios, args.años, args.config)['filas']:,} filas")
+            resultado = ejecutar(ruta, args)
+
+    if args.guardar:
+        os.makedirs(os.path.dirname(args.guardar) or ".", exist_ok=True)
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.umbral):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Generador de Datos Sintéticos
+Llena una base de Atomic Tracker con N usuarios x Y años de los hábitos de
+config/habitos.json, con patrones de cumplimiento realistas
+
+Uso:
+    python -m benchmarks.synthetic_data salida.db --usuarios 100 --años 3
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+from database.day_closer import DayCloser
+from database.db_manager import DatabaseManager
+from database.importer import HistoricalImporter
+
+# Franja horaria (desde, hasta) de cada bloque según su posición en la config
+FRANJAS_BLOQUE = ((6, 9), (9, 13), (14, 18), (18, 23), (7, 23))
+
+
+def cargar_habitos(ruta: str = "config/habitos.json") -> List[Dict]:
+    """Hábitos de la config en orden, con su bloque, puntos, requisitos y franja horaria"""
+    with open(ruta, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return [
+        {
+            'id': habito['id'],
+            'bloque_id': bloque['id'],
+            'puntos': habito['puntos'],
+            'requiere': habito.get('requiere', []),
+            'franja': FRANJAS_BLOQUE[posicion % len(FRANJAS_BLOQUE)]
+        }
+        for posicion, bloque in enumerate(config['bloques'])
+        for habito in bloque['habitos']
+    ]
+
+
+def puntos_maximos(habitos: List[Dict]) -> int:
+    """Mismo cálculo que la app: suma de los hábitos con puntos"""
+    return sum(h['puntos'] for h in habitos if h['puntos'] > 0)
+
+
+def generar_filas(usuarios: int, años: int, habitos: List[Dict] = None, semilla: int = 42,
+                  hasta: date = None) -> Iterator[Dict]:
+    """
+    Genera hábitos completados en el formato de HistoricalImporter
+
+    Cada usuario tiene su disciplina y su caída de fin de semana; mejora con
+    el tiempo (formación del hábito), repite con más probabilidad lo que hizo
+    ayer, atraviesa rachas malas ocasionales (viajes, enfermedad), puede
+    unirse a mitad del periodo y respeta los requisitos entre hábitos. Los
+    hábitos que dan más puntos son más difíciles.
+    """
+    rng = random.Random(semilla)
+    habitos = habitos or cargar_habitos()
+    maximo = puntos_maximos(habitos)
+    hasta = hasta or date.today() - timedelta(days=1)
+    dias = 365 * años
+    inicio = hasta - timedelta(days=dias - 1)
+    facilidad = {h['id']: 0.95 - h['puntos'] / 100 for h in habitos}
+
+    for u in range(usuarios):
+        usuario_id = f"usuario_{u:04d}"
+        disciplina = rng.betavariate(5, 3)
+        fin_de_semana = rng.uniform(0.6, 1.0)
+        aprendizaje = rng.uniform(0.0, 0.3)
+        primer_dia = rng.randrange(dias // 2) if rng.random() < 0.3 else 0
+        ayer, mala_racha = set(), 0
+
+        for d in range(primer_dia, dias):
+            fecha = inicio + timedelta(days=d)
+            if mala_racha == 0 and rng.random() < 0.01:
+                mala_racha = rng.randint(3, 14)
+            factor = 0.3 if mala_racha else 1.0
+            mala_racha = max(0, mala_racha - 1)
+            nivel = disciplina * (1 + aprendizaje * d / dias) * factor
+            if fecha.weekday() >= 5:
+                nivel *= fin_de_semana
+
+            hoy = set()
+            for habito in habitos:
+                if not all(r in hoy for r in habito['requiere']):
+                    continue
+                probabilidad = nivel * facilidad[habito['id']] + (0.15 if habito['id'] in ayer else -0.05)
+                if rng.random() >= min(0.98, probabilidad):
+                    continue
+                hoy.add(habito['id'])
+                desde_h, hasta_h = habito['franja']
+                yield {
+                    'usuario_id': usuario_id, 'fecha': fecha.isoformat(), 'habito_id': habito['id'],
+                    'bloque_id': habito['bloque_id'], 'puntos': habito['puntos'], 'max_puntos': maximo,
+                    'hora': f"{rng.randrange(desde_h, hasta_h):02d}:{rng.randrange(60):02d}:00"
+                }
+            ayer = hoy
+
+
+def poblar(db_path: str, usuarios: int, años: int, config: str = "config/habitos.json",
+           semilla: int = 42) -> Dict:
+    """
+    Crea (o completa) una base con datos sintéticos y cierra sus días
+
+    Returns:
+        Dict con filas, usuarios, dias y segundos
+    """
+    inicio = time.perf_counter()
+    db = DatabaseManager(db_path)
+    resultado = HistoricalImporter(db).importar(generar_filas(usuarios, años, cargar_habitos(config), semilla))
+    DayCloser(db).cerrar(todos=True)
+    return {
+        'filas': resultado['filas'],
+        'usuarios': resultado['usuarios'],
+        'dias': resultado['dias'],
+        'segundos': time.perf_counter() - inicio
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db", help="Ruta de la base a llenar")
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--años", type=int, default=3)
+    parser.add_argument("--config", default="config/habitos.json")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    resultado = poblar(args.db, args.usuarios, args.años, args.config, args.semilla)
+    print(f"{resultado['filas']:,} hábitos completados de {resultado['usuarios']} usuarios "
+          f"({resultado['dias']:,} días) en {resultado['segundos']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Fachada Asíncrona de DatabaseManager
+Cada método público de DatabaseManager como corrutina que corre en un pool
+propio de hilos con conexiones reutilizadas por hilo (database.pool), para que
+un servicio asyncio no bloquee su bucle en sqlite3. Las lecturas idénticas que
+coinciden en el tiempo se resuelven con una sola consulta (single-flight)
+
+Uso:
+    adb = AsyncDatabaseManager("database/tracker.db", hilos=4)
+    gestor = await adb.para_usuario("ana")
+    habitos = await gestor.obtener_habitos_dia(date.today())
+    await gestor.marcar_habito(date.today(), "tender_cama", "fase1_arranque", 15)
+    await adb.cerrar()
+"""
+
+import asyncio
+import copy
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from database.db_manager import DatabaseManager
+from database.models import USUARIO_DEFAULT
+from database.pool import PooledDatabaseManager
+
+# Métodos que solo leen: son los únicos que se comparten entre llamadas concurrentes
+PREFIJOS_LECTURA = ('obtener_', 'listar_')
+
+# Métodos que no tocan la base y no se reflejan como corrutinas
+SINCRONOS = ('suscribir',)
+
+
+def _copiar(valor):
+    """Copia de las estructuras que retorna DatabaseManager (listas, dicts y tuplas de escalares)"""
+    if isinstance(valor, list):
+        return [_copiar(x) for x in valor]
+    if isinstance(valor, dict):
+        return {k: _copiar(v) for k, v in valor.items()}
+    return valor
+
+
+class _Vuelos:
+    """Estado compartido por la fachada y los gestores de para_usuario"""
+
+    def __init__(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self.en_vuelo: Dict[tuple, asyncio.Future] = {}
+        # Sube al terminar cada escritura: una lectura pedida después no se une
+        # a una que empezó antes (y podría no ver la escritura)
+        self.generacion = 0
+        self.llamadas = 0
+        self.compartidas = 0
+
+
+class AsyncDatabaseManager:
+    """
+    Espejo asíncrono de DatabaseManager. Las lecturas (obtener_*, listar_*)
+    con los mismos argumentos que ya están en curso esperan el mismo
+    resultado; quien se une recibe una copia, así que puede modificarlo
+    """
+
+    def __init__(self, db_path: str = "database/tracker.db", usuario_id: str = USUARIO_DEFAULT,
+                 hilos: int = 4, db: DatabaseManager = None):
+        """
+        Args:
+            db_path: Ruta de la base (ignorada si se pasa `db`)
+            hilos: Hilos del pool dedicado; cada uno conserva sus conexiones
+            db: Gestor síncrono a envolver (default: PooledDatabaseManager)
+        """
+        self.db = db or PooledDatabaseManager(db_path, usuario_id)
+        self.usuario_id = self.db.usuario_id
+        self._vuelos = _Vuelos(ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="atomic-db-async"))
+
+    async def para_usuario(self, usuario_id: str) -> 'AsyncDatabaseManager':
+        """Fachada sobre el mismo pool ligada a otro usuario (puede crear su perfil)"""
+        gestor = copy.copy(self)
+        gestor.db = await self._ejecutar(self.db.para_usuario, usuario_id)
+        gestor.usuario_id = usuario_id
+        return gestor
+
+    def suscribir(self, callback: Callable[[Dict], None]):
+        """
+        Registra un callback de eventos de escritura que se entrega en el
+        bucle actual (no en el hilo de la base); llamar desde el bucle
+        """
+        loop = asyncio.get_running_loop()
+        self.db.suscribir(lambda evento: loop.call_soon_threadsafe(callback, evento))
+
+    def estadisticas(self) -> Dict:
+        """Llamadas hechas y cuántas se resolvieron con una lectura ya en curso"""
+        return {'llamadas': self._vuelos.llamadas, 'compartidas': self._vuelos.compartidas,
+                'en_vuelo': len(self._vuelos.en_vuelo)}
+
+    async def _ejecutar(self, funcion: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._vuelos.executor, functools.partial(funcion, *args, **kwargs))
+
+    async def _llamar(self, nombre: str, lectura: bool, args: tuple, kwargs: Dict):
+        vuelos = self._vuelos
+        vuelos.llamadas += 1
+        funcion = getattr(self.db, nombre)
+        if not lectura:
+            try:
+                return await self._ejecutar(funcion, *args, **kwargs)
+            finally:
+                vuelos.generacion += 1
+
+        clave = (nombre, self.usuario_id, vuelos.generacion, args, tuple(sorted(kwargs.items())))
+        try:
+            futuro = vuelos.en_vuelo.get(clave)
+        except TypeError:
+            # Argumentos no hashables (por ejemplo una lista de usuarios): sin compartir
+            return await self._ejecutar(funcion, *args, **kwargs)
+        if futuro is not None:
+            vuelos.compartidas += 1
+            return _copiar(await asyncio.shield(futuro))
+
+        futuro = asyncio.ensure_future(self._ejecutar(funcion, *args, **kwargs))
+        vuelos.en_vuelo[clave] = futuro
+        futuro.add_done_callback(lambda _: vuelos.en_vuelo.pop(clave, None))
+        # shield: si este llamador se cancela, los que se unieron siguen esperando
+        return await asyncio.shield(futuro)
+
+    async def cerrar(self):
+        """Espera lo pendiente y cierra el pool de hilos y las conexiones"""
+        await asyncio.get_running_loop().run_in_executor(None, self._vuelos.executor.shutdown, True)
+        if isinstance(self.db, PooledDatabaseManager):
+            self.db.cerrar()
+
+    async def __aenter__(self) -> 'AsyncDatabaseManager':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+
+def _espejo(nombre: str) -> Callable:
+    lectura = nombre.startswith(PREFIJOS_LECTURA)
+
+    async def metodo(self, *args, **kwargs):
+        return await self._llamar(nombre, lectura, args, kwargs)
+
+    original = getattr(DatabaseManager, nombre)
+    metodo.__name__ = nombre
+    metodo.__qualname__ = f"AsyncDatabaseManager.{nombre}"
+    metodo.__doc__ = original.__doc__
+    metodo.__wrapped__ = original
+    return metodo
+
+
+for _nombre, _atributo in list(vars(DatabaseManager).items()):
+    if (not _nombre.startswith('_') and callable(_atributo) and _nombre not in SINCRONOS
+            and _nombre not in vars(AsyncDatabaseManager)):
+        setattr(AsyncDatabaseManager, _nombre, _espejo(_nombre))
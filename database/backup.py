@@ -0,0 +1,260 @@
+"""
+Respaldos en Línea y Snapshot de Solo Lectura
+Usa la API de backup de SQLite por pasos de páginas, cediendo el lock entre
+pasos, para respaldar tracker.db y para mantener una copia de lectura donde
+corren los reportes pesados sin competir con los toggles
+"""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database.db_manager import DatabaseManager
+from database.models import USUARIO_DEFAULT
+
+
+class _DemasiadosReinicios(Exception):
+    pass
+
+
+def copiar_en_linea(origen: str, destino: str, paginas_por_paso: int = 256, pausa: float = 0.005,
+                    max_reinicios: int = 3) -> Dict:
+    """
+    Copia una base de datos en uso a `destino` de forma atómica
+
+    Entre paso y paso se duerme `pausa` segundos sin lock, así un escritor
+    espera como mucho lo que tarda en copiarse un paso de páginas. Cada
+    escritura de otra conexión reinicia la copia; tras `max_reinicios` se
+    termina en un único paso para no quedar persiguiendo a un escritor continuo.
+
+    Returns:
+        Dict con paginas, pasos, reinicios y segundos
+    """
+    temporal = destino + ".tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    estado = {'paginas': 0, 'pasos': 0, 'reinicios': 0, 'restantes': None}
+
+    def progreso(_status, restantes, total):
+        if estado['restantes'] is not None and restantes > estado['restantes']:
+            estado['reinicios'] += 1
+            if estado['reinicios'] > max_reinicios:
+                raise _DemasiadosReinicios()
+        estado.update(paginas=total, restantes=restantes, pasos=estado['pasos'] + 1)
+        if restantes and pausa:
+            time.sleep(pausa)
+
+    inicio = time.perf_counter()
+    fuente = sqlite3.connect(origen)
+    copia = sqlite3.connect(temporal)
+    try:
+        try:
+            fuente.backup(copia, pages=paginas_por_paso, progress=progreso)
+        except _DemasiadosReinicios:
+            fuente.backup(copia, pages=-1)
+            estado['pasos'] += 1
+    finally:
+        copia.close()
+        fuente.close()
+    os.replace(temporal, destino)
+    del estado['restantes']
+    return {**estado, 'segundos': time.perf_counter() - inicio}
+
+
+class SnapshotDatabase(DatabaseManager):
+    """
+    DatabaseManager de solo lectura sobre un snapshot: no crea tablas ni
+    perfiles y abre las conexiones con mode=ro. Sirve para los métodos de
+    lectura (obtener_historico, obtener_metricas_dia, ...) que usa ReportGenerator.
+    """
+
+    def __init__(self, db_path: str, usuario_id: str = USUARIO_DEFAULT):
+        self.db_path = db_path
+        self.usuario_id = usuario_id
+        self._suscriptores = []
+        self._perfiles_creados = set()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self.registro_consultas is not None:
+            conn = self.registro_consultas.conectar(f"file:{self.db_path}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _asegurar_perfil(self):
+        pass
+
+    def obtener_info_snapshot(self) -> Dict:
+        """Momento de creación y origen del snapshot"""
+        conn = self._get_connection()
+        try:
+            row = conn.execute("SELECT creado_en, origen FROM snapshot_info").fetchone()
+            return {'creado_en': datetime.fromisoformat(row['creado_en']), 'origen': row['origen']}
+        finally:
+            conn.close()
+
+
+class BackupManager:
+    """
+    Respaldos rotativos de tracker.db y un snapshot para reportes que se
+    refresca cuando supera una antigüedad máxima
+    """
+
+    def __init__(self, db: DatabaseManager, directorio: str = "database/backups",
+                 paginas_por_paso: int = 256, pausa: float = 0.005, conservar: int = 7):
+        """
+        Args:
+            db: DatabaseManager de la base primaria
+            directorio: Carpeta de respaldos y del snapshot
+            paginas_por_paso: Páginas copiadas por cada paso de la API de backup
+            pausa: Segundos sin lock entre pasos
+            conservar: Número de respaldos que se mantienen
+        """
+        self.db = db
+        self.directorio = directorio
+        self.paginas_por_paso = paginas_por_paso
+        self.pausa = pausa
+        self.conservar = conservar
+        self.ruta_snapshot = os.path.join(directorio, "snapshot.db")
+        os.makedirs(directorio, exist_ok=True)
+        # Un gestor sirve a todas las sesiones: un refresco a la vez, en su propio hilo
+        self._refrescando = threading.Lock()
+        self._lock_hilo = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+
+    # ========================
+    # RESPALDOS
+    # ========================
+
+    def respaldar(self, verificar: bool = True) -> Optional[Dict]:
+        """
+        Crea un respaldo con marca de tiempo y elimina los más antiguos
+
+        Returns:
+            Dict con ruta, paginas, pasos y segundos, o None si falló
+        """
+        destino = os.path.join(self.directorio, f"tracker_{datetime.now():%Y%m%d_%H%M%S}.db")
+        try:
+            resultado = copiar_en_linea(self.db.db_path, destino, self.paginas_por_paso, self.pausa)
+            if verificar:
+                conn = sqlite3.connect(destino)
+                try:
+                    estado = conn.execute("PRAGMA quick_check").fetchone()[0]
+                finally:
+                    conn.close()
+                if estado != "ok":
+                    raise sqlite3.DatabaseError(f"Respaldo corrupto: {estado}")
+        except Exception as e:
+            print(f"Error creando respaldo: {e}")
+            return None
+
+        for antiguo in self.listar_respaldos()[self.conservar:]:
+            os.remove(antiguo)
+        return {'ruta': destino, **resultado}
+
+    def listar_respaldos(self) -> list:
+        """Rutas de los respaldos, del más reciente al más antiguo"""
+        return sorted(glob.glob(os.path.join(self.directorio, "tracker_*.db")), reverse=True)
+
+    # ========================
+    # SNAPSHOT PARA REPORTES
+    # ========================
+
+    def actualizar_snapshot(self) -> Optional[Dict]:
+        """
+        Regenera el snapshot de solo lectura a partir de la base primaria.
+        Los refrescos del mismo gestor se serializan; el temporal lleva el pid
+        para no chocar con otro proceso (ej: el cron con --snapshot)
+        """
+        with self._refrescando:
+            return self._copiar_snapshot(f"{self.ruta_snapshot}.{os.getpid()}.nuevo")
+
+    def _copiar_snapshot(self, temporal: str) -> Optional[Dict]:
+        """Copia la base primaria a `temporal`, la marca y la renombra al snapshot"""
+        try:
+            resultado = copiar_en_linea(self.db.db_path, temporal, self.paginas_por_paso, self.pausa)
+            conn = sqlite3.connect(temporal)
+            try:
+                conn.execute("CREATE TABLE IF NOT EXISTS snapshot_info (creado_en TEXT, origen TEXT)")
+                conn.execute("DELETE FROM snapshot_info")
+                conn.execute(
+                    "INSERT INTO snapshot_info (creado_en, origen) VALUES (?, ?)",
+                    (datetime.now().isoformat(timespec='seconds'), self.db.db_path)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(temporal, self.ruta_snapshot)
+            return resultado
+        except Exception as e:
+            print(f"Error actualizando snapshot: {e}")
+            return None
+
+    def snapshot_para_reportes(self, max_edad: timedelta = timedelta(minutes=15),
+                               usuario_id: str = None) -> DatabaseManager:
+        """
+        Gestor de lectura para reportes: el snapshot existente, o la base
+        primaria si todavía no hay uno. Si tiene más de `max_edad` se regenera
+        en segundo plano y mientras tanto se sigue leyendo el viejo
+
+        Returns:
+            SnapshotDatabase (con obtener_info_snapshot) o el DatabaseManager primario
+        """
+        usuario_id = usuario_id or self.db.usuario_id
+        edad = self.edad_snapshot()
+        if edad is None or edad > max_edad:
+            self.refrescar_en_segundo_plano()
+            if edad is None:
+                return self.db.para_usuario(usuario_id)
+        return SnapshotDatabase(self.ruta_snapshot, usuario_id)
+
+    def refrescar_en_segundo_plano(self) -> bool:
+        """
+        Lanza actualizar_snapshot en un hilo si no hay otro refresco en curso
+
+        Returns:
+            True si se lanzó un refresco nuevo
+        """
+        with self._lock_hilo:
+            if self._hilo is not None and self._hilo.is_alive():
+                return False
+            self._hilo = threading.Thread(target=self.actualizar_snapshot, name="atomic-snapshot", daemon=True)
+            self._hilo.start()
+            return True
+
+    def edad_snapshot(self) -> Optional[timedelta]:
+        """Antigüedad del snapshot, o None si no existe"""
+        if not os.path.exists(self.ruta_snapshot):
+            return None
+        try:
+            creado = SnapshotDatabase(self.ruta_snapshot).obtener_info_snapshot()['creado_en']
+        except (sqlite3.Error, TypeError):
+            return None
+        return datetime.now() - creado
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Respaldo en línea de tracker.db (para cron)")
+    parser.add_argument("--db", default="database/tracker.db")
+    parser.add_argument("--directorio", default="database/backups")
+    parser.add_argument("--conservar", type=int, default=7)
+    parser.add_argument("--snapshot", action="store_true", help="Regenerar también el snapshot de reportes")
+    args = parser.parse_args()
+
+    gestor = BackupManager(DatabaseManager(args.db), args.directorio, conservar=args.conservar)
+    resultado = gestor.respaldar()
+    if resultado:
+        print(f"Respaldo {resultado['ruta']}: {resultado['paginas']} páginas en "
+              f"{resultado['pasos']} pasos, {resultado['segundos']:.2f}s")
+    if args.snapshot and gestor.actualizar_snapshot():
+        print(f"Snapshot actualizado: {gestor.ruta_snapshot}")
+
+
+if __name__ == "__main__":
+    main()
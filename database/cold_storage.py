@@ -0,0 +1,122 @@
+"""
+Almacenamiento Frío por Año
+Mueve los años cerrados de habitos_completados a un archivo SQLite por año,
+que DatabaseManager adjunta solo cuando una consulta llega a ese año
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Dict
+
+from database.models import CREATE_TABLA_FRIA
+
+
+class ColdStorage:
+    """
+    El nivel caliente (tracker.db) conserva los años recientes; cada año
+    archivado queda en `<directorio>/habitos_<año>.db` y se registra en
+    `archivo_anual`. registros no se mueve: es una fila por día y la usan
+    todas las métricas.
+
+    Escribir en un día archivado lo rehidrata al nivel caliente
+    (DatabaseManager._rehidratar_dia); la siguiente ejecución de archivar()
+    lo vuelve a mover.
+    """
+
+    def __init__(self, db, directorio: str = "database/frio", dias_calientes: int = 90):
+        """
+        Args:
+            db: DatabaseManager de la base de datos a escalonar
+            directorio: Carpeta de los archivos por año
+            dias_calientes: Un año se archiva cuando su 31/12 quedó más atrás que esto
+        """
+        self.db = db
+        self.directorio = directorio
+        self.dias_calientes = dias_calientes
+
+    def ruta_año(self, año: int) -> str:
+        return os.path.join(self.directorio, f"habitos_{año}.db")
+
+    def años_archivados(self) -> Dict[int, str]:
+        """Años archivados y su archivo"""
+        conn = self.db._get_connection()
+        try:
+            return {row['año']: row['ruta'] for row in conn.execute("SELECT año, ruta FROM archivo_anual")}
+        finally:
+            conn.close()
+
+    def archivar(self, hoy: date = None, vacuum: bool = False) -> Dict[int, int]:
+        """
+        Mueve al nivel frío los años cerrados que aún tengan filas en caliente
+
+        Args:
+            hoy: Fecha de referencia (default: hoy)
+            vacuum: Compactar tracker.db después de mover filas
+
+        Returns:
+            Dict {año: filas movidas}
+        """
+        ultimo_año = ((hoy or date.today()) - timedelta(days=self.dias_calientes)).year - 1
+        conn = self.db._get_connection()
+        try:
+            años = [
+                int(row['año']) for row in conn.execute("""
+                    SELECT DISTINCT CAST(substr(fecha, 1, 4) AS INTEGER) AS año
+                    FROM habitos_completados
+                    WHERE fecha <= ?
+                """, (f"{ultimo_año:04d}-12-31",))
+            ]
+        finally:
+            conn.close()
+
+        os.makedirs(self.directorio, exist_ok=True)
+        movidas = {}
+        for año in años:
+            try:
+                movidas[año] = self._archivar_año(año)
+            except Exception as e:
+                print(f"Error archivando año {año}: {e}")
+                movidas[año] = 0
+
+        if vacuum and any(movidas.values()):
+            conn = self.db._get_connection()
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+        return movidas
+
+    def _archivar_año(self, año: int) -> int:
+        """Copia y borra un año en una sola transacción (commit atómico entre ambos archivos)"""
+        ruta = self.ruta_año(año)
+        rango = (f"{año:04d}-01-01", f"{año:04d}-12-31")
+        conn = self.db._get_connection()
+        try:
+            conn.execute("ATTACH DATABASE ? AS frio", (ruta,))
+            conn.executescript(CREATE_TABLA_FRIA)
+            conn.execute("BEGIN")
+            # Mover filas no cambia los días: los agregados de registros se quedan como están
+            self.db._pausar_agregados(conn, True)
+            conn.execute("""
+                INSERT OR REPLACE INTO frio.habitos_completados
+                (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at)
+                SELECT usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at
+                FROM main.habitos_completados
+                WHERE fecha BETWEEN ? AND ?
+            """, rango)
+            movidas = conn.execute(
+                "DELETE FROM main.habitos_completados WHERE fecha BETWEEN ? AND ?", rango
+            ).rowcount
+            conn.execute("""
+                INSERT OR REPLACE INTO archivo_anual (año, ruta, filas, archivado_en)
+                VALUES (?, ?, (SELECT COUNT(*) FROM frio.habitos_completados), CURRENT_TIMESTAMP)
+            """, (año, ruta))
+            self.db._pausar_agregados(conn, False)
+            conn.commit()
+            conn.execute("DETACH DATABASE frio")
+            return movidas
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,308 @@
+"""
+Archivo Columnar de Meses Cerrados
+Compacta registros y hábitos completados de meses cerrados en columnas de
+ancho fijo (fechas, puntos, porcentajes, máscara de hábitos) que se leen con
+mmap sin copiar, y las combina con la cola viva de SQLite
+"""
+
+import json
+import mmap
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+
+# Columnas en disco: nombre -> dtype (little-endian, ancho fijo)
+COLUMNAS = {
+    'fechas': np.dtype('<i4'),        # date.toordinal()
+    'puntos': np.dtype('<i4'),
+    'porcentajes': np.dtype('<f8'),
+    'habitos': np.dtype('<u8')        # bit i = meta['habitos'][i] completado
+}
+
+MAX_HABITOS = 64
+
+
+def _primer_dia_mes(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+class ColumnArchive:
+    """
+    Un directorio por usuario con un archivo por columna y un meta.json que
+    marca cuántas filas son válidas y hasta qué fecha llega el archivo.
+    Compactar solo agrega meses completos posteriores al último archivado;
+    meta.json se reemplaza al final, así que una compactación interrumpida
+    se descarta (se truncan las filas sobrantes) en la siguiente.
+    """
+
+    def __init__(self, db, directorio: str = "database/archivo"):
+        """
+        Args:
+            db: DatabaseManager de la base de datos a archivar
+            directorio: Carpeta raíz del archivo columnar
+        """
+        self.db = db
+        self.directorio = directorio
+
+    def _ruta_usuario(self, usuario_id: str) -> str:
+        return os.path.join(self.directorio, quote(usuario_id, safe=''))
+
+    def _leer_meta(self, usuario_id: str) -> Dict:
+        ruta = os.path.join(self._ruta_usuario(usuario_id), "meta.json")
+        if not os.path.exists(ruta):
+            return {'filas': 0, 'hasta': None, 'habitos': [], 'ultimo_evento': 0}
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ========================
+    # COMPACTACIÓN
+    # ========================
+
+    def compactar(self, usuarios: Iterable[str] = None, hoy: date = None) -> Dict[str, int]:
+        """
+        Archiva los meses cerrados (anteriores al mes de `hoy`) aún no archivados
+
+        Args:
+            usuarios: Usuarios a compactar (default: todos)
+            hoy: Fecha de referencia (default: hoy)
+
+        Returns:
+            Dict {usuario_id: días agregados}
+        """
+        limite = _primer_dia_mes(hoy or date.today())
+        usuarios = list(usuarios) if usuarios is not None else self.db.listar_usuarios()
+        agregados = {}
+        for usuario_id in usuarios:
+            try:
+                agregados[usuario_id] = self._compactar_usuario(usuario_id, limite)
+            except Exception as e:
+                print(f"Error compactando archivo de {usuario_id}: {e}")
+                agregados[usuario_id] = 0
+        return agregados
+
+    def _compactar_usuario(self, usuario_id: str, limite: date) -> int:
+        """Agrega al archivo del usuario los días posteriores a meta['hasta'] y anteriores a limite"""
+        meta = self._leer_meta(usuario_id)
+        desde = meta['hasta'] or "0000-00-00"
+        conn = self.db._get_connection()
+        try:
+            # El último evento se lee primero: ediciones posteriores invalidan lo archivado
+            ultimo_evento = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM eventos WHERE usuario_id = ?", (usuario_id,)
+            ).fetchone()[0]
+            registros = conn.execute("""
+                SELECT fecha, puntos_totales, porcentaje_cumplimiento
+                FROM registros
+                WHERE usuario_id = ? AND fecha > ? AND fecha < ?
+                ORDER BY fecha
+            """, (usuario_id, desde, limite.isoformat())).fetchall()
+        finally:
+            conn.close()
+
+        if not registros:
+            return 0
+        # Incluye los años del almacenamiento frío si el rango llega a ellos
+        completados = self.db.para_usuario(usuario_id).obtener_habitos_rango(
+            date.fromisoformat(registros[0]['fecha']), limite - timedelta(days=1)
+        )
+
+        habitos = list(meta['habitos'])
+        mascaras: Dict[str, int] = {}
+        for fila in completados:
+            if fila['habito_id'] not in habitos:
+                if len(habitos) == MAX_HABITOS:
+                    raise ValueError(f"Más de {MAX_HABITOS} hábitos distintos")
+                habitos.append(fila['habito_id'])
+            mascaras[fila['fecha']] = mascaras.get(fila['fecha'], 0) | (1 << habitos.index(fila['habito_id']))
+
+        nuevas = {
+            'fechas': np.array([date.fromisoformat(r['fecha']).toordinal() for r in registros], COLUMNAS['fechas']),
+            'puntos': np.array([r['puntos_totales'] or 0 for r in registros], COLUMNAS['puntos']),
+            'porcentajes': np.array([r['porcentaje_cumplimiento'] or 0.0 for r in registros], COLUMNAS['porcentajes']),
+            'habitos': np.array([mascaras.get(r['fecha'], 0) for r in registros], COLUMNAS['habitos'])
+        }
+
+        ruta = self._ruta_usuario(usuario_id)
+        os.makedirs(ruta, exist_ok=True)
+        for nombre, dtype in COLUMNAS.items():
+            with open(os.path.join(ruta, f"{nombre}.bin"), "ab") as f:
+                f.truncate(meta['filas'] * dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(nuevas[nombre].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta = {
+            'filas': meta['filas'] + len(registros),
+            'hasta': (limite - timedelta(days=1)).isoformat(),
+            'habitos': habitos,
+            'ultimo_evento': ultimo_evento
+        }
+        temporal = os.path.join(ruta, "meta.json.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temporal, os.path.join(ruta, "meta.json"))
+        return len(registros)
+
+    def lector(self, usuario_id: str = None) -> 'ArchiveReader':
+        """Lector mmap + cola viva para un usuario (default: el del gestor)"""
+        return ArchiveReader(self, self.db.para_usuario(usuario_id or self.db.usuario_id))
+
+
+class ArchiveReader:
+    """
+    Histórico de un usuario: meses cerrados desde el archivo (vistas numpy sobre
+    mmap, sin copiar) y el resto desde SQLite. Si hubo ediciones en días ya
+    archivados (eventos posteriores a la compactación), esos días se leen de SQLite.
+
+    Expone obtener_historico(dias) como DatabaseManager y delega el resto de
+    atributos al gestor, así que se puede pasar directamente a ReportGenerator.
+    """
+
+    def __init__(self, archivo: ColumnArchive, db):
+        self.db = db
+        self.meta = archivo._leer_meta(db.usuario_id)
+        self._mmaps: List[mmap.mmap] = []
+        self._columnas: Dict[str, np.ndarray] = {}
+
+        filas = self.meta['filas']
+        ruta = archivo._ruta_usuario(db.usuario_id)
+        for nombre, dtype in COLUMNAS.items():
+            if filas == 0:
+                self._columnas[nombre] = np.empty(0, dtype)
+                continue
+            with open(os.path.join(ruta, f"{nombre}.bin"), "rb") as f:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmaps.append(mapa)
+            self._columnas[nombre] = np.frombuffer(mapa, dtype=dtype, count=filas)
+
+        self._corte = self._calcular_corte()
+
+    def __getattr__(self, nombre):
+        if nombre == 'db':
+            raise AttributeError(nombre)
+        return getattr(self.db, nombre)
+
+    def cerrar(self):
+        """Libera los mapeos de memoria (las vistas ya entregadas los mantienen vivos)"""
+        self._columnas = {nombre: np.empty(0, dtype) for nombre, dtype in COLUMNAS.items()}
+        for mapa in self._mmaps:
+            try:
+                mapa.close()
+            except BufferError:
+                pass  # Se libera cuando se recolecten las vistas
+        self._mmaps = []
+
+    def _calcular_corte(self) -> int:
+        """
+        Ordinal del primer día que NO se puede leer del archivo: el día siguiente
+        a meta['hasta'], o el día editado más antiguo después de la compactación
+        """
+        if not self.meta['hasta']:
+            return 0
+        corte = date.fromisoformat(self.meta['hasta']).toordinal() + 1
+        conn = self.db._get_connection()
+        try:
+            row = conn.execute("""
+                SELECT MIN(fecha) FROM eventos
+                WHERE usuario_id = ? AND id > ? AND fecha <= ?
+            """, (self.db.usuario_id, self.meta['ultimo_evento'], self.meta['hasta'])).fetchone()
+        finally:
+            conn.close()
+        if row[0]:
+            corte = min(corte, date.fromisoformat(row[0]).toordinal())
+        return corte
+
+    @property
+    def habitos(self) -> List[str]:
+        """Orden de los bits de la columna 'habitos' (incluye los de la cola viva)"""
+        return self.meta['habitos']
+
+    def columnas(self, desde: date = None, hasta: date = None) -> Dict[str, np.ndarray]:
+        """
+        Columnas fechas (ordinales), puntos, porcentajes y habitos entre dos fechas
+
+        Si el rango cae completo en el archivo, las columnas son vistas del mmap
+        (sin copia); si no, se concatenan con la cola leída de SQLite.
+        """
+        inicio = desde.toordinal() if desde else 0
+        fin = hasta.toordinal() if hasta else date.max.toordinal()
+
+        fechas = self._columnas['fechas']
+        i = int(np.searchsorted(fechas, inicio, side='left'))
+        j = int(np.searchsorted(fechas, min(fin, self._corte - 1), side='right'))
+        archivadas = {nombre: columna[i:j] for nombre, columna in self._columnas.items()}
+        if fin < self._corte:
+            return archivadas
+
+        cola = self._leer_cola(max(inicio, self._corte), fin)
+        return {nombre: np.concatenate([archivadas[nombre], cola[nombre]]) for nombre in COLUMNAS}
+
+    def _leer_cola(self, inicio: int, fin: int) -> Dict[str, np.ndarray]:
+        """Lee de SQLite los días no archivados del rango (ordinales inclusive)"""
+        desde = date.fromordinal(inicio).isoformat()
+        hasta = date.fromordinal(min(fin, date.max.toordinal())).isoformat()
+        conn = self.db._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            registros = cursor.execute("""
+                SELECT fecha, puntos_totales, porcentaje_cumplimiento
+                FROM registros
+                WHERE usuario_id = ? AND fecha >= ? AND fecha <= ?
+                ORDER BY fecha
+            """, (self.db.usuario_id, desde, hasta)).fetchall()
+        finally:
+            conn.close()
+        completados = [] if not registros else self.db.obtener_habitos_rango(
+            date.fromisoformat(registros[0][0]), date.fromisoformat(registros[-1][0])
+        )
+
+        habitos = self.meta['habitos']
+        mascaras: Dict[str, int] = {}
+        for fila in completados:
+            fecha_iso, habito_id = fila['fecha'], fila['habito_id']
+            if habito_id not in habitos:
+                if len(habitos) == MAX_HABITOS:
+                    continue
+                habitos.append(habito_id)
+            mascaras[fecha_iso] = mascaras.get(fecha_iso, 0) | (1 << habitos.index(habito_id))
+
+        return {
+            'fechas': np.array([date.fromisoformat(f).toordinal() for f, _, _ in registros], COLUMNAS['fechas']),
+            'puntos': np.array([p or 0 for _, p, _ in registros], COLUMNAS['puntos']),
+            'porcentajes': np.array([pct or 0.0 for _, _, pct in registros], COLUMNAS['porcentajes']),
+            'habitos': np.array([mascaras.get(f, 0) for f, _, _ in registros], COLUMNAS['habitos'])
+        }
+
+    def obtener_historico(self, dias: int = 30) -> List[Dict]:
+        """Mismo resultado que DatabaseManager.obtener_historico"""
+        columnas = self.columnas(desde=date.today() - timedelta(days=dias))
+        return [
+            {'fecha': date.fromordinal(f).isoformat(), 'puntos_totales': p, 'porcentaje_cumplimiento': pct}
+            for f, p, pct in zip(columnas['fechas'].tolist(), columnas['puntos'].tolist(),
+                                 columnas['porcentajes'].tolist())
+        ]
+
+    def matriz_habitos(self, desde: date = None, hasta: date = None,
+                       habitos: Optional[List[str]] = None) -> Dict:
+        """
+        Matriz día x hábito de completados (bool) a partir de las máscaras
+
+        Returns:
+            Dict con fechas (ordinales), habitos (ids) y matriz numpy [días, hábitos]
+        """
+        columnas = self.columnas(desde, hasta)
+        habitos = habitos or list(self.habitos)
+        bits = np.array([self.habitos.index(h) if h in self.habitos else MAX_HABITOS for h in habitos],
+                        dtype=np.uint64)
+        # Bits fuera de rango (hábito nunca completado) quedan en falso
+        validos = bits < MAX_HABITOS
+        matriz = np.zeros((len(columnas['fechas']), len(habitos)), dtype=bool)
+        if validos.any():
+            desplazadas = columnas['habitos'][:, None] >> bits[validos][None, :]
+            matriz[:, validos] = (desplazadas & np.uint64(1)).astype(bool)
+        return {'fechas': columnas['fechas'], 'habitos': habitos, 'matriz': matriz}
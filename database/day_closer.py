@@ -0,0 +1,209 @@
+"""
+Cierre Diario del Perfil
+Finaliza los días cerrados (fecha < hoy) de todos los usuarios: recalcula por
+conjuntos puntos, días activos y nivel del perfil y desbloquea badges, en
+transacciones por lotes y una sola vez por día gracias a una marca de agua
+
+Uso (cron, después de medianoche):
+    python -m database.day_closer
+    python -m database.day_closer --hoy 2025-03-01 --lote 2000
+"""
+
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from database.db_manager import DatabaseManager
+from utils.gamification import BADGES, SEÑALES_RACHA_HABITO, GamificationSystem
+
+
+class DayCloser:
+    """
+    El perfil se deriva de registros (días <= cerrado_hasta), nunca se le suman
+    deltas: repetir el cierre o retomarlo tras una caída deja el mismo resultado.
+    La marca de agua de `cierre_dia` (último día cerrado y último id de eventos
+    visto) limita cada ejecución a los usuarios afectados: los que tienen días
+    nuevos por cerrar o ediciones en días ya cerrados.
+    """
+
+    def __init__(self, db: DatabaseManager, tamaño_lote: int = 1000, badges: Dict = None):
+        """
+        Args:
+            db: DatabaseManager de la base de datos a cerrar
+            tamaño_lote: Usuarios por transacción
+            badges: Definición de badges (default: BADGES)
+        """
+        self.db = db
+        self.tamaño_lote = tamaño_lote
+        self.badges = badges or BADGES
+
+    def marca_de_agua(self) -> Dict:
+        """Último día cerrado (o None) y último evento incorporado"""
+        conn = self.db._get_connection()
+        try:
+            row = conn.execute("SELECT cerrado_hasta, ultimo_evento FROM cierre_dia WHERE id = 1").fetchone()
+        finally:
+            conn.close()
+        if row is None or row['cerrado_hasta'] is None:
+            return {'cerrado_hasta': None, 'ultimo_evento': 0}
+        return {'cerrado_hasta': date.fromisoformat(row['cerrado_hasta']), 'ultimo_evento': row['ultimo_evento']}
+
+    def hasta_vigente(self, hoy: date = None) -> date:
+        """Último día que cuenta para el perfil: ayer, o la marca de agua si ya se cerró más adelante"""
+        hasta = (hoy or date.today()) - timedelta(days=1)
+        cerrado_hasta = self.marca_de_agua()['cerrado_hasta']
+        return max(hasta, cerrado_hasta) if cerrado_hasta else hasta
+
+    def cerrar(self, hoy: date = None, todos: bool = False) -> Dict:
+        """
+        Cierra los días hasta ayer y avanza la marca de agua
+
+        Args:
+            hoy: Fecha de referencia (default: hoy)
+            todos: Reconciliar todos los usuarios aunque no tengan cambios
+
+        Returns:
+            Dict con hasta, usuarios, lotes, badges y segundos
+        """
+        inicio = time.perf_counter()
+        marca = self.marca_de_agua()
+        hasta = self.hasta_vigente(hoy)
+
+        conn = self.db._get_connection()
+        try:
+            ultimo_evento = conn.execute("SELECT COALESCE(MAX(id), 0) FROM eventos").fetchone()[0]
+            if todos or marca['cerrado_hasta'] is None:
+                usuarios = [row[0] for row in conn.execute("SELECT usuario_id FROM perfil")]
+            else:
+                usuarios = [row[0] for row in conn.execute("""
+                    SELECT usuario_id FROM eventos
+                    WHERE id > ? AND id <= ? AND fecha <= ?
+                    UNION
+                    SELECT usuario_id FROM registros
+                    WHERE fecha > ? AND fecha <= ?
+                """, (marca['ultimo_evento'], ultimo_evento, hasta.isoformat(),
+                      marca['cerrado_hasta'].isoformat(), hasta.isoformat()))]
+        finally:
+            conn.close()
+
+        resultado = self.reconciliar(usuarios, hasta)
+
+        # La marca solo avanza cuando todos los lotes quedaron confirmados
+        conn = self.db._get_connection()
+        try:
+            conn.execute("""
+                INSERT INTO cierre_dia (id, cerrado_hasta, ultimo_evento, cerrado_en)
+                VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(id) DO UPDATE SET
+                    cerrado_hasta = excluded.cerrado_hasta,
+                    ultimo_evento = excluded.ultimo_evento,
+                    cerrado_en = excluded.cerrado_en
+            """, (hasta.isoformat(), ultimo_evento))
+            conn.commit()
+        finally:
+            conn.close()
+
+        return {'hasta': hasta.isoformat(), **resultado, 'segundos': time.perf_counter() - inicio}
+
+    def reconciliar(self, usuarios: List[str], hasta: Optional[date] = None) -> Dict:
+        """
+        Recalcula perfil y badges de los usuarios dados con sus días <= hasta
+        (default: hasta_vigente), un lote por transacción (sin tocar la marca de agua)
+
+        Returns:
+            Dict con usuarios, lotes y badges (desbloqueos nuevos)
+        """
+        hasta = hasta or self.hasta_vigente()
+        lotes, badges = 0, 0
+        conn = self.db._get_connection()
+        try:
+            for i in range(0, len(usuarios), self.tamaño_lote):
+                lote = json.dumps(usuarios[i:i + self.tamaño_lote])
+                conn.execute("BEGIN")
+                self._actualizar_perfiles(conn, lote, hasta)
+                badges += self._desbloquear_badges(conn, lote)
+                conn.commit()
+                lotes += 1
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return {'usuarios': len(usuarios), 'lotes': lotes, 'badges': badges}
+
+    @staticmethod
+    def _actualizar_perfiles(conn, lote: str, hasta: date):
+        """
+        Puntos, días activos y nivel desde registros para el lote (arreglo JSON),
+        en la transacción de quien llama (también el importador y el replay)
+        """
+        conn.execute("INSERT OR IGNORE INTO perfil (usuario_id) SELECT value FROM json_each(?)", (lote,))
+        conn.execute(f"""
+            UPDATE perfil
+            SET puntos_totales = t.total,
+                dias_activos = t.activos,
+                nivel = {GamificationSystem.sql_nivel('t.total')},
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT u.value AS usuario_id,
+                       COALESCE(SUM(r.puntos_totales), 0) AS total,
+                       COALESCE(SUM(r.puntos_totales > 0), 0) AS activos
+                FROM json_each(?) u
+                LEFT JOIN registros r ON r.usuario_id = u.value AND r.fecha <= ?
+                GROUP BY u.value
+            ) t
+            WHERE perfil.usuario_id = t.usuario_id
+        """, (lote, hasta.isoformat()))
+
+    def _desbloquear_badges(self, conn, lote: str) -> int:
+        """
+        Lee las señales de todo el lote en una consulta (las mismas que
+        BadgeEngine._leer_señales) y registra los badges que cumplen su criterio
+
+        Returns:
+            Número de desbloqueos nuevos
+        """
+        rachas = list(SEÑALES_RACHA_HABITO.items())
+        columnas = "".join(
+            f", COALESCE(MAX(CASE WHEN r.habito_id = ? THEN r.racha_actual END), 0) AS {señal}"
+            for _, señal in rachas
+        )
+        cursor = conn.execute(f"""
+            SELECT p.usuario_id, p.dias_activos, COALESCE(l.racha_perfecta, 0) AS racha_perfecta{columnas}
+            FROM perfil p
+            LEFT JOIN leaderboard l ON l.usuario_id = p.usuario_id
+            LEFT JOIN rachas r ON r.usuario_id = p.usuario_id
+            WHERE p.usuario_id IN (SELECT value FROM json_each(?))
+            GROUP BY p.usuario_id
+        """, [habito_id for habito_id, _ in rachas] + [lote])
+
+        desbloqueos = [
+            (row['usuario_id'], badge_id)
+            for row in cursor.fetchall()
+            for badge_id, info in self.badges.items()
+            if info['criterio'](dict(row))
+        ]
+        antes = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO badges_desbloqueados (usuario_id, badge_id) VALUES (?, ?)", desbloqueos
+        )
+        return conn.total_changes - antes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="database/tracker.db")
+    parser.add_argument("--hoy", type=date.fromisoformat, default=None)
+    parser.add_argument("--lote", type=int, default=1000, help="Usuarios por transacción")
+    parser.add_argument("--todos", action="store_true", help="Reconciliar todos los usuarios")
+    args = parser.parse_args()
+
+    resultado = DayCloser(DatabaseManager(args.db), tamaño_lote=args.lote).cerrar(args.hoy, todos=args.todos)
+    print(f"Cerrado hasta {resultado['hasta']}: {resultado['usuarios']:,} usuarios en "
+          f"{resultado['lotes']} lotes, {resultado['badges']} badges nuevos, {resultado['segundos']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,47 @@ Maneja todas las operaciones CRUD del sistema
 
 import sqlite3
 import os
+import json
+import copy
+import uuid
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Tuple, Optional
-from database.models import CREATE_TABLES
+from typing import List, Dict, Tuple, Optional, Iterable, Callable
+from database.models import (
+    CREATE_TABLES, USUARIO_DEFAULT, META_DIARIA,
+    MIGRACION_MULTIUSUARIO_PREVIA, MIGRACION_MULTIUSUARIO_DATOS, RECONSTRUIR_LEADERBOARD,
+    MIGRACION_AGREGADOS, RELLENAR_AGREGADOS, MIGRACION_EVENTOS_CLIENTE,
+    MIGRACION_CLAVE_POR_USUARIO_PREVIA, MIGRACION_CLAVE_POR_USUARIO_DATOS, VERSION_ESQUEMA
+)
 
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "database/tracker.db"):
-        """Inicializa la conexión a la base de datos"""
+    # SlowQueryLog (database.query_log) que mide las sentencias de todas las conexiones, o None
+    registro_consultas = None
+
+    def __init__(self, db_path: str = "database/tracker.db", usuario_id: str = USUARIO_DEFAULT):
+        """Inicializa la conexión a la base de datos para un usuario"""
         self.db_path = db_path
+        self.usuario_id = usuario_id
+        self._suscriptores: List[Callable[[Dict], None]] = []
+        self._perfiles_creados = set()  # Compartido con los gestores de para_usuario
         # Crear carpeta si no existe
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self._init_database()
+        self._asegurar_perfil()
+    
+    def para_usuario(self, usuario_id: str) -> 'DatabaseManager':
+        """Retorna un gestor sobre la misma base de datos ligado a otro usuario"""
+        gestor = copy.copy(self)
+        gestor.usuario_id = usuario_id
+        gestor._asegurar_perfil()
+        return gestor
     
     def _get_connection(self) -> sqlite3.Connection:
         """Crea una conexión a la base de datos"""
-        conn = sqlite3.connect(self.db_path)
+        if self.registro_consultas is not None:
+            conn = self.registro_consultas.conectar(self.db_path)
+        else:
+            conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row  # Permite acceder por nombre de columna
         return conn
     
@@ -28,11 +53,166 @@ class DatabaseManager:
         """Inicializa las tablas de la base de datos"""
         conn = self._get_connection()
         try:
-            conn.executescript(CREATE_TABLES)
+            if conn.execute("PRAGMA user_version").fetchone()[0] == VERSION_ESQUEMA:
+                return  # Esquema al día: ni DDL ni chequeos de migración
+            
+            columnas = [row['name'] for row in conn.execute("PRAGMA table_info(registros)")]
+            if columnas and 'usuario_id' not in columnas:
+                # Base de datos de un solo usuario: migrar al esquema multiusuario
+                conn.executescript(
+                    "BEGIN;" + MIGRACION_MULTIUSUARIO_PREVIA + CREATE_TABLES +
+                    MIGRACION_MULTIUSUARIO_DATOS + "COMMIT;"
+                )
+            elif columnas and 'total_habitos' not in columnas:
+                # Base anterior a los triggers de agregados: agregar sus columnas
+                conn.executescript("BEGIN;" + MIGRACION_AGREGADOS + CREATE_TABLES + "COMMIT;")
+            else:
+                conn.executescript(CREATE_TABLES)
+            conn.commit()
+            
+            if columnas and 'total_habitos' not in columnas:
+                self._rellenar_agregados(conn)
+                conn.commit()
+            
+            if 'cliente_ts' not in [row['name'] for row in conn.execute("PRAGMA table_info(eventos)")]:
+                conn.executescript(MIGRACION_EVENTOS_CLIENTE)
+            
+            if self._clave_global(conn):
+                # Log anterior a las claves de idempotencia por usuario
+                conn.executescript(
+                    "BEGIN;" + MIGRACION_CLAVE_POR_USUARIO_PREVIA + CREATE_TABLES +
+                    MIGRACION_CLAVE_POR_USUARIO_DATOS + "COMMIT;"
+                )
+            
+            # Bases con histórico previo al log de eventos: sembrarlo una vez
+            if conn.execute("SELECT 1 FROM eventos LIMIT 1").fetchone() is None and \
+                    conn.execute("SELECT 1 FROM habitos_completados LIMIT 1").fetchone() is not None:
+                self._sembrar_eventos(conn)
+                conn.commit()
+            
+            # Bases con histórico previo al leaderboard: poblarlo una vez
+            if conn.execute("SELECT 1 FROM leaderboard LIMIT 1").fetchone() is None and \
+                    conn.execute("SELECT 1 FROM registros LIMIT 1").fetchone() is not None:
+                self._reconstruir_leaderboard(conn)
+                conn.commit()
+            
+            conn.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _clave_global(conn: sqlite3.Connection) -> bool:
+        """True si eventos todavía tiene clave_idempotencia única entre todos los usuarios"""
+        for indice in conn.execute("PRAGMA index_list(eventos)").fetchall():
+            if indice['unique']:
+                columnas = [row['name'] for row in conn.execute(f"PRAGMA index_info('{indice['name']}')")]
+                if columnas == ['clave_idempotencia']:
+                    return True
+        return False
+    
+    def _sembrar_eventos(self, conn: sqlite3.Connection):
+        """
+        Genera eventos 'marcar' sintéticos a partir de habitos_completados para
+        bases creadas antes del log. max_puntos se deduce del porcentaje del día
+        cuando es posible (si no, se usa el máximo deducido del usuario o 175).
+        """
+        max_por_usuario: Dict[str, int] = {}
+        max_por_dia: Dict[Tuple[str, str], int] = {}
+        for row in conn.execute("""
+            SELECT usuario_id, fecha, puntos_totales, porcentaje_cumplimiento
+            FROM registros
+            WHERE porcentaje_cumplimiento > 0 AND porcentaje_cumplimiento < 100
+        """):
+            deducido = int(round(row['puntos_totales'] * 100 / row['porcentaje_cumplimiento']))
+            max_por_dia[(row['usuario_id'], row['fecha'])] = deducido
+            max_por_usuario[row['usuario_id']] = deducido
+        
+        filas = conn.execute("""
+            SELECT usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado
+            FROM habitos_completados
+            ORDER BY usuario_id, fecha, hora_completado, id
+        """).fetchall()
+        conn.executemany("""
+            INSERT OR IGNORE INTO eventos
+            (usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora, clave_idempotencia)
+            VALUES (?, 'marcar', ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            (row['usuario_id'], row['fecha'], row['habito_id'], row['bloque_id'], row['puntos'],
+             max_por_dia.get((row['usuario_id'], row['fecha']), max_por_usuario.get(row['usuario_id'], 175)),
+             row['hora_completado'], f"sembrado:{row['usuario_id']}:{row['fecha']}:{row['habito_id']}")
+            for row in filas
+        ))
+    
+    def _rellenar_agregados(self, conn: sqlite3.Connection):
+        """Calcula total_habitos y max_puntos de los días existentes, incluidos los años fríos"""
+        conn.execute(RELLENAR_AGREGADOS)
+        for año in conn.execute("SELECT año, ruta FROM archivo_anual").fetchall():
+            conn.execute("ATTACH DATABASE ? AS frio", (año['ruta'],))
+            try:
+                conn.execute("""
+                    UPDATE registros SET total_habitos = total_habitos + f.total
+                    FROM (
+                        SELECT usuario_id, fecha, COUNT(*) AS total
+                        FROM frio.habitos_completados
+                        GROUP BY usuario_id, fecha
+                    ) f
+                    WHERE registros.usuario_id = f.usuario_id AND registros.fecha = f.fecha
+                      AND NOT EXISTS (
+                          SELECT 1 FROM main.habitos_completados h
+                          WHERE h.usuario_id = f.usuario_id AND h.fecha = f.fecha
+                      )
+                """)
+                conn.commit()
+            finally:
+                conn.execute("DETACH DATABASE frio")
+    
+    @staticmethod
+    def _pausar_agregados(conn: sqlite3.Connection, pausa: bool):
+        """
+        Enciende o apaga los triggers de agregados dentro de la transacción en
+        curso. Quien la enciende debe apagarla antes del COMMIT.
+        """
+        conn.execute("UPDATE agregados_pausa SET activa = ?", (int(pausa),))
+    
+    def _asegurar_perfil(self):
+        """Crea el perfil del usuario si no existe"""
+        if self.usuario_id in self._perfiles_creados:
+            return
+        conn = self._get_connection()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO perfil (usuario_id) VALUES (?)",
+                (self.usuario_id,)
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO leaderboard (usuario_id) VALUES (?)",
+                (self.usuario_id,)
+            )
             conn.commit()
+            self._perfiles_creados.add(self.usuario_id)
         finally:
             conn.close()
     
+    # ========================
+    # EVENTOS DE ESCRITURA
+    # ========================
+    
+    def suscribir(self, callback: Callable[[Dict], None]):
+        """
+        Registra una función que recibe cada evento de escritura confirmado
+        (compartida por todos los gestores obtenidos con para_usuario)
+        """
+        self._suscriptores.append(callback)
+    
+    def _notificar(self, evento: Dict):
+        """Entrega un evento a los suscriptores sin afectar la escritura"""
+        for callback in list(self._suscriptores):
+            try:
+                callback(evento)
+            except Exception as e:
+                print(f"Error notificando evento: {e}")
+    
     # ========================
     # OPERACIONES DE REGISTRO
     # ========================
@@ -42,8 +222,8 @@ class DatabaseManager:
         conn = self._get_connection()
         try:
             conn.execute(
-                "INSERT OR IGNORE INTO registros (fecha) VALUES (?)",
-                (fecha.isoformat(),)
+                "INSERT OR IGNORE INTO registros (usuario_id, fecha) VALUES (?, ?)",
+                (self.usuario_id, fecha.isoformat())
             )
             conn.commit()
             return True
@@ -53,93 +233,347 @@ class DatabaseManager:
         finally:
             conn.close()
     
-    def marcar_habito(self, fecha: date, habito_id: str, bloque_id: str, puntos: int, max_puntos: int = 175) -> bool:
-        """Marca un hábito como completado"""
+    def _registrar_evento(self, conn: sqlite3.Connection, tipo: str, fecha: date, habito_id: str,
+                          bloque_id: Optional[str], puntos: int, max_puntos: int, hora: str,
+                          clave_idempotencia: Optional[str], cliente_ts: Optional[str] = None) -> bool:
+        """
+        Agrega la operación al log inmutable de eventos
+        Retorna: False si el usuario ya había registrado la clave de idempotencia
+        """
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO eventos
+            (usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora, clave_idempotencia, cliente_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (self.usuario_id, tipo, fecha.isoformat(), habito_id, bloque_id, puntos, max_puntos, hora,
+              clave_idempotencia or uuid.uuid4().hex, cliente_ts))
+        return cursor.rowcount == 1
+    
+    def _marcar(self, conn: sqlite3.Connection, fecha: date, habito_id: str, bloque_id: str, puntos: int,
+                max_puntos: int, hora: str, clave_idempotencia: Optional[str],
+                cliente_ts: Optional[str] = None) -> Optional[Dict]:
+        """
+        Marca un hábito dentro de la transacción en curso (el día ya rehidratado)
+        Retorna: el evento a notificar tras el COMMIT, o None si la clave ya estaba aplicada
+        """
+        # Asegurar que existe el registro del día (en la misma transacción)
+        conn.execute(
+            "INSERT OR IGNORE INTO registros (usuario_id, fecha) VALUES (?, ?)",
+            (self.usuario_id, fecha.isoformat())
+        )
+        
+        if not self._registrar_evento(conn, 'marcar', fecha, habito_id, bloque_id, puntos,
+                                      max_puntos, hora, clave_idempotencia, cliente_ts):
+            return None  # Operación ya aplicada
+        
+        anterior = self._preparar_dia(conn, fecha, max_puntos)
+        
+        # Insertar o actualizar el hábito completado (los triggers actualizan registros)
+        conn.execute("""
+            INSERT INTO habitos_completados 
+            (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(usuario_id, fecha, habito_id) DO UPDATE SET
+                bloque_id = excluded.bloque_id,
+                puntos = excluded.puntos,
+                hora_completado = excluded.hora_completado
+        """, (self.usuario_id, fecha.isoformat(), habito_id, bloque_id, puntos, hora))
+        
+        # Actualizar racha
+        racha_habito = self._actualizar_racha(conn, habito_id, fecha)
+        
+        # Métricas del día ya actualizadas por los triggers
+        metricas = self._aplicar_metricas_dia(conn, fecha, anterior)
+        return {
+            'tipo': 'marcar', 'usuario_id': self.usuario_id, 'fecha': fecha.isoformat(),
+            'habito_id': habito_id, 'puntos_habito': puntos, 'racha_habito': racha_habito, **metricas
+        }
+    
+    def _desmarcar(self, conn: sqlite3.Connection, fecha: date, habito_id: str, max_puntos: int, hora: str,
+                   clave_idempotencia: Optional[str], cliente_ts: Optional[str] = None) -> Optional[Dict]:
+        """
+        Desmarca un hábito dentro de la transacción en curso (el día ya rehidratado)
+        Retorna: el evento a notificar tras el COMMIT, o None si la clave ya estaba aplicada
+        """
+        if not self._registrar_evento(conn, 'desmarcar', fecha, habito_id, None, 0, max_puntos,
+                                      hora, clave_idempotencia, cliente_ts):
+            return None  # Operación ya aplicada
+        
+        anterior = self._preparar_dia(conn, fecha, max_puntos)
+        
+        conn.execute("""
+            DELETE FROM habitos_completados 
+            WHERE usuario_id = ? AND fecha = ? AND habito_id = ?
+        """, (self.usuario_id, fecha.isoformat(), habito_id))
+        
+        # Métricas del día ya actualizadas por los triggers
+        metricas = self._aplicar_metricas_dia(conn, fecha, anterior)
+        return {
+            'tipo': 'desmarcar', 'usuario_id': self.usuario_id, 'fecha': fecha.isoformat(),
+            'habito_id': habito_id, **metricas
+        }
+    
+    def marcar_habito(self, fecha: date, habito_id: str, bloque_id: str, puntos: int, max_puntos: int = 175,
+                      clave_idempotencia: Optional[str] = None) -> bool:
+        """
+        Marca un hábito como completado
+        Reintentos con la misma clave_idempotencia se aplican una sola vez
+        """
+        hora = datetime.now().time().isoformat()
         conn = self._get_connection()
         try:
-            # Asegurar que existe el registro del día
-            self.crear_registro_dia(fecha)
-            
-            # Insertar o actualizar el hábito completado
-            conn.execute("""
-                INSERT OR REPLACE INTO habitos_completados 
-                (fecha, habito_id, bloque_id, puntos, hora_completado)
-                VALUES (?, ?, ?, ?, ?)
-            """, (fecha.isoformat(), habito_id, bloque_id, puntos, datetime.now().time().isoformat()))
-            
-            # Actualizar racha
-            self._actualizar_racha(conn, habito_id, fecha)
-            
-            # Recalcular métricas del día
-            self._recalcular_metricas_dia(conn, fecha, max_puntos)
-            
+            self._rehidratar_dia(conn, fecha)
+            evento = self._marcar(conn, fecha, habito_id, bloque_id, puntos, max_puntos, hora, clave_idempotencia)
+            if evento is None:
+                return True  # Operación ya aplicada
             conn.commit()
-            return True
         except Exception as e:
             print(f"Error marcando hábito: {e}")
             conn.rollback()
             return False
         finally:
             conn.close()
+        
+        self._notificar(evento)
+        return True
     
-    def desmarcar_habito(self, fecha: date, habito_id: str, max_puntos: int = 175) -> bool:
-        """Desmarca un hábito"""
+    def desmarcar_habito(self, fecha: date, habito_id: str, max_puntos: int = 175,
+                         clave_idempotencia: Optional[str] = None) -> bool:
+        """
+        Desmarca un hábito
+        Reintentos con la misma clave_idempotencia se aplican una sola vez
+        """
         conn = self._get_connection()
         try:
-            conn.execute("""
-                DELETE FROM habitos_completados 
-                WHERE fecha = ? AND habito_id = ?
-            """, (fecha.isoformat(), habito_id))
-            
-            # Recalcular métricas
-            self._recalcular_metricas_dia(conn, fecha, max_puntos)
-            
+            self._rehidratar_dia(conn, fecha)
+            evento = self._desmarcar(conn, fecha, habito_id, max_puntos, datetime.now().time().isoformat(),
+                                     clave_idempotencia)
+            if evento is None:
+                return True  # Operación ya aplicada
             conn.commit()
-            return True
         except Exception as e:
             print(f"Error desmarcando hábito: {e}")
+            conn.rollback()
             return False
         finally:
             conn.close()
+        
+        self._notificar(evento)
+        return True
     
     def obtener_habitos_dia(self, fecha: date) -> List[str]:
         """Obtiene los IDs de hábitos completados en una fecha"""
         conn = self._get_connection()
         try:
+            if self._años_frios(conn, fecha, fecha):
+                return [fila['habito_id'] for fila in self._habitos_rango(conn, fecha, fecha)]
             cursor = conn.execute("""
                 SELECT habito_id FROM habitos_completados 
-                WHERE fecha = ?
-            """, (fecha.isoformat(),))
+                WHERE usuario_id = ? AND fecha = ?
+            """, (self.usuario_id, fecha.isoformat()))
             return [row['habito_id'] for row in cursor.fetchall()]
         finally:
             conn.close()
     
+    def obtener_habitos_rango(self, desde: date, hasta: date) -> List[Dict]:
+        """
+        Hábitos completados entre dos fechas (inclusive), ordenados por fecha.
+        Solo adjunta archivos fríos si el rango toca años archivados.
+        """
+        conn = self._get_connection()
+        try:
+            return self._habitos_rango(conn, desde, hasta)
+        finally:
+            conn.close()
+    
+    # ========================
+    # ALMACENAMIENTO FRÍO
+    # ========================
+    
+    @staticmethod
+    def _años_frios(conn: sqlite3.Connection, desde: date, hasta: date) -> List[sqlite3.Row]:
+        """Años archivados (año, ruta) que intersectan el rango"""
+        return conn.execute(
+            "SELECT año, ruta FROM archivo_anual WHERE año BETWEEN ? AND ? ORDER BY año",
+            (desde.year, hasta.year)
+        ).fetchall()
+    
+    def _habitos_rango(self, conn: sqlite3.Connection, desde: date, hasta: date) -> List[Dict]:
+        """Une el nivel caliente con los años fríos necesarios, adjuntándolos de a uno"""
+        columnas = "fecha, habito_id, bloque_id, puntos, hora_completado"
+        parametros = (self.usuario_id, desde.isoformat(), hasta.isoformat())
+        filas = []
+        for año in self._años_frios(conn, desde, hasta):
+            conn.execute("ATTACH DATABASE ? AS frio", (año['ruta'],))
+            try:
+                # Un día presente en caliente (rehidratado o reconstruido) tiene prioridad
+                filas += conn.execute(f"""
+                    SELECT {columnas} FROM frio.habitos_completados f
+                    WHERE f.usuario_id = ? AND f.fecha BETWEEN ? AND ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM main.habitos_completados h
+                          WHERE h.usuario_id = f.usuario_id AND h.fecha = f.fecha
+                      )
+                """, parametros).fetchall()
+            finally:
+                conn.execute("DETACH DATABASE frio")
+        filas += conn.execute(f"""
+            SELECT {columnas} FROM main.habitos_completados
+            WHERE usuario_id = ? AND fecha BETWEEN ? AND ?
+        """, parametros).fetchall()
+        return sorted((dict(fila) for fila in filas), key=lambda f: (f['fecha'], f['habito_id']))
+    
+    def _rehidratar_dia(self, conn: sqlite3.Connection, fecha: date, frio: Optional[str] = None):
+        """
+        Antes de escribir un día de un año archivado, devuelve sus filas al nivel
+        caliente para que marcar/desmarcar vean el día completo.
+        Sola adjunta el año y confirma; con `frio` (alias del archivo del año,
+        ya adjuntado por quien llama) corre dentro de la transacción en curso
+        """
+        if frio is not None:
+            self._mover_a_caliente(conn, frio, [(self.usuario_id, fecha.isoformat())])
+            return
+        año = conn.execute("SELECT ruta FROM archivo_anual WHERE año = ?", (fecha.year,)).fetchone()
+        if año is None:
+            return
+        conn.execute("ATTACH DATABASE ? AS frio", (año['ruta'],))
+        try:
+            self._mover_a_caliente(conn, 'frio', [(self.usuario_id, fecha.isoformat())])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE frio")
+    
+    def _mover_a_caliente(self, conn: sqlite3.Connection, frio: str, dias: Iterable[Tuple[str, str]]):
+        """Mueve los días (usuario_id, fecha ISO) del archivo adjuntado como `frio` al nivel caliente"""
+        dias = json.dumps(sorted(set(dias)))
+        # El día ya está sumado en registros: moverlo no debe tocar los agregados
+        self._pausar_agregados(conn, True)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO main.habitos_completados
+            (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at)
+            SELECT usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at
+            FROM {frio}.habitos_completados
+            WHERE (usuario_id, fecha) IN (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+            )
+        """, (dias,))
+        conn.execute(f"""
+            DELETE FROM {frio}.habitos_completados
+            WHERE (usuario_id, fecha) IN (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+            )
+        """, (dias,))
+        self._pausar_agregados(conn, False)
+    
     # ========================
     # MÉTRICAS Y ESTADÍSTICAS
     # ========================
     
-    def _recalcular_metricas_dia(self, conn: sqlite3.Connection, fecha: date, max_puntos: int):
-        """Recalcula puntos y porcentaje del día"""
-        cursor = conn.execute("""
-            SELECT COALESCE(SUM(puntos), 0) as total_puntos
-            FROM habitos_completados
-            WHERE fecha = ?
-        """, (fecha.isoformat(),))
+    def _preparar_dia(self, conn: sqlite3.Connection, fecha: date, max_puntos: int) -> Optional[sqlite3.Row]:
+        """
+        Lee el día antes de escribirlo y, si cambió max_puntos, lo guarda y
+        reescala el porcentaje (los triggers calculan con el max_puntos del día)
+        Retorna: la fila anterior de registros, o None si el día no existe
+        """
+        anterior = conn.execute("""
+            SELECT puntos_totales, porcentaje_cumplimiento, max_puntos
+            FROM registros
+            WHERE usuario_id = ? AND fecha = ?
+        """, (self.usuario_id, fecha.isoformat())).fetchone()
         
-        total_puntos = cursor.fetchone()['total_puntos']
+        if anterior is not None and anterior['max_puntos'] != max_puntos:
+            conn.execute("""
+                UPDATE registros
+                SET max_puntos = :max,
+                    porcentaje_cumplimiento = CASE WHEN :max > 0
+                        THEN MIN(100.0, puntos_totales * 100.0 / :max) ELSE 0.0 END
+                WHERE usuario_id = :usuario AND fecha = :fecha
+            """, {'max': max_puntos, 'usuario': self.usuario_id, 'fecha': fecha.isoformat()})
+        return anterior
+    
+    def _aplicar_metricas_dia(self, conn: sqlite3.Connection, fecha: date,
+                              anterior: Optional[sqlite3.Row]) -> Dict:
+        """
+        Lee las métricas del día que dejaron los triggers y aplica el cambio al leaderboard
+        Retorna: {'metricas': {...}, 'leaderboard': {...}} con los valores nuevos
+        """
+        if anterior is None:
+            # Sin registro del día no hubo cambio que aplicar
+            return {'metricas': {'puntos': 0, 'porcentaje': 0.0, 'habitos': 0}, 'leaderboard': None}
         
-        # Puntos máximos posibles
-        puntos_maximos = max_puntos
-        if puntos_maximos > 0:
-            porcentaje = min(100.0, (total_puntos / puntos_maximos * 100))
-        else:
-            porcentaje = 0.0
+        row = conn.execute("""
+            SELECT puntos_totales, porcentaje_cumplimiento, total_habitos
+            FROM registros
+            WHERE usuario_id = ? AND fecha = ?
+        """, (self.usuario_id, fecha.isoformat())).fetchone()
+        metricas = {
+            'puntos': row['puntos_totales'],
+            'porcentaje': row['porcentaje_cumplimiento'],
+            'habitos': row['total_habitos']
+        }
         
-        conn.execute("""
-            UPDATE registros 
-            SET puntos_totales = ?, porcentaje_cumplimiento = ?
-            WHERE fecha = ?
-        """, (total_puntos, porcentaje, fecha.isoformat()))
+        leaderboard = self._actualizar_leaderboard(
+            conn, fecha,
+            metricas['puntos'] - (anterior['puntos_totales'] or 0),
+            (anterior['porcentaje_cumplimiento'] or 0.0) >= META_DIARIA,
+            metricas['porcentaje'] >= META_DIARIA
+        )
+        return {'metricas': metricas, 'leaderboard': leaderboard}
+    
+    def _actualizar_leaderboard(self, conn: sqlite3.Connection, fecha: date, delta_puntos: int,
+                                era_perfecto: bool, es_perfecto: bool) -> Dict:
+        """Aplica al leaderboard el cambio de un día (delta de puntos y, si cambió, la racha)"""
+        if delta_puntos:
+            conn.execute("""
+                UPDATE leaderboard SET puntos = puntos + ?
+                WHERE usuario_id = ?
+            """, (delta_puntos, self.usuario_id))
+        
+        racha_recalculada = era_perfecto != es_perfecto
+        if racha_recalculada:
+            racha, racha_hasta = self._calcular_racha_perfecta(conn, max(fecha, date.today()))
+            conn.execute("""
+                UPDATE leaderboard SET racha_perfecta = ?, racha_hasta = ?
+                WHERE usuario_id = ?
+            """, (racha, racha_hasta, self.usuario_id))
+        
+        row = conn.execute("""
+            SELECT puntos, racha_perfecta, racha_hasta
+            FROM leaderboard
+            WHERE usuario_id = ?
+        """, (self.usuario_id,)).fetchone()
+        return {**dict(row), 'racha_recalculada': racha_recalculada} if row else None
+    
+    def _calcular_racha_perfecta(self, conn: sqlite3.Connection, hoy: date) -> Tuple[int, Optional[str]]:
+        """
+        Racha vigente de días consecutivos >= meta: termina hoy, o ayer si hoy
+        todavía no alcanza la meta. Solo recorre los días de la propia racha.
+        Retorna: (largo, fecha_final)
+        """
+        cursor = conn.execute("""
+            SELECT fecha, porcentaje_cumplimiento
+            FROM registros
+            WHERE usuario_id = ? AND fecha <= ?
+            ORDER BY fecha DESC
+        """, (self.usuario_id, hoy.isoformat()))
+        
+        racha, racha_hasta = 0, None
+        fecha_esperada = hoy
+        for row in cursor:
+            fecha_registro = date.fromisoformat(row['fecha'])
+            cumple = row['porcentaje_cumplimiento'] >= META_DIARIA
+            if racha == 0 and fecha_registro == hoy and not cumple:
+                # El día en curso aún no rompe la racha
+                fecha_esperada = hoy - timedelta(days=1)
+                continue
+            if fecha_registro != fecha_esperada or not cumple:
+                break
+            racha += 1
+            racha_hasta = racha_hasta or row['fecha']
+            fecha_esperada = fecha_registro - timedelta(days=1)
+        return racha, racha_hasta
     
     def obtener_metricas_dia(self, fecha: date) -> Dict:
         """Obtiene las métricas del día actual"""
@@ -148,15 +582,16 @@ class DatabaseManager:
             self.crear_registro_dia(fecha)
             
             cursor = conn.execute("""
-                SELECT puntos_totales, porcentaje_cumplimiento
+                SELECT puntos_totales, porcentaje_cumplimiento, total_habitos
                 FROM registros
-                WHERE fecha = ?
-            """, (fecha.isoformat(),))
+                WHERE usuario_id = ? AND fecha = ?
+            """, (self.usuario_id, fecha.isoformat()))
             
             row = cursor.fetchone()
             return {
                 'puntos': row['puntos_totales'] if row else 0,
-                'porcentaje': row['porcentaje_cumplimiento'] if row else 0.0
+                'porcentaje': row['porcentaje_cumplimiento'] if row else 0.0,
+                'habitos': row['total_habitos'] if row else 0
             }
         finally:
             conn.close()
@@ -168,8 +603,8 @@ class DatabaseManager:
             cursor = conn.execute("""
                 SELECT racha_actual, racha_maxima, ultima_fecha
                 FROM rachas
-                WHERE habito_id = ?
-            """, (habito_id,))
+                WHERE usuario_id = ? AND habito_id = ?
+            """, (self.usuario_id, habito_id))
             
             row = cursor.fetchone()
             if row:
@@ -182,22 +617,26 @@ class DatabaseManager:
         finally:
             conn.close()
     
-    def _actualizar_racha(self, conn: sqlite3.Connection, habito_id: str, fecha: date):
-        """Actualiza la racha de un hábito"""
+    def _actualizar_racha(self, conn: sqlite3.Connection, habito_id: str, fecha: date) -> Dict:
+        """
+        Actualiza la racha de un hábito
+        Retorna: {'actual', 'maxima'} con los valores nuevos
+        """
         cursor = conn.execute("""
             SELECT racha_actual, racha_maxima, ultima_fecha
             FROM rachas
-            WHERE habito_id = ?
-        """, (habito_id,))
+            WHERE usuario_id = ? AND habito_id = ?
+        """, (self.usuario_id, habito_id))
         
         row = cursor.fetchone()
         
         if row is None:
             # Primera vez que se completa este hábito
             conn.execute("""
-                INSERT INTO rachas (habito_id, racha_actual, racha_maxima, ultima_fecha)
-                VALUES (?, 1, 1, ?)
-            """, (habito_id, fecha.isoformat()))
+                INSERT INTO rachas (usuario_id, habito_id, racha_actual, racha_maxima, ultima_fecha)
+                VALUES (?, ?, 1, 1, ?)
+            """, (self.usuario_id, habito_id, fecha.isoformat()))
+            return {'actual': 1, 'maxima': 1}
         else:
             ultima_fecha = datetime.fromisoformat(row['ultima_fecha']).date() if row['ultima_fecha'] else None
             racha_actual = row['racha_actual']
@@ -215,45 +654,350 @@ class DatabaseManager:
             conn.execute("""
                 UPDATE rachas
                 SET racha_actual = ?, racha_maxima = ?, ultima_fecha = ?
-                WHERE habito_id = ?
-            """, (racha_actual, racha_maxima, fecha.isoformat(), habito_id))
+                WHERE usuario_id = ? AND habito_id = ?
+            """, (racha_actual, racha_maxima, fecha.isoformat(), self.usuario_id, habito_id))
+            return {'actual': racha_actual, 'maxima': racha_maxima}
     
-    def obtener_historico(self, dias: int = 30) -> List[Dict]:
-        """Obtiene el histórico de los últimos N días"""
+    def obtener_historico(self, dias: Optional[int] = 30) -> List[Dict]:
+        """Obtiene el histórico de los últimos N días (todo el histórico con dias=None)"""
         conn = self._get_connection()
         try:
-            fecha_inicio = (date.today() - timedelta(days=dias)).isoformat()
+            fecha_inicio = (date.today() - timedelta(days=dias)).isoformat() if dias is not None else ""
             cursor = conn.execute("""
                 SELECT fecha, puntos_totales, porcentaje_cumplimiento
                 FROM registros
-                WHERE fecha >= ?
+                WHERE usuario_id = ? AND fecha >= ?
                 ORDER BY fecha ASC
-            """, (fecha_inicio,))
+            """, (self.usuario_id, fecha_inicio))
             
             return [dict(row) for row in cursor.fetchall()]
         finally:
             conn.close()
     
+    def obtener_version_datos(self) -> int:
+        """
+        Último evento del usuario: cambia con cada marcar, desmarcar o
+        importación, así que sirve de clave para cachés de datos derivados
+        """
+        conn = self._get_connection()
+        try:
+            return conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM eventos WHERE usuario_id = ?", (self.usuario_id,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+    
     def obtener_perfil(self) -> Dict:
         """Obtiene el perfil del usuario"""
         conn = self._get_connection()
         try:
-            cursor = conn.execute("SELECT * FROM perfil WHERE id = 1")
+            cursor = conn.execute("SELECT * FROM perfil WHERE usuario_id = ?", (self.usuario_id,))
             row = cursor.fetchone()
             return dict(row) if row else {}
         finally:
             conn.close()
     
-    def actualizar_perfil(self, puntos_dia: int):
-        """Actualiza el perfil del usuario con los puntos del día"""
+    def actualizar_perfil(self, puntos_dia: int = None):
+        """
+        Reconcilia el perfil del usuario con sus días cerrados (idempotente)
+        `puntos_dia` se ignora: el total se recalcula desde registros, ver DayCloser
+        """
+        from database.day_closer import DayCloser
+        DayCloser(self).reconciliar([self.usuario_id])
+        
+        self._notificar({'tipo': 'perfil', 'usuario_id': self.usuario_id, 'perfil': self.obtener_perfil()})
+    
+    # ========================
+    # CONSULTAS MULTIUSUARIO
+    # ========================
+    
+    @staticmethod
+    def _filtro_usuarios(usuarios: Optional[Iterable[str]]) -> Tuple[str, tuple]:
+        """Construye el filtro SQL opcional por lista de usuarios"""
+        if usuarios is None:
+            return "", ()
+        return " AND usuario_id IN (SELECT value FROM json_each(?))", (json.dumps(list(usuarios)),)
+    
+    def listar_usuarios(self) -> List[str]:
+        """Obtiene los IDs de todos los usuarios con perfil"""
         conn = self._get_connection()
         try:
-            conn.execute("""
-                UPDATE perfil
-                SET puntos_totales = puntos_totales + ?,
-                    dias_activos = dias_activos + 1
-                WHERE id = 1
-            """, (puntos_dia,))
+            cursor = conn.execute("SELECT usuario_id FROM perfil ORDER BY usuario_id")
+            return [row['usuario_id'] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    
+    def obtener_historico_usuarios(self, dias: int = 30, usuarios: Optional[Iterable[str]] = None,
+                                   hoy: date = None) -> List[Tuple]:
+        """
+        Obtiene el histórico de los últimos N días de varios usuarios en una sola consulta
+        Retorna: tuplas (usuario_id, fecha, puntos_totales, porcentaje_cumplimiento)
+        """
+        hoy = hoy or date.today()
+        filtro, params = self._filtro_usuarios(usuarios)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Tuplas en el cursor: la conexión puede venir de un pool
+            cursor.execute(f"""
+                SELECT usuario_id, fecha, puntos_totales, porcentaje_cumplimiento
+                FROM registros
+                WHERE fecha >= ?{filtro}
+            """, ((hoy - timedelta(days=dias)).isoformat(),) + params)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    def obtener_perfiles(self, usuarios: Optional[Iterable[str]] = None) -> List[Tuple]:
+        """
+        Obtiene los perfiles de varios usuarios en una sola consulta
+        Retorna: tuplas (usuario_id, puntos_totales, dias_activos)
+        """
+        filtro, params = self._filtro_usuarios(usuarios)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"""
+                SELECT usuario_id, puntos_totales, dias_activos
+                FROM perfil
+                WHERE 1 = 1{filtro}
+            """, params)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    # ========================
+    # LEADERBOARD
+    # ========================
+    
+    def obtener_leaderboard(self) -> List[Tuple]:
+        """
+        Obtiene las filas del leaderboard de todos los usuarios
+        Retorna: tuplas (usuario_id, puntos, racha_perfecta, racha_hasta)
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT usuario_id, puntos, racha_perfecta, racha_hasta FROM leaderboard")
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    def expirar_rachas_leaderboard(self, hoy: date = None) -> List[str]:
+        """
+        Pone en cero las rachas que terminaron antes de ayer
+        Retorna: IDs de los usuarios afectados
+        """
+        vigente_desde = ((hoy or date.today()) - timedelta(days=1)).isoformat()
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute("""
+                UPDATE leaderboard SET racha_perfecta = 0, racha_hasta = NULL
+                WHERE racha_hasta < ?
+                RETURNING usuario_id
+            """, (vigente_desde,))
+            usuarios = [row['usuario_id'] for row in cursor.fetchall()]
             conn.commit()
+            return usuarios
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+    
+    def reconstruir_leaderboard(self):
+        """Recalcula el leaderboard completo desde registros en una sola pasada"""
+        conn = self._get_connection()
+        try:
+            self._reconstruir_leaderboard(conn)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _reconstruir_leaderboard(self, conn: sqlite3.Connection):
+        """Ejecuta la reconstrucción del leaderboard en la conexión dada"""
+        # La racha vigente puede terminar hoy o ayer (si hoy aún no alcanza la meta)
+        conn.execute(RECONSTRUIR_LEADERBOARD, {
+            'meta': META_DIARIA,
+            'vigente_desde': (date.today() - timedelta(days=1)).isoformat()
+        })
+    
+    def obtener_leaderboard_usuario(self) -> Dict:
+        """Obtiene la fila de leaderboard del usuario"""
+        conn = self._get_connection()
+        try:
+            row = conn.execute("""
+                SELECT puntos, racha_perfecta, racha_hasta
+                FROM leaderboard
+                WHERE usuario_id = ?
+            """, (self.usuario_id,)).fetchone()
+            return dict(row) if row else {'puntos': 0, 'racha_perfecta': 0, 'racha_hasta': None}
+        finally:
+            conn.close()
+    
+    # ========================
+    # BADGES
+    # ========================
+    
+    def obtener_badges_desbloqueados(self) -> List[Dict]:
+        """Obtiene los badges desbloqueados del usuario, del más antiguo al más reciente"""
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute("""
+                SELECT badge_id, desbloqueado_en
+                FROM badges_desbloqueados
+                WHERE usuario_id = ?
+                ORDER BY desbloqueado_en ASC, rowid ASC
+            """, (self.usuario_id,))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    
+    def desbloquear_badges(self, badge_ids: Iterable[str]) -> List[str]:
+        """
+        Registra badges desbloqueados (idempotente)
+        Retorna: IDs que no estaban desbloqueados antes
+        """
+        conn = self._get_connection()
+        try:
+            nuevos = []
+            for badge_id in badge_ids:
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO badges_desbloqueados (usuario_id, badge_id)
+                    VALUES (?, ?)
+                """, (self.usuario_id, badge_id))
+                if cursor.rowcount:
+                    nuevos.append(badge_id)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        if nuevos:
+            self._notificar({'tipo': 'badges', 'usuario_id': self.usuario_id, 'badges': nuevos})
+        return nuevos
+    
+    # ========================
+    # SINCRONIZACIÓN
+    # ========================
+    
+    def aplicar_operaciones(self, operaciones: List[Dict], max_puntos: int = 175) -> Optional[List[Dict]]:
+        """
+        Aplica un lote de marcar/desmarcar en una sola transacción, en el orden
+        de la hora del cliente. Cada operación trae tipo, fecha, habito_id,
+        bloque_id, puntos, hora, cliente_ts (UTC) y clave_idempotencia.
+        Conflictos: por (fecha, hábito) gana la operación más reciente según
+        cliente_ts, o created_at para eventos que no vinieron sincronizados
+        
+        Retorna: un resultado por operación, en el orden recibido, con estado
+        'aplicada', 'duplicada' o 'descartada' (y 'vigente' si se descartó);
+        None si el lote falló (no se aplica nada, tampoco la rehidratación)
+        """
+        resultados: List[Optional[Dict]] = [None] * len(operaciones)
+        eventos = []
+        adjuntos: Dict[int, str] = {}
+        conn = self._get_connection()
+        try:
+            fechas = sorted({op['fecha'] for op in operaciones})
+            # ATTACH no se permite dentro de una transacción: los años fríos del lote se adjuntan antes
+            for año in conn.execute(
+                "SELECT año, ruta FROM archivo_anual WHERE año IN (SELECT value FROM json_each(?))",
+                (json.dumps(sorted({fecha.year for fecha in fechas})),)
+            ).fetchall():
+                conn.execute(f"ATTACH DATABASE ? AS frio_{año['año']}", (año['ruta'],))
+                adjuntos[año['año']] = f"frio_{año['año']}"
+            for fecha in fechas:
+                if fecha.year in adjuntos:
+                    self._rehidratar_dia(conn, fecha, adjuntos[fecha.year])
+            
+            for i in sorted(range(len(operaciones)), key=lambda i: operaciones[i]['cliente_ts']):
+                op = operaciones[i]
+                resultado = {'clave_idempotencia': op['clave_idempotencia']}
+                resultados[i] = resultado
+                if conn.execute("SELECT 1 FROM eventos WHERE usuario_id = ? AND clave_idempotencia = ?",
+                                (self.usuario_id, op['clave_idempotencia'])).fetchone():
+                    resultado['estado'] = 'duplicada'
+                    continue
+                vigente = conn.execute("""
+                    SELECT MAX(COALESCE(cliente_ts, created_at)) FROM eventos
+                    WHERE usuario_id = ? AND fecha = ? AND habito_id = ?
+                """, (self.usuario_id, op['fecha'].isoformat(), op['habito_id'])).fetchone()[0]
+                if vigente is not None and vigente > op['cliente_ts']:
+                    resultado.update(estado='descartada', vigente=vigente)
+                    continue
+                
+                if op['tipo'] == 'marcar':
+                    evento = self._marcar(conn, op['fecha'], op['habito_id'], op['bloque_id'], op['puntos'],
+                                          max_puntos, op['hora'], op['clave_idempotencia'], op['cliente_ts'])
+                else:
+                    evento = self._desmarcar(conn, op['fecha'], op['habito_id'], max_puntos, op['hora'],
+                                             op['clave_idempotencia'], op['cliente_ts'])
+                eventos.append(evento)
+                resultado['estado'] = 'aplicada'
+            conn.commit()
+        except Exception as e:
+            print(f"Error aplicando operaciones: {e}")
+            conn.rollback()
+            return None
+        finally:
+            for alias in adjuntos.values():
+                conn.execute(f"DETACH DATABASE {alias}")
+            conn.close()
+        
+        for evento in eventos:
+            self._notificar(evento)
+        return resultados
+    
+    def obtener_cambios(self, desde_evento: int = 0) -> Dict:
+        """
+        Estado actual de lo que cambió después del evento `desde_evento`: los
+        días tocados (métricas y hábitos completados) y las rachas de los
+        hábitos marcados. El último evento se lee primero, así que un cambio
+        concurrente puede repetirse en el siguiente delta pero nunca perderse
+        
+        Retorna: {'ultimo_evento', 'dias': [...], 'rachas': {habito_id: {...}}}
+        """
+        conn = self._get_connection()
+        try:
+            ultimo = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM eventos WHERE usuario_id = ?", (self.usuario_id,)
+            ).fetchone()[0]
+            tocados = conn.execute("""
+                SELECT fecha, habito_id, tipo FROM eventos
+                WHERE usuario_id = ? AND id > ? AND id <= ?
+            """, (self.usuario_id, desde_evento, ultimo)).fetchall()
+            fechas = sorted({row['fecha'] for row in tocados})
+            marcados = sorted({row['habito_id'] for row in tocados if row['tipo'] == 'marcar'})
+            
+            dias = {}
+            if fechas:
+                for row in conn.execute("""
+                    SELECT fecha, puntos_totales, porcentaje_cumplimiento, total_habitos
+                    FROM registros
+                    WHERE usuario_id = ? AND fecha IN (SELECT value FROM json_each(?))
+                """, (self.usuario_id, json.dumps(fechas))):
+                    dias[row['fecha']] = {
+                        'fecha': row['fecha'], 'puntos': row['puntos_totales'],
+                        'porcentaje': row['porcentaje_cumplimiento'], 'habitos': row['total_habitos'],
+                        'completados': []
+                    }
+                for fila in self._habitos_rango(conn, date.fromisoformat(fechas[0]), date.fromisoformat(fechas[-1])):
+                    if fila['fecha'] in dias:
+                        dias[fila['fecha']]['completados'].append(fila['habito_id'])
+            
+            rachas = {
+                row['habito_id']: {'actual': row['racha_actual'], 'maxima': row['racha_maxima'],
+                                   'ultima_fecha': row['ultima_fecha']}
+                for row in conn.execute("""
+                    SELECT habito_id, racha_actual, racha_maxima, ultima_fecha
+                    FROM rachas
+                    WHERE usuario_id = ? AND habito_id IN (SELECT value FROM json_each(?))
+                """, (self.usuario_id, json.dumps(marcados)))
+            } if marcados else {}
+            # Un día tocado sin fila en registros (solo desmarcados) viaja vacío
+            return {
+                'ultimo_evento': ultimo,
+                'dias': [dias.get(f) or {'fecha': f, 'puntos': 0, 'porcentaje': 0.0, 'habitos': 0, 'completados': []}
+                         for f in fechas],
+                'rachas': rachas
+            }
+        finally:
+            conn.close()
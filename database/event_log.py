@@ -0,0 +1,320 @@
+"""
+Log de Eventos y Reconstrucción de Proyecciones
+Vuelve a derivar registros, habitos_completados, rachas, perfil, badges,
+leaderboard y sketches reproduciendo la tabla `eventos`
+"""
+
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from database.day_closer import DayCloser
+from database.models import META_DIARIA
+from utils.gamification import BADGES, SEÑALES_RACHA_HABITO
+
+
+def proyectar_eventos(eventos: Iterable[sqlite3.Row]) -> Dict:
+    """
+    Aplica en memoria los eventos de UN usuario, en orden de id, con las
+    mismas reglas que DatabaseManager.marcar_habito / desmarcar_habito
+
+    Returns:
+        Dict con las filas proyectadas: habitos, registros, rachas y badges
+        (el perfil se deriva después de registros, con el corte del cierre diario)
+    """
+    habitos: Dict[tuple, tuple] = {}
+    rachas: Dict[str, list] = {}
+    max_por_dia: Dict[str, int] = {}
+    dias_con_registro = set()
+
+    for ev in eventos:
+        fecha_iso = ev['fecha']
+        clave = (fecha_iso, ev['habito_id'])
+        if ev['tipo'] == 'marcar':
+            dias_con_registro.add(fecha_iso)
+            habitos[clave] = (ev['bloque_id'], ev['puntos'], ev['hora'])
+
+            fecha = date.fromisoformat(fecha_iso)
+            racha = rachas.get(ev['habito_id'])
+            if racha is None:
+                rachas[ev['habito_id']] = [1, 1, fecha]
+            else:
+                actual, maxima, ultima_fecha = racha
+                if ultima_fecha and (fecha - ultima_fecha).days == 1:
+                    actual += 1
+                elif ultima_fecha != fecha:
+                    actual = 1
+                rachas[ev['habito_id']] = [actual, max(maxima, actual), fecha]
+        else:
+            habitos.pop(clave, None)
+        max_por_dia[fecha_iso] = ev['max_puntos']
+
+    puntos_dia: Dict[str, int] = {fecha_iso: 0 for fecha_iso in dias_con_registro}
+    habitos_dia: Dict[str, int] = {fecha_iso: 0 for fecha_iso in dias_con_registro}
+    for (fecha_iso, _), (_, puntos, _) in habitos.items():
+        if fecha_iso in puntos_dia:
+            puntos_dia[fecha_iso] += puntos
+            habitos_dia[fecha_iso] += 1
+
+    registros = []
+    for fecha_iso in sorted(puntos_dia):
+        total = puntos_dia[fecha_iso]
+        maximo = max_por_dia[fecha_iso]
+        # Misma expresión que los triggers de agregados, para coincidir bit a bit
+        porcentaje = min(100.0, total * 100.0 / maximo) if maximo > 0 else 0.0
+        registros.append((fecha_iso, total, porcentaje, habitos_dia[fecha_iso], maximo))
+
+    dias_activos = sum(1 for fila in registros if fila[1] > 0)
+
+    # Señales "alguna vez alcanzadas" para que un badge no se pierda al reconstruir
+    señales = {
+        'dias_activos': dias_activos,
+        'racha_perfecta': _racha_perfecta_maxima(registros)
+    }
+    for habito_id, señal in SEÑALES_RACHA_HABITO.items():
+        señales[señal] = rachas[habito_id][1] if habito_id in rachas else 0
+
+    return {
+        'habitos': [(f, h, b, p, hora) for (f, h), (b, p, hora) in habitos.items()],
+        'registros': registros,
+        'rachas': [(h, a, m, u.isoformat()) for h, (a, m, u) in rachas.items()],
+        'badges': [badge_id for badge_id, info in BADGES.items() if info['criterio'](señales)]
+    }
+
+
+def _racha_perfecta_maxima(registros: List[tuple]) -> int:
+    """Isla más larga de días consecutivos con porcentaje >= meta"""
+    maxima, actual, anterior = 0, 0, None
+    for fecha_iso, _, porcentaje, *_ in registros:
+        fecha = date.fromisoformat(fecha_iso)
+        if porcentaje >= META_DIARIA:
+            actual = actual + 1 if anterior and fecha - anterior == timedelta(days=1) else 1
+            maxima = max(maxima, actual)
+            anterior = fecha
+        else:
+            actual, anterior = 0, None
+    return maxima
+
+
+def _replay_particion(db_path: str, usuarios: List[str]) -> Dict[str, Dict]:
+    """Trabajo de un proceso: lee y proyecta los eventos de una partición de usuarios"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.execute("""
+            SELECT usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora
+            FROM eventos
+            WHERE usuario_id IN (SELECT value FROM json_each(?))
+            ORDER BY usuario_id, id
+        """, (json.dumps(usuarios),))
+
+        proyecciones, actual, eventos_usuario = {}, None, []
+        for ev in cursor:
+            if ev['usuario_id'] != actual:
+                if actual is not None:
+                    proyecciones[actual] = proyectar_eventos(eventos_usuario)
+                actual, eventos_usuario = ev['usuario_id'], []
+            eventos_usuario.append(ev)
+        if actual is not None:
+            proyecciones[actual] = proyectar_eventos(eventos_usuario)
+        return proyecciones
+    finally:
+        conn.close()
+
+
+class EventLog:
+    """Consulta del log de eventos y reconstrucción de proyecciones por replay"""
+
+    def __init__(self, db):
+        """
+        Args:
+            db: DatabaseManager de la base de datos a reconstruir
+        """
+        self.db = db
+
+    def obtener_eventos(self, usuario_id: str, desde_id: int = 0, limite: int = 1000) -> List[Dict]:
+        """Eventos de un usuario en orden de aplicación (auditoría)"""
+        conn = self.db._get_connection()
+        try:
+            cursor = conn.execute("""
+                SELECT id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora,
+                       clave_idempotencia, created_at
+                FROM eventos
+                WHERE usuario_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (usuario_id, desde_id, limite))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def reconstruir(self, usuarios: Optional[Iterable[str]] = None, procesos: int = None,
+                    particiones: int = None) -> Dict:
+        """
+        Reconstruye las proyecciones reproduciendo el log
+
+        Args:
+            usuarios: Usuarios a reconstruir (default: todos los que tienen eventos)
+            procesos: Tamaño del pool de procesos (default: núcleos disponibles; 1 = sin pool)
+            particiones: Número de particiones de usuarios (default: 4 por proceso)
+
+        Returns:
+            Dict con usuarios, eventos, segundos y eventos_por_segundo
+        """
+        inicio = time.perf_counter()
+        reconstruccion_total = usuarios is None
+        conn = self.db._get_connection()
+        try:
+            if usuarios is None:
+                usuarios = [row['usuario_id'] for row in conn.execute("SELECT DISTINCT usuario_id FROM eventos")]
+            else:
+                usuarios = list(usuarios)
+            total_eventos = conn.execute(
+                "SELECT COUNT(*) FROM eventos WHERE usuario_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(usuarios),)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+        procesos = procesos or os.cpu_count() or 1
+        particiones = particiones or procesos * 4
+        grupos = [usuarios[i::particiones] for i in range(particiones) if usuarios[i::particiones]]
+
+        proyecciones: Dict[str, Dict] = {}
+        if procesos == 1:
+            for grupo in grupos:
+                proyecciones.update(_replay_particion(self.db.db_path, grupo))
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                for parcial in pool.map(_replay_particion, [self.db.db_path] * len(grupos), grupos):
+                    proyecciones.update(parcial)
+
+        self._escribir(usuarios, proyecciones, reconstruccion_total, DayCloser(self.db).hasta_vigente())
+        self._rearchivar(usuarios)
+
+        segundos = time.perf_counter() - inicio
+        return {
+            'usuarios': len(usuarios),
+            'eventos': total_eventos,
+            'segundos': segundos,
+            'eventos_por_segundo': total_eventos / segundos if segundos > 0 else 0.0
+        }
+
+    def _escribir(self, usuarios: List[str], proyecciones: Dict[str, Dict], reconstruccion_total: bool,
+                  cerrado_hasta: date):
+        """
+        Reemplaza las proyecciones de los usuarios en una sola transacción. El
+        perfil sale de registros con el corte del cierre diario (días <= cerrado_hasta)
+        """
+        filtro = json.dumps(usuarios)
+        conn = self.db._get_connection()
+        try:
+            conn.execute("BEGIN")
+            # registros se escribe entero desde la proyección: sin deltas de los triggers
+            self.db._pausar_agregados(conn, True)
+            for tabla in ('habitos_completados', 'rachas'):
+                conn.execute(
+                    f"DELETE FROM {tabla} WHERE usuario_id IN (SELECT value FROM json_each(?))", (filtro,)
+                )
+            # Los días sin eventos (creados al consultar métricas) se conservan en cero
+            conn.execute("""
+                UPDATE registros SET puntos_totales = 0, porcentaje_cumplimiento = 0.0, total_habitos = 0
+                WHERE usuario_id IN (SELECT value FROM json_each(?))
+            """, (filtro,))
+
+            conn.executemany("""
+                INSERT INTO registros
+                (usuario_id, fecha, puntos_totales, porcentaje_cumplimiento, total_habitos, max_puntos)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(usuario_id, fecha) DO UPDATE SET
+                    puntos_totales = excluded.puntos_totales,
+                    porcentaje_cumplimiento = excluded.porcentaje_cumplimiento,
+                    total_habitos = excluded.total_habitos,
+                    max_puntos = excluded.max_puntos
+            """, ((u, *fila) for u, p in proyecciones.items() for fila in p['registros']))
+            conn.executemany("""
+                INSERT INTO habitos_completados (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, ((u, *fila) for u, p in proyecciones.items() for fila in p['habitos']))
+            conn.executemany("""
+                INSERT INTO rachas (usuario_id, habito_id, racha_actual, racha_maxima, ultima_fecha)
+                VALUES (?, ?, ?, ?, ?)
+            """, ((u, *fila) for u, p in proyecciones.items() for fila in p['rachas']))
+            DayCloser._actualizar_perfiles(conn, filtro, cerrado_hasta)
+
+            # Badges: se conservan las fechas de los que siguen derivándose
+            conn.executemany("""
+                DELETE FROM badges_desbloqueados
+                WHERE usuario_id = ? AND badge_id NOT IN (SELECT value FROM json_each(?))
+            """, ((u, json.dumps(p['badges'])) for u, p in proyecciones.items()))
+            conn.executemany("""
+                INSERT OR IGNORE INTO badges_desbloqueados (usuario_id, badge_id) VALUES (?, ?)
+            """, ((u, b) for u, p in proyecciones.items() for b in p['badges']))
+
+            self.db._reconstruir_leaderboard(conn)
+
+            if reconstruccion_total:
+                # Los sketches no se pueden "restar": solo se rehacen con el replay completo
+                conn.execute("DELETE FROM sketches")
+                conn.execute("DELETE FROM sketch_estado")
+                conn.execute("""
+                    INSERT OR REPLACE INTO sketch_pendientes (usuario_id, fecha, puntos, porcentaje)
+                    SELECT usuario_id, fecha, puntos_totales, porcentaje_cumplimiento FROM registros
+                """)
+            self.db._pausar_agregados(conn, False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _rearchivar(self, usuarios: List[str]):
+        """
+        _escribir deja todos los hábitos proyectados en el nivel caliente: los
+        de años archivados reemplazan las filas frías de esos usuarios y vuelven
+        a su archivo, un año por transacción (ATTACH no se permite dentro de una).
+        Mientras tanto las lecturas ya ven el día nuevo: el caliente tiene prioridad
+        """
+        filtro = json.dumps(usuarios)
+        conn = self.db._get_connection()
+        try:
+            for año in conn.execute("SELECT año, ruta FROM archivo_anual ORDER BY año").fetchall():
+                rango = (f"{año['año']:04d}-01-01", f"{año['año']:04d}-12-31")
+                conn.execute("ATTACH DATABASE ? AS frio", (año['ruta'],))
+                try:
+                    conn.execute("BEGIN")
+                    # Mover filas no cambia los días: registros ya quedó escrito por _escribir
+                    self.db._pausar_agregados(conn, True)
+                    conn.execute(
+                        "DELETE FROM frio.habitos_completados WHERE usuario_id IN (SELECT value FROM json_each(?))",
+                        (filtro,)
+                    )
+                    conn.execute("""
+                        INSERT INTO frio.habitos_completados
+                        (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at)
+                        SELECT usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at
+                        FROM main.habitos_completados
+                        WHERE usuario_id IN (SELECT value FROM json_each(?)) AND fecha BETWEEN ? AND ?
+                    """, (filtro, *rango))
+                    conn.execute("""
+                        DELETE FROM main.habitos_completados
+                        WHERE usuario_id IN (SELECT value FROM json_each(?)) AND fecha BETWEEN ? AND ?
+                    """, (filtro, *rango))
+                    conn.execute(
+                        "UPDATE archivo_anual SET filas = (SELECT COUNT(*) FROM frio.habitos_completados) WHERE año = ?",
+                        (año['año'],)
+                    )
+                    self.db._pausar_agregados(conn, False)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.execute("DETACH DATABASE frio")
+        finally:
+            conn.close()
@@ -0,0 +1,271 @@
+"""
+Exportador en Streaming
+Saca registros y habitos_completados a CSV, NDJSON o un formato binario por
+columnas, fila a fila desde el cursor de SQLite y con memoria constante
+
+Uso:
+    python -m database.exporter registros salida.csv.gz --desde 2024-01-01
+    python -m database.exporter habitos_completados salida.atc --todos
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import struct
+import time
+from array import array
+from datetime import date
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from database.db_manager import DatabaseManager
+
+# Columnas exportables por tabla: (nombre, tipo) con tipo 'str', 'int' o 'float'
+TABLAS = {
+    'registros': (
+        ('usuario_id', 'str'), ('fecha', 'str'),
+        ('puntos_totales', 'int'), ('porcentaje_cumplimiento', 'float')
+    ),
+    'habitos_completados': (
+        ('usuario_id', 'str'), ('fecha', 'str'), ('habito_id', 'str'),
+        ('bloque_id', 'str'), ('puntos', 'int'), ('hora_completado', 'str')
+    )
+}
+
+FORMATOS = ('csv', 'ndjson', 'columnar')
+
+# Formato columnar: MAGIA, uint32 + JSON de esquema, luego bloques de
+# uint32 filas seguidos de cada columna; un bloque de 0 filas cierra el archivo
+MAGIA_COLUMNAR = b"ATCOL1\n"
+
+
+def _escribir_csv(archivo, columnas: List[str], bloques: Iterator[List[tuple]]):
+    escritor = csv.writer(archivo)
+    escritor.writerow(columnas)
+    for bloque in bloques:
+        escritor.writerows(bloque)
+
+
+def _escribir_ndjson(archivo, columnas: List[str], bloques: Iterator[List[tuple]]):
+    # Un solo encoder: json.dumps con argumentos crea uno nuevo por llamada
+    codificar = json.JSONEncoder(ensure_ascii=False).encode
+    for bloque in bloques:
+        archivo.write("".join(codificar(dict(zip(columnas, fila))) + "\n" for fila in bloque))
+
+
+def _escribir_columnar(archivo: BinaryIO, esquema: Tuple[Tuple[str, str], ...], bloques: Iterator[List[tuple]]):
+    """
+    Cada bloque guarda sus columnas contiguas: enteros int64, reales float64 y
+    textos como máscara de nulos (1 byte/fila) + offsets uint32 + bytes UTF-8
+    """
+    cabecera = json.dumps([list(c) for c in esquema]).encode('utf-8')
+    archivo.write(MAGIA_COLUMNAR + struct.pack('<I', len(cabecera)) + cabecera)
+    for bloque in bloques:
+        archivo.write(struct.pack('<I', len(bloque)))
+        for i, (_, tipo) in enumerate(esquema):
+            valores = [fila[i] for fila in bloque]
+            if tipo == 'int':
+                archivo.write(array('q', (v or 0 for v in valores)).tobytes())
+            elif tipo == 'float':
+                archivo.write(array('d', (v or 0.0 for v in valores)).tobytes())
+            else:
+                nulos = bytes(v is None for v in valores)
+                codificados = [(v or '').encode('utf-8') for v in valores]
+                offsets = array('I', [0])
+                for texto in codificados:
+                    offsets.append(offsets[-1] + len(texto))
+                archivo.write(nulos + offsets.tobytes() + b"".join(codificados))
+    archivo.write(struct.pack('<I', 0))
+
+
+def leer_columnar(ruta: str) -> Iterator[Dict[str, list]]:
+    """
+    Lee un archivo columnar (opcionalmente .gz) bloque a bloque
+
+    Returns:
+        Generador de {columna: valores} por bloque
+    """
+    abrir = gzip.open if ruta.endswith('.gz') else open
+    with abrir(ruta, 'rb') as archivo:
+        if archivo.read(len(MAGIA_COLUMNAR)) != MAGIA_COLUMNAR:
+            raise ValueError(f"{ruta} no es un archivo columnar de Atomic Tracker")
+        largo, = struct.unpack('<I', archivo.read(4))
+        esquema = json.loads(archivo.read(largo))
+        while True:
+            filas, = struct.unpack('<I', archivo.read(4))
+            if filas == 0:
+                return
+            bloque = {}
+            for nombre, tipo in esquema:
+                if tipo in ('int', 'float'):
+                    valores = array('q' if tipo == 'int' else 'd')
+                    valores.frombytes(archivo.read(filas * 8))
+                    bloque[nombre] = valores.tolist()
+                else:
+                    nulos = archivo.read(filas)
+                    offsets = array('I')
+                    offsets.frombytes(archivo.read((filas + 1) * 4))
+                    datos = archivo.read(offsets[-1])
+                    bloque[nombre] = [
+                        None if nulos[i] else datos[offsets[i]:offsets[i + 1]].decode('utf-8')
+                        for i in range(filas)
+                    ]
+            yield bloque
+
+
+class StreamingExporter:
+    """
+    Exporta con un cursor de SQLite recorrido por fetchmany: nunca hay más de
+    un bloque de filas en memoria, sin importar el tamaño del histórico.
+    El orden (usuario_id, fecha) sigue los índices únicos, sin ordenamiento temporal;
+    los años del almacenamiento frío se exportan antes, cada uno en ese orden.
+    """
+
+    def __init__(self, db: DatabaseManager, tamaño_bloque: int = 5000):
+        """
+        Args:
+            db: DatabaseManager origen (su usuario es el exportado por defecto)
+            tamaño_bloque: Filas por fetchmany
+        """
+        self.db = db
+        self.tamaño_bloque = tamaño_bloque
+
+    def bloques(self, tabla: str, desde: date = None, hasta: date = None,
+                todos_los_usuarios: bool = False) -> Iterator[List[tuple]]:
+        """
+        Genera bloques de filas de una tabla
+
+        Args:
+            tabla: 'registros' o 'habitos_completados'
+            desde, hasta: Rango de fechas inclusive (opcional)
+            todos_los_usuarios: Exportar todos los usuarios en vez del del gestor
+        """
+        if tabla not in TABLAS:
+            raise ValueError(f"Tabla no exportable: {tabla}")
+        columnas = ", ".join(nombre for nombre, _ in TABLAS[tabla])
+        condiciones, parametros = [], []
+        if not todos_los_usuarios:
+            condiciones.append("usuario_id = ?")
+            parametros.append(self.db.usuario_id)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde.isoformat())
+        if hasta:
+            condiciones.append("fecha <= ?")
+            parametros.append(hasta.isoformat())
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        orden = "usuario_id, fecha" + (", habito_id" if tabla == 'habitos_completados' else "")
+
+        conn = self.db._get_connection()
+        try:
+            frios = []
+            if tabla == 'habitos_completados':
+                frios = self.db._años_frios(conn, desde or date.min, hasta or date.max)
+
+            # Años archivados primero (cada uno en su orden), luego el nivel caliente
+            for _, ruta in frios:
+                conn.execute("ATTACH DATABASE ? AS frio", (ruta,))
+                try:
+                    yield from self._leer_bloques(conn, f"""
+                        SELECT {columnas} FROM frio.habitos_completados f {where}
+                        {'AND' if where else 'WHERE'} NOT EXISTS (
+                            SELECT 1 FROM main.habitos_completados h
+                            WHERE h.usuario_id = f.usuario_id AND h.fecha = f.fecha
+                        )
+                        ORDER BY {orden}
+                    """, parametros)
+                finally:
+                    conn.execute("DETACH DATABASE frio")
+            yield from self._leer_bloques(
+                conn, f"SELECT {columnas} FROM main.{tabla} {where} ORDER BY {orden}", parametros
+            )
+        finally:
+            conn.close()
+
+    def _leer_bloques(self, conn, sql: str, parametros: List) -> Iterator[List[tuple]]:
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Tuplas simples: sin objetos Row por fila
+        cursor.execute(sql, parametros)
+        while True:
+            bloque = cursor.fetchmany(self.tamaño_bloque)
+            if not bloque:
+                break
+            yield bloque
+
+    def exportar(self, tabla: str, ruta: str, formato: str = None, comprimir: bool = None,
+                 desde: date = None, hasta: date = None, todos_los_usuarios: bool = False) -> Dict:
+        """
+        Exporta una tabla a un archivo
+
+        Args:
+            formato: 'csv', 'ndjson' o 'columnar' (default: según la extensión)
+            comprimir: gzip (default: si la ruta termina en .gz)
+
+        Returns:
+            Dict con filas, segundos y filas_por_segundo
+        """
+        formato = formato or self._formato_por_extension(ruta)
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconocido: {formato}")
+        comprimir = ruta.endswith('.gz') if comprimir is None else comprimir
+
+        inicio = time.perf_counter()
+        contador = {'filas': 0}
+
+        def contados():
+            for bloque in self.bloques(tabla, desde, hasta, todos_los_usuarios):
+                contador['filas'] += len(bloque)
+                yield bloque
+
+        esquema = TABLAS[tabla]
+        if formato == 'columnar':
+            with (gzip.open(ruta, 'wb', compresslevel=6) if comprimir else open(ruta, 'wb')) as archivo:
+                _escribir_columnar(archivo, esquema, contados())
+        else:
+            abrir = gzip.open if comprimir else open
+            with abrir(ruta, 'wt', encoding='utf-8', newline='') as archivo:
+                escribir = _escribir_csv if formato == 'csv' else _escribir_ndjson
+                escribir(archivo, [nombre for nombre, _ in esquema], contados())
+
+        segundos = time.perf_counter() - inicio
+        return {
+            'filas': contador['filas'],
+            'segundos': segundos,
+            'filas_por_segundo': contador['filas'] / segundos if segundos > 0 else 0.0
+        }
+
+    @staticmethod
+    def _formato_por_extension(ruta: str) -> str:
+        nombre = ruta[:-3] if ruta.endswith('.gz') else ruta
+        if nombre.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+        if nombre.endswith('.atc'):
+            return 'columnar'
+        return 'csv'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tabla", choices=sorted(TABLAS))
+    parser.add_argument("archivo", help=".csv, .ndjson o .atc (columnar), con .gz opcional")
+    parser.add_argument("--formato", choices=FORMATOS)
+    parser.add_argument("--db", default="database/tracker.db")
+    parser.add_argument("--usuario", default=None)
+    parser.add_argument("--todos", action="store_true", help="Exportar todos los usuarios")
+    parser.add_argument("--desde", type=date.fromisoformat)
+    parser.add_argument("--hasta", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    if args.usuario:
+        db = db.para_usuario(args.usuario)
+    resultado = StreamingExporter(db).exportar(
+        args.tabla, args.archivo, formato=args.formato, desde=args.desde, hasta=args.hasta,
+        todos_los_usuarios=args.todos
+    )
+    print(f"Exportadas {resultado['filas']:,} filas en {resultado['segundos']:.1f}s "
+          f"- {resultado['filas_por_segundo']:,.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
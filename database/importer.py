@@ -0,0 +1,329 @@
+"""
+Importador de Histórico
+Carga años de hábitos completados (CSV, NDJSON o desde Python) sin pasar por
+marcar_habito, y reconstruye métricas, rachas y perfil al final en una sola pasada
+
+Uso:
+    python -m database.importer historico.csv --usuario abel --max-puntos 355
+    python -m database.importer historico.ndjson.gz --formato ndjson
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import time
+from datetime import date
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from database.day_closer import DayCloser
+from database.db_manager import DatabaseManager
+from database.models import RECONSTRUIR_RACHAS
+
+# Columnas de entrada; usuario_id, hora y max_puntos son opcionales
+COLUMNAS = ('usuario_id', 'fecha', 'habito_id', 'bloque_id', 'puntos', 'hora', 'max_puntos')
+
+
+def _abrir_texto(ruta: str):
+    """Abre un archivo de texto, descomprimiendo si termina en .gz"""
+    if ruta.endswith('.gz'):
+        return gzip.open(ruta, 'rt', encoding='utf-8', newline='')
+    return open(ruta, 'r', encoding='utf-8', newline='')
+
+
+def leer_csv(ruta: str) -> Iterator[Dict]:
+    """Genera filas de un CSV con encabezado (ver COLUMNAS)"""
+    with _abrir_texto(ruta) as f:
+        yield from csv.DictReader(f)
+
+
+def leer_ndjson(ruta: str) -> Iterator[Dict]:
+    """Genera filas de un archivo con un objeto JSON por línea"""
+    with _abrir_texto(ruta) as f:
+        for linea in f:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+class HistoricalImporter:
+    """
+    Importa en bloques con executemany dentro de transacciones grandes
+    (claves foráneas diferidas hasta el COMMIT). Las filas también se agregan
+    al log de eventos, así que el replay las conserva y reimportar el mismo
+    archivo no duplica nada.
+
+    Las métricas de registros, las rachas, el perfil y el leaderboard de los
+    usuarios afectados se reconstruyen al final con consultas por conjuntos.
+    Los cachés en memoria (ej: Leaderboard) deben recargarse después.
+    """
+
+    def __init__(self, db: DatabaseManager, max_puntos: int = 175, tamaño_bloque: int = 10000,
+                 bloques_por_transaccion: int = 10, progreso: Callable[[Dict], None] = None):
+        """
+        Args:
+            db: DatabaseManager destino; su usuario es el default de las filas sin usuario_id
+            max_puntos: Puntos máximos del día cuando la fila no trae max_puntos
+            tamaño_bloque: Filas por executemany
+            bloques_por_transaccion: Bloques antes de cada COMMIT
+            progreso: Función que recibe {'filas', 'rechazadas', 'filas_por_segundo'} tras cada bloque
+        """
+        self.db = db
+        self.max_puntos = max_puntos
+        self.tamaño_bloque = tamaño_bloque
+        self.bloques_por_transaccion = bloques_por_transaccion
+        self.progreso = progreso
+
+    def importar_csv(self, ruta: str) -> Dict:
+        """Importa un CSV (opcionalmente .gz)"""
+        return self.importar(leer_csv(ruta))
+
+    def importar_ndjson(self, ruta: str) -> Dict:
+        """Importa un NDJSON (opcionalmente .gz)"""
+        return self.importar(leer_ndjson(ruta))
+
+    def _normalizar(self, fila: Dict) -> Optional[tuple]:
+        """Valida y convierte una fila de entrada; None si es inválida"""
+        try:
+            fecha = date.fromisoformat(str(fila['fecha'])[:10]).isoformat()
+            return (
+                fila.get('usuario_id') or self.db.usuario_id,
+                fecha,
+                str(fila['habito_id']),
+                str(fila.get('bloque_id') or ''),
+                int(fila['puntos']),
+                fila.get('hora') or None,
+                int(fila.get('max_puntos') or self.max_puntos)
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def importar(self, filas: Iterable[Dict]) -> Dict:
+        """
+        Importa hábitos completados desde cualquier iterable de dicts
+
+        Returns:
+            Dict con filas, rechazadas, usuarios, dias, segundos y filas_por_segundo
+        """
+        inicio = time.perf_counter()
+        total, rechazadas, bloques = 0, 0, 0
+        filas = iter(filas)
+        # El perfil solo suma días cerrados, igual que el cierre diario
+        cerrado_hasta = DayCloser(self.db).hasta_vigente()
+
+        conn = self.db._get_connection()
+        try:
+            archivados = {row['año']: row['ruta'] for row in conn.execute("SELECT año, ruta FROM archivo_anual")}
+            rehidratados = set()
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("""
+                CREATE TEMP TABLE importacion_dias (
+                    usuario_id TEXT NOT NULL,
+                    fecha DATE NOT NULL,
+                    max_puntos INTEGER NOT NULL,
+                    PRIMARY KEY (usuario_id, fecha)
+                )
+            """)
+            conn.execute("""
+                CREATE TEMP TABLE importacion_frios (
+                    usuario_id TEXT NOT NULL,
+                    habito_id TEXT NOT NULL,
+                    fecha DATE NOT NULL
+                )
+            """)
+            conn.execute("BEGIN")
+            conn.execute("PRAGMA defer_foreign_keys = ON")
+            # Sin triggers de agregados por fila: _reconstruir los recalcula por conjuntos
+            self.db._pausar_agregados(conn, True)
+
+            while True:
+                crudas = list(islice(filas, self.tamaño_bloque))
+                if not crudas:
+                    break
+                bloque = [f for f in map(self._normalizar, crudas) if f is not None]
+                rechazadas += len(crudas) - len(bloque)
+                frios = {(u, f) for u, f, *_ in bloque if int(f[:4]) in archivados} - rehidratados
+                if frios:
+                    rehidratados |= frios
+                    # ATTACH no se permite dentro de una transacción: se confirma lo anterior
+                    self.db._pausar_agregados(conn, False)
+                    conn.commit()
+                    self._rehidratar(conn, frios, archivados)
+                    conn.execute("BEGIN")
+                    conn.execute("PRAGMA defer_foreign_keys = ON")
+                    self.db._pausar_agregados(conn, True)
+                self._insertar_bloque(conn, bloque)
+                total += len(bloque)
+                bloques += 1
+
+                if bloques % self.bloques_por_transaccion == 0:
+                    self.db._pausar_agregados(conn, False)
+                    conn.commit()
+                    conn.execute("BEGIN")
+                    conn.execute("PRAGMA defer_foreign_keys = ON")
+                    self.db._pausar_agregados(conn, True)
+                if self.progreso:
+                    segundos = time.perf_counter() - inicio
+                    self.progreso({
+                        'filas': total,
+                        'rechazadas': rechazadas,
+                        'filas_por_segundo': total / segundos if segundos > 0 else 0.0
+                    })
+
+            if archivados:
+                # Las rachas cruzan años archivados: sus días se leen antes de reconstruir
+                self.db._pausar_agregados(conn, False)
+                conn.commit()
+                self._leer_frios(conn, archivados)
+                conn.execute("BEGIN")
+                conn.execute("PRAGMA defer_foreign_keys = ON")
+                self.db._pausar_agregados(conn, True)
+
+            resumen = self._reconstruir(conn, cerrado_hasta)
+            self.db._pausar_agregados(conn, False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        segundos = time.perf_counter() - inicio
+        return {
+            'filas': total,
+            'rechazadas': rechazadas,
+            **resumen,
+            'segundos': segundos,
+            'filas_por_segundo': total / segundos if segundos > 0 else 0.0
+        }
+
+    def _rehidratar(self, conn, dias: Set[Tuple[str, str]], archivados: Dict[int, str]):
+        """
+        Devuelve al nivel caliente los días (usuario, fecha) de años archivados
+        antes de escribirlos, como marcar_habito: si no, el día caliente
+        ocultaría los hábitos que siguen en el archivo frío. Un año por transacción
+        """
+        for año in sorted({int(fecha[:4]) for _, fecha in dias}):
+            conn.execute("ATTACH DATABASE ? AS frio", (archivados[año],))
+            try:
+                self.db._mover_a_caliente(conn, 'frio', (d for d in dias if int(d[1][:4]) == año))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("DETACH DATABASE frio")
+
+    @staticmethod
+    def _leer_frios(conn, archivados: Dict[int, str]):
+        """
+        Copia a importacion_frios los días archivados de los usuarios importados,
+        para que RECONSTRUIR_RACHAS vea las islas completas. Un año por ATTACH
+        """
+        for año in sorted(archivados):
+            conn.execute("ATTACH DATABASE ? AS frio", (archivados[año],))
+            try:
+                conn.execute("""
+                    INSERT INTO importacion_frios (usuario_id, habito_id, fecha)
+                    SELECT usuario_id, habito_id, fecha
+                    FROM frio.habitos_completados
+                    WHERE usuario_id IN (SELECT DISTINCT usuario_id FROM importacion_dias)
+                """)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("DETACH DATABASE frio")
+
+    @staticmethod
+    def _insertar_bloque(conn, bloque: List[tuple]):
+        """Inserta un bloque de filas normalizadas (días, hábitos y eventos)"""
+        # El último max_puntos de cada día gana, como en marcar_habito
+        conn.executemany("""
+            INSERT OR REPLACE INTO importacion_dias (usuario_id, fecha, max_puntos) VALUES (?, ?, ?)
+        """, ((u, f, m) for u, f, _, _, _, _, m in bloque))
+        conn.executemany("""
+            INSERT OR IGNORE INTO registros (usuario_id, fecha) VALUES (?, ?)
+        """, ((u, f) for u, f, _, _, _, _, _ in bloque))
+        conn.executemany("""
+            INSERT OR REPLACE INTO habitos_completados
+            (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, ((u, f, h, b, p, hora) for u, f, h, b, p, hora, _ in bloque))
+        conn.executemany("""
+            INSERT OR IGNORE INTO eventos
+            (usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora, clave_idempotencia)
+            VALUES (?, 'marcar', ?, ?, ?, ?, ?, ?, ?)
+        """, ((u, f, h, b, p, m, hora, f"importado:{u}:{f}:{h}") for u, f, h, b, p, hora, m in bloque))
+
+    def _reconstruir(self, conn, cerrado_hasta: date) -> Dict:
+        """Recalcula registros, rachas, perfil, sketches pendientes y leaderboard de lo importado"""
+        usuarios = [row[0] for row in conn.execute("SELECT DISTINCT usuario_id FROM importacion_dias")]
+        filtro = json.dumps(usuarios)
+
+        conn.execute("""
+            UPDATE registros
+            SET puntos_totales = t.total,
+                total_habitos = t.habitos,
+                max_puntos = d.max_puntos,
+                porcentaje_cumplimiento = CASE WHEN d.max_puntos > 0
+                    THEN MIN(100.0, t.total * 100.0 / d.max_puntos) ELSE 0.0 END
+            FROM importacion_dias d
+            JOIN (
+                SELECT h.usuario_id, h.fecha, SUM(h.puntos) AS total, COUNT(*) AS habitos
+                FROM habitos_completados h
+                JOIN importacion_dias d2 ON d2.usuario_id = h.usuario_id AND d2.fecha = h.fecha
+                GROUP BY h.usuario_id, h.fecha
+            ) t ON t.usuario_id = d.usuario_id AND t.fecha = d.fecha
+            WHERE registros.usuario_id = d.usuario_id AND registros.fecha = d.fecha
+        """)
+        conn.execute("""
+            INSERT OR REPLACE INTO sketch_pendientes (usuario_id, fecha, puntos, porcentaje)
+            SELECT r.usuario_id, r.fecha, r.puntos_totales, r.porcentaje_cumplimiento
+            FROM registros r
+            JOIN importacion_dias d ON d.usuario_id = r.usuario_id AND d.fecha = r.fecha
+        """)
+
+        conn.execute(RECONSTRUIR_RACHAS, {'usuarios': filtro})
+
+        DayCloser._actualizar_perfiles(conn, filtro, cerrado_hasta)
+
+        self.db._reconstruir_leaderboard(conn)
+
+        dias = conn.execute("SELECT COUNT(*) FROM importacion_dias").fetchone()[0]
+        return {'usuarios': len(usuarios), 'dias': dias}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivo", help="CSV o NDJSON (admite .gz)")
+    parser.add_argument("--formato", choices=("csv", "ndjson"), help="Default: según la extensión")
+    parser.add_argument("--db", default="database/tracker.db")
+    parser.add_argument("--usuario", default=None, help="Usuario para filas sin usuario_id")
+    parser.add_argument("--max-puntos", type=int, default=175)
+    parser.add_argument("--bloque", type=int, default=10000)
+    args = parser.parse_args()
+
+    formato = args.formato or ("ndjson" if ".ndjson" in args.archivo or ".jsonl" in args.archivo else "csv")
+    db = DatabaseManager(args.db)
+    if args.usuario:
+        db = db.para_usuario(args.usuario)
+
+    def mostrar(estado: Dict):
+        print(f"\r{estado['filas']:,} filas ({estado['rechazadas']} rechazadas) "
+              f"- {estado['filas_por_segundo']:,.0f} filas/s", end="", flush=True)
+
+    importador = HistoricalImporter(db, max_puntos=args.max_puntos, tamaño_bloque=args.bloque, progreso=mostrar)
+    if formato == "csv":
+        resultado = importador.importar_csv(args.archivo)
+    else:
+        resultado = importador.importar_ndjson(args.archivo)
+    print()
+    print(f"Importadas {resultado['filas']:,} filas ({resultado['usuarios']} usuarios, "
+          f"{resultado['dias']:,} días) en {resultado['segundos']:.1f}s "
+          f"- {resultado['filas_por_segundo']:,.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
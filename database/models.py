@@ -3,42 +3,60 @@ Modelos de Base de Datos para Atomic Tracker
 Define la estructura de las tablas SQLite
 """
 
+# Usuario al que pertenecen los datos de instalaciones de un solo usuario
+USUARIO_DEFAULT = "default"
+
+# Porcentaje diario a partir del cual un día cuenta como "perfecto" (meta del 85%)
+META_DIARIA = 85.0
+
+# Versión del esquema, guardada en PRAGMA user_version al terminar las migraciones.
+# Subirla con cada cambio de CREATE_TABLES o migración nueva: una base que ya la
+# tiene se abre sin ejecutar DDL (DatabaseManager._init_database)
+VERSION_ESQUEMA = 2
+
 CREATE_TABLES = """
 -- Tabla principal de registros diarios
 CREATE TABLE IF NOT EXISTS registros (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    fecha DATE NOT NULL UNIQUE,
+    usuario_id TEXT NOT NULL DEFAULT 'default',
+    fecha DATE NOT NULL,
     puntos_totales INTEGER DEFAULT 0,
     porcentaje_cumplimiento REAL DEFAULT 0.0,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    total_habitos INTEGER DEFAULT 0,
+    max_puntos INTEGER DEFAULT 175,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(usuario_id, fecha)
 );
 
 -- Tabla de hábitos completados por día
 CREATE TABLE IF NOT EXISTS habitos_completados (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id TEXT NOT NULL DEFAULT 'default',
     fecha DATE NOT NULL,
     habito_id TEXT NOT NULL,
     bloque_id TEXT NOT NULL,
     puntos INTEGER DEFAULT 0,
     hora_completado TIME,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (fecha) REFERENCES registros(fecha),
-    UNIQUE(fecha, habito_id)
+    FOREIGN KEY (usuario_id, fecha) REFERENCES registros(usuario_id, fecha),
+    UNIQUE(usuario_id, fecha, habito_id)
 );
 
 -- Tabla de rachas
 CREATE TABLE IF NOT EXISTS rachas (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    habito_id TEXT UNIQUE NOT NULL,
+    usuario_id TEXT NOT NULL DEFAULT 'default',
+    habito_id TEXT NOT NULL,
     racha_actual INTEGER DEFAULT 0,
     racha_maxima INTEGER DEFAULT 0,
     ultima_fecha DATE,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(usuario_id, habito_id)
 );
 
--- Tabla de nivel y gamificación
+-- Tabla de nivel y gamificación (una fila por usuario)
 CREATE TABLE IF NOT EXISTS perfil (
-    id INTEGER PRIMARY KEY CHECK (id = 1),
+    usuario_id TEXT PRIMARY KEY,
     nivel INTEGER DEFAULT 1,
     puntos_totales INTEGER DEFAULT 0,
     dias_activos INTEGER DEFAULT 0,
@@ -47,11 +65,322 @@ CREATE TABLE IF NOT EXISTS perfil (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Valores diarios pendientes de incorporar a los sketches poblacionales
+CREATE TABLE IF NOT EXISTS sketch_pendientes (
+    usuario_id TEXT NOT NULL,
+    fecha DATE NOT NULL,
+    puntos INTEGER NOT NULL,
+    porcentaje REAL NOT NULL,
+    PRIMARY KEY (usuario_id, fecha)
+);
+
+-- Sketches serializados (t-digest, HyperLogLog) por nombre y shard
+CREATE TABLE IF NOT EXISTS sketches (
+    nombre TEXT NOT NULL,
+    shard TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    datos BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (nombre, shard)
+);
+
+-- Último día consolidado en los sketches de cada shard
+CREATE TABLE IF NOT EXISTS sketch_estado (
+    shard TEXT PRIMARY KEY,
+    consolidado_hasta DATE
+);
+
+-- Ranking entre usuarios, mantenido incrementalmente en cada marcar/desmarcar
+CREATE TABLE IF NOT EXISTS leaderboard (
+    usuario_id TEXT PRIMARY KEY,
+    puntos INTEGER NOT NULL DEFAULT 0,
+    racha_perfecta INTEGER NOT NULL DEFAULT 0,
+    racha_hasta DATE
+);
+
+-- Badges desbloqueados (se escriben una sola vez por usuario y badge)
+CREATE TABLE IF NOT EXISTS badges_desbloqueados (
+    usuario_id TEXT NOT NULL,
+    badge_id TEXT NOT NULL,
+    desbloqueado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (usuario_id, badge_id)
+);
+
+-- Log inmutable de operaciones: fuente de verdad desde la que se reconstruyen
+-- registros, habitos_completados, rachas, perfil, badges y leaderboard
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id TEXT NOT NULL,
+    tipo TEXT NOT NULL CHECK (tipo IN ('marcar', 'desmarcar')),
+    fecha DATE NOT NULL,
+    habito_id TEXT NOT NULL,
+    bloque_id TEXT,
+    puntos INTEGER DEFAULT 0,
+    max_puntos INTEGER NOT NULL,
+    hora TIME,
+    clave_idempotencia TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Momento de la operación en el cliente (UTC) para las que llegan por
+    -- sincronización; decide los conflictos junto con created_at
+    cliente_ts TEXT,
+    -- Las claves las elige el cliente: solo son únicas dentro de cada usuario
+    UNIQUE (usuario_id, clave_idempotencia)
+);
+
+CREATE TRIGGER IF NOT EXISTS eventos_sin_update BEFORE UPDATE ON eventos
+BEGIN
+    SELECT RAISE(ABORT, 'eventos es de solo inserción');
+END;
+
+CREATE TRIGGER IF NOT EXISTS eventos_sin_delete BEFORE DELETE ON eventos
+BEGIN
+    SELECT RAISE(ABORT, 'eventos es de solo inserción');
+END;
+
+-- Años de habitos_completados movidos a archivos SQLite fríos (uno por año)
+CREATE TABLE IF NOT EXISTS archivo_anual (
+    año INTEGER PRIMARY KEY,
+    ruta TEXT NOT NULL,
+    filas INTEGER DEFAULT 0,
+    archivado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Marca de agua del cierre diario: último día cerrado y último evento visto
+CREATE TABLE IF NOT EXISTS cierre_dia (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    cerrado_hasta DATE,
+    ultimo_evento INTEGER NOT NULL DEFAULT 0,
+    cerrado_en TIMESTAMP
+);
+
+-- Interruptor de los triggers de agregados (una sola fila). Se activa solo
+-- dentro de una transacción que mueve filas sin cambiar el día (nivel frío)
+-- o que reescribe registros por conjuntos (importador, replay), y se apaga
+-- antes del COMMIT: las demás conexiones nunca lo ven encendido
+CREATE TABLE IF NOT EXISTS agregados_pausa (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    activa INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO agregados_pausa (id, activa) VALUES (1, 0);
+
+-- Agregados del día en registros (puntos, porcentaje, total de hábitos) como
+-- deltas O(1) por fila de habitos_completados; también encolan el día para
+-- los sketches poblacionales (con upsert: dentro de un trigger el OR REPLACE
+-- lo reemplaza la política de conflicto de la sentencia externa)
+CREATE TRIGGER IF NOT EXISTS agregados_insert AFTER INSERT ON habitos_completados
+WHEN NOT (SELECT activa FROM agregados_pausa)
+BEGIN
+    UPDATE registros SET
+        puntos_totales = puntos_totales + COALESCE(NEW.puntos, 0),
+        total_habitos = total_habitos + 1,
+        porcentaje_cumplimiento = CASE WHEN max_puntos > 0
+            THEN MIN(100.0, (puntos_totales + COALESCE(NEW.puntos, 0)) * 100.0 / max_puntos) ELSE 0.0 END
+    WHERE usuario_id = NEW.usuario_id AND fecha = NEW.fecha;
+    INSERT INTO sketch_pendientes (usuario_id, fecha, puntos, porcentaje)
+    SELECT usuario_id, fecha, puntos_totales, porcentaje_cumplimiento
+    FROM registros WHERE usuario_id = NEW.usuario_id AND fecha = NEW.fecha
+    ON CONFLICT(usuario_id, fecha) DO UPDATE SET puntos = excluded.puntos, porcentaje = excluded.porcentaje;
+END;
+
+CREATE TRIGGER IF NOT EXISTS agregados_delete AFTER DELETE ON habitos_completados
+WHEN NOT (SELECT activa FROM agregados_pausa)
+BEGIN
+    UPDATE registros SET
+        puntos_totales = puntos_totales - COALESCE(OLD.puntos, 0),
+        total_habitos = total_habitos - 1,
+        porcentaje_cumplimiento = CASE WHEN max_puntos > 0
+            THEN MIN(100.0, (puntos_totales - COALESCE(OLD.puntos, 0)) * 100.0 / max_puntos) ELSE 0.0 END
+    WHERE usuario_id = OLD.usuario_id AND fecha = OLD.fecha;
+    INSERT INTO sketch_pendientes (usuario_id, fecha, puntos, porcentaje)
+    SELECT usuario_id, fecha, puntos_totales, porcentaje_cumplimiento
+    FROM registros WHERE usuario_id = OLD.usuario_id AND fecha = OLD.fecha
+    ON CONFLICT(usuario_id, fecha) DO UPDATE SET puntos = excluded.puntos, porcentaje = excluded.porcentaje;
+END;
+
+-- Cambio de puntos de un hábito ya marcado (el upsert de marcar_habito)
+CREATE TRIGGER IF NOT EXISTS agregados_update AFTER UPDATE OF puntos ON habitos_completados
+WHEN NOT (SELECT activa FROM agregados_pausa)
+BEGIN
+    UPDATE registros SET
+        puntos_totales = puntos_totales + COALESCE(NEW.puntos, 0) - COALESCE(OLD.puntos, 0),
+        porcentaje_cumplimiento = CASE WHEN max_puntos > 0
+            THEN MIN(100.0, (puntos_totales + COALESCE(NEW.puntos, 0) - COALESCE(OLD.puntos, 0)) * 100.0 / max_puntos)
+            ELSE 0.0 END
+    WHERE usuario_id = NEW.usuario_id AND fecha = NEW.fecha;
+    INSERT INTO sketch_pendientes (usuario_id, fecha, puntos, porcentaje)
+    SELECT usuario_id, fecha, puntos_totales, porcentaje_cumplimiento
+    FROM registros WHERE usuario_id = NEW.usuario_id AND fecha = NEW.fecha
+    ON CONFLICT(usuario_id, fecha) DO UPDATE SET puntos = excluded.puntos, porcentaje = excluded.porcentaje;
+END;
+
 -- Insertar perfil inicial si no existe
-INSERT OR IGNORE INTO perfil (id, nivel, puntos_totales) VALUES (1, 1, 0);
+INSERT OR IGNORE INTO perfil (usuario_id, nivel, puntos_totales) VALUES ('default', 1, 0);
 
 -- Índices para optimización
 CREATE INDEX IF NOT EXISTS idx_registros_fecha ON registros(fecha);
-CREATE INDEX IF NOT EXISTS idx_habitos_fecha ON habitos_completados(fecha);
-CREATE INDEX IF NOT EXISTS idx_rachas_habito ON rachas(habito_id);
-"""
\ No newline at end of file
+-- Sobraban (benchmarks.index_audit): (usuario_id, fecha) es prefijo del UNIQUE de
+-- habitos_completados y las rachas se buscan siempre por UNIQUE(usuario_id, habito_id)
+DROP INDEX IF EXISTS idx_habitos_fecha;
+DROP INDEX IF EXISTS idx_rachas_habito;
+CREATE INDEX IF NOT EXISTS idx_sketch_pendientes_fecha ON sketch_pendientes(fecha);
+CREATE INDEX IF NOT EXISTS idx_eventos_usuario ON eventos(usuario_id, id);
+CREATE INDEX IF NOT EXISTS idx_eventos_dia ON eventos(usuario_id, fecha, habito_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_puntos ON leaderboard(puntos DESC, usuario_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_racha ON leaderboard(racha_perfecta DESC, usuario_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_racha_hasta ON leaderboard(racha_hasta);
+"""
+
+# Esquema de un archivo frío adjuntado como `frio` (sin FK: registros queda en caliente)
+CREATE_TABLA_FRIA = """
+CREATE TABLE IF NOT EXISTS frio.habitos_completados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id TEXT NOT NULL,
+    fecha DATE NOT NULL,
+    habito_id TEXT NOT NULL,
+    bloque_id TEXT NOT NULL,
+    puntos INTEGER DEFAULT 0,
+    hora_completado TIME,
+    created_at TIMESTAMP,
+    UNIQUE(usuario_id, fecha, habito_id)
+);
+"""
+
+# Migración de bases de datos de un solo usuario (sin columna usuario_id).
+# Se renombran las tablas antiguas, se eliminan sus índices (que conservan el
+# nombre tras el RENAME), se crea el esquema nuevo y se copian los datos al
+# usuario 'default'.
+MIGRACION_MULTIUSUARIO_PREVIA = """
+ALTER TABLE registros RENAME TO registros_v1;
+ALTER TABLE habitos_completados RENAME TO habitos_completados_v1;
+ALTER TABLE rachas RENAME TO rachas_v1;
+ALTER TABLE perfil RENAME TO perfil_v1;
+
+DROP INDEX IF EXISTS idx_registros_fecha;
+DROP INDEX IF EXISTS idx_habitos_fecha;
+DROP INDEX IF EXISTS idx_rachas_habito;
+"""
+
+# habitos_completados se copia antes que registros para que los triggers de
+# agregados no encuentren el día y no sumen otra vez los puntos ya copiados
+MIGRACION_MULTIUSUARIO_DATOS = """
+INSERT INTO habitos_completados (usuario_id, fecha, habito_id, bloque_id, puntos, hora_completado, created_at)
+SELECT 'default', fecha, habito_id, bloque_id, puntos, hora_completado, created_at FROM habitos_completados_v1;
+
+INSERT INTO registros (usuario_id, fecha, puntos_totales, porcentaje_cumplimiento, created_at)
+SELECT 'default', fecha, puntos_totales, porcentaje_cumplimiento, created_at FROM registros_v1;
+
+INSERT INTO rachas (usuario_id, habito_id, racha_actual, racha_maxima, ultima_fecha, updated_at)
+SELECT 'default', habito_id, racha_actual, racha_maxima, ultima_fecha, updated_at FROM rachas_v1;
+
+INSERT OR REPLACE INTO perfil (usuario_id, nivel, puntos_totales, dias_activos, identidad_actual, created_at, updated_at)
+SELECT 'default', nivel, puntos_totales, dias_activos, identidad_actual, created_at, updated_at FROM perfil_v1;
+
+DROP TABLE registros_v1;
+DROP TABLE habitos_completados_v1;
+DROP TABLE rachas_v1;
+DROP TABLE perfil_v1;
+"""
+
+# Bases anteriores a los triggers de agregados: columnas nuevas de registros
+MIGRACION_AGREGADOS = """
+ALTER TABLE registros ADD COLUMN total_habitos INTEGER DEFAULT 0;
+ALTER TABLE registros ADD COLUMN max_puntos INTEGER DEFAULT 175;
+"""
+
+# Log de eventos anterior a la sincronización offline (database.sync)
+MIGRACION_EVENTOS_CLIENTE = """
+ALTER TABLE eventos ADD COLUMN cliente_ts TEXT;
+"""
+
+# Log de eventos con clave_idempotencia única entre todos los usuarios: se
+# reconstruye con la clave única por (usuario_id, clave). Los triggers e
+# índices se borran antes para que CREATE_TABLES los cree sobre la tabla nueva
+MIGRACION_CLAVE_POR_USUARIO_PREVIA = """
+ALTER TABLE eventos RENAME TO eventos_v1;
+
+DROP TRIGGER IF EXISTS eventos_sin_update;
+DROP TRIGGER IF EXISTS eventos_sin_delete;
+DROP INDEX IF EXISTS idx_eventos_usuario;
+DROP INDEX IF EXISTS idx_eventos_dia;
+"""
+
+MIGRACION_CLAVE_POR_USUARIO_DATOS = """
+INSERT INTO eventos
+(id, usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora, clave_idempotencia, created_at, cliente_ts)
+SELECT id, usuario_id, tipo, fecha, habito_id, bloque_id, puntos, max_puntos, hora, clave_idempotencia, created_at, cliente_ts
+FROM eventos_v1 ORDER BY id;
+
+DROP TABLE eventos_v1;
+"""
+
+# Rellena total_habitos y deduce max_puntos del porcentaje guardado cuando se puede
+# (el conteo de los años fríos se suma aparte, adjuntando cada archivo)
+RELLENAR_AGREGADOS = """
+UPDATE registros SET
+    total_habitos = (
+        SELECT COUNT(*) FROM habitos_completados h
+        WHERE h.usuario_id = registros.usuario_id AND h.fecha = registros.fecha
+    ),
+    max_puntos = CASE WHEN porcentaje_cumplimiento > 0 AND porcentaje_cumplimiento < 100
+        THEN CAST(ROUND(puntos_totales * 100.0 / porcentaje_cumplimiento) AS INTEGER)
+        ELSE max_puntos END
+"""
+
+# Reconstrucción completa del leaderboard desde registros (bases migradas o reparación).
+# La racha perfecta es la última "isla" de días consecutivos >= meta (gaps and islands).
+RECONSTRUIR_LEADERBOARD = """
+WITH perfectos AS (
+    SELECT usuario_id, fecha,
+           julianday(fecha) - ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY fecha) AS isla
+    FROM registros
+    WHERE porcentaje_cumplimiento >= :meta
+), islas AS (
+    SELECT usuario_id, COUNT(*) AS largo, MAX(fecha) AS hasta,
+           ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY MAX(fecha) DESC) AS orden
+    FROM perfectos
+    GROUP BY usuario_id, isla
+), puntos AS (
+    SELECT usuario_id, SUM(puntos_totales) AS total
+    FROM registros
+    GROUP BY usuario_id
+)
+INSERT OR REPLACE INTO leaderboard (usuario_id, puntos, racha_perfecta, racha_hasta)
+SELECT p.usuario_id,
+       COALESCE(pt.total, 0),
+       CASE WHEN i.hasta >= :vigente_desde THEN i.largo ELSE 0 END,
+       CASE WHEN i.hasta >= :vigente_desde THEN i.hasta END
+FROM perfil p
+LEFT JOIN puntos pt ON pt.usuario_id = p.usuario_id
+LEFT JOIN islas i ON i.usuario_id = p.usuario_id AND i.orden = 1
+"""
+
+# Rachas por hábito desde habitos_completados (islas de días consecutivos),
+# para los usuarios del arreglo JSON :usuarios. Los días de años archivados
+# llegan en la tabla temporal importacion_frios (usuario_id, habito_id, fecha)
+RECONSTRUIR_RACHAS = """
+WITH dias AS (
+    SELECT usuario_id, habito_id, fecha
+    FROM habitos_completados
+    WHERE usuario_id IN (SELECT value FROM json_each(:usuarios))
+    UNION
+    SELECT usuario_id, habito_id, fecha
+    FROM temp.importacion_frios
+), islas AS (
+    SELECT usuario_id, habito_id, COUNT(*) AS largo, MAX(fecha) AS hasta
+    FROM (
+        SELECT usuario_id, habito_id, fecha,
+               julianday(fecha) - ROW_NUMBER() OVER (PARTITION BY usuario_id, habito_id ORDER BY fecha) AS isla
+        FROM dias
+    )
+    GROUP BY usuario_id, habito_id, isla
+), ordenadas AS (
+    SELECT usuario_id, habito_id, largo, hasta,
+           MAX(largo) OVER (PARTITION BY usuario_id, habito_id) AS maxima,
+           ROW_NUMBER() OVER (PARTITION BY usuario_id, habito_id ORDER BY hasta DESC) AS orden
+    FROM islas
+)
+INSERT OR REPLACE INTO rachas (usuario_id, habito_id, racha_actual, racha_maxima, ultima_fecha)
+SELECT usuario_id, habito_id, largo, maxima, hasta
+FROM ordenadas
+WHERE orden = 1
+"""
@@ -0,0 +1,113 @@
+"""
+Conexiones Reutilizables
+DatabaseManager abre y cierra una conexión por operación, y cada conexión
+nueva vuelve a leer y parsear el esquema (triggers incluidos). En procesos de
+larga vida (API, servicios async) PooledDatabaseManager reutiliza conexiones:
+cada hilo guarda las suyas ociosas y `close()` las devuelve en vez de cerrarlas
+"""
+
+import sqlite3
+import threading
+from typing import List
+
+from database.db_manager import DatabaseManager
+from database.models import USUARIO_DEFAULT
+
+
+class ConexionReutilizable(sqlite3.Connection):
+    """close() deshace lo que haya quedado sin confirmar y devuelve la conexión a su pool"""
+
+    pool: 'PoolConexiones' = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.pool.devolver(self)
+
+    def cerrar(self):
+        """Cierre real"""
+        super().close()
+
+
+class PoolConexiones:
+    """
+    Conexiones por hilo: obtener() toma una ociosa del hilo actual o abre otra
+    (dos llamadas anidadas, como obtener_metricas_dia -> crear_registro_dia,
+    reciben conexiones distintas y sus transacciones no se mezclan)
+    """
+
+    def __init__(self, db_path: str, max_ociosas: int = 4, uri: bool = False):
+        """
+        Args:
+            db_path: Ruta (o URI con uri=True) de la base
+            max_ociosas: Conexiones ociosas que conserva cada hilo; las demás se cierran
+        """
+        self.db_path = db_path
+        self.uri = uri
+        self.max_ociosas = max_ociosas
+        self.abiertas = 0  # Conexiones abiertas ahora (ociosas o en uso)
+        self._locales = threading.local()
+        self._todas: List[ConexionReutilizable] = []
+        self._lock = threading.Lock()
+
+    def _ociosas(self) -> List[ConexionReutilizable]:
+        ociosas = getattr(self._locales, 'ociosas', None)
+        if ociosas is None:
+            ociosas = self._locales.ociosas = []
+        return ociosas
+
+    def obtener(self) -> sqlite3.Connection:
+        ociosas = self._ociosas()
+        if ociosas:
+            conn = ociosas.pop()
+            conn.row_factory = sqlite3.Row  # Sin importar lo que haya dejado el uso anterior
+            return conn
+        # check_same_thread=False solo para poder cerrarlas todas al final: cada una se usa en un hilo
+        conn = sqlite3.connect(self.db_path, factory=ConexionReutilizable, check_same_thread=False, uri=self.uri)
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        with self._lock:
+            self._todas.append(conn)
+            self.abiertas += 1
+        return conn
+
+    def devolver(self, conn: ConexionReutilizable):
+        ociosas = self._ociosas()
+        if len(ociosas) < self.max_ociosas:
+            conn.row_factory = sqlite3.Row
+            ociosas.append(conn)
+            return
+        with self._lock:
+            self._todas.remove(conn)
+            self.abiertas -= 1
+        conn.cerrar()
+
+    def cerrar(self):
+        """Cierra todas las conexiones (al apagar el proceso)"""
+        with self._lock:
+            todas, self._todas = self._todas, []
+            self.abiertas -= len(todas)
+        for conn in todas:
+            conn.cerrar()
+
+
+class PooledDatabaseManager(DatabaseManager):
+    """
+    DatabaseManager con conexiones reutilizadas por hilo. Los gestores de
+    para_usuario comparten el pool. No usa registro_consultas: las conexiones
+    medidas de database.query_log son de otra clase.
+    """
+
+    def __init__(self, db_path: str = "database/tracker.db", usuario_id: str = USUARIO_DEFAULT,
+                 max_ociosas: int = 4):
+        self.pool = PoolConexiones(db_path, max_ociosas)
+        super().__init__(db_path, usuario_id)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        return self.pool.obtener()
+
+    def cerrar(self):
+        self.pool.cerrar()
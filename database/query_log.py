@@ -0,0 +1,218 @@
+"""
+Registro de Consultas Lentas
+Mide cada sentencia SQL de las conexiones de DatabaseManager (execute más sus
+fetch, hasta agotar el cursor o descartarlo) y guarda las que superan un
+umbral con sus parámetros y su EXPLAIN QUERY PLAN
+
+Se activa con variables de entorno (sin ellas las conexiones son las de siempre):
+    ATOMIC_SLOW_QUERY_MS=50                          -> umbral en milisegundos
+    ATOMIC_SLOW_QUERY_LOG=database/slow_queries.jsonl -> archivo JSON Lines (opcional)
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def normalizar(sql: str) -> str:
+    """Una sentencia en una línea, para agrupar las ejecuciones de la misma consulta"""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def plan_consulta(conn: sqlite3.Connection, sql: str, parametros=()) -> Optional[List[str]]:
+    """
+    Árbol de EXPLAIN QUERY PLAN como líneas indentadas, o None si la sentencia
+    no admite plan (BEGIN, PRAGMA, DDL) o ya no se puede preparar
+    """
+    try:
+        # Cursor base: el plan no debe medirse ni registrarse a sí mismo
+        filas = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    niveles, lineas = {0: -1}, []
+    for id_nodo, padre, _, detalle in filas:
+        niveles[id_nodo] = niveles.get(padre, -1) + 1
+        lineas.append("  " * niveles[id_nodo] + detalle)
+    return lineas or None
+
+
+class SlowQueryLog:
+    """
+    Estadísticas por sentencia normalizada (llamadas, tiempo total y máximo,
+    parámetros de ejemplo) de todas las consultas, y las ejecuciones lentas
+    con su plan en memoria (las últimas `capacidad`) y opcionalmente en un
+    archivo JSON Lines
+    """
+
+    def __init__(self, umbral_ms: float = 50.0, ruta: Optional[str] = None, capacidad: int = 200):
+        """
+        Args:
+            umbral_ms: Duración a partir de la cual una ejecución se registra como lenta
+            ruta: Archivo JSON Lines donde agregar las consultas lentas (None: solo en memoria)
+            capacidad: Consultas lentas que se conservan en memoria
+        """
+        self.umbral = umbral_ms / 1000
+        self.ruta = ruta
+        self.lentas = deque(maxlen=capacidad)
+        self.estadisticas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if ruta:
+            os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+
+    def conectar(self, ruta: str, **kwargs) -> sqlite3.Connection:
+        """sqlite3.connect con una conexión que mide sus sentencias en este registro"""
+        conn = sqlite3.connect(ruta, factory=ConexionMedida, **kwargs)
+        conn.registro = self
+        return conn
+
+    def registrar(self, conn: sqlite3.Connection, sql: str, parametros, segundos: float):
+        clave = normalizar(sql)
+        with self._lock:
+            estadistica = self.estadisticas.get(clave)
+            if estadistica is None:
+                estadistica = self.estadisticas[clave] = {
+                    'llamadas': 0, 'segundos': 0.0, 'max_segundos': 0.0, 'parametros': parametros
+                }
+            estadistica['llamadas'] += 1
+            estadistica['segundos'] += segundos
+            estadistica['max_segundos'] = max(estadistica['max_segundos'], segundos)
+        if segundos < self.umbral:
+            return
+
+        entrada = {
+            'fecha': datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(segundos * 1000, 3),
+            'sql': clave,
+            'parametros': parametros,
+            'plan': plan_consulta(conn, sql, parametros)
+        }
+        with self._lock:
+            self.lentas.append(entrada)
+            if self.ruta:
+                try:
+                    with open(self.ruta, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entrada, ensure_ascii=False, default=str) + "\n")
+                except OSError as e:
+                    print(f"Error escribiendo el registro de consultas lentas: {e}")
+
+    def resumen(self, limite: int = 20) -> List[Dict]:
+        """Las sentencias con más tiempo acumulado"""
+        with self._lock:
+            filas = [{'sql': sql, **datos} for sql, datos in self.estadisticas.items()]
+        return sorted(filas, key=lambda fila: -fila['segundos'])[:limite]
+
+
+class CursorMedido(sqlite3.Cursor):
+    """
+    Acumula el tiempo de execute y de los fetch posteriores; la sentencia se
+    registra al agotar el cursor, al ejecutar otra, al cerrarlo o al descartarlo
+    """
+
+    _pendiente = None
+
+    def _medir(self, inicio: float):
+        if self._pendiente is not None:
+            self._pendiente[2] += time.perf_counter() - inicio
+
+    def _terminar(self):
+        pendiente, self._pendiente = self._pendiente, None
+        if pendiente is not None:
+            self.connection.registro.registrar(self.connection, *pendiente)
+
+    def execute(self, sql, parametros=()):
+        self._terminar()
+        inicio = time.perf_counter()
+        self._pendiente = [sql, parametros, 0.0]
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._medir(inicio)
+
+    def executemany(self, sql, secuencia):
+        self._terminar()
+        secuencia = list(secuencia)
+        inicio = time.perf_counter()
+        self._pendiente = [sql, secuencia[0] if secuencia else (), 0.0]
+        try:
+            return super().executemany(sql, secuencia)
+        finally:
+            self._medir(inicio)
+            self._terminar()
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        self._medir(inicio)
+        if fila is None:
+            self._terminar()
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        filas = super().fetchmany(*args, **kwargs)
+        self._medir(inicio)
+        if not filas:
+            self._terminar()
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        self._medir(inicio)
+        self._terminar()
+        return filas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            return super().__next__()
+        except StopIteration:
+            self._medir(inicio)
+            self._terminar()
+            raise
+        finally:
+            self._medir(inicio)
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._terminar()
+        except sqlite3.Error:
+            pass
+
+
+class ConexionMedida(sqlite3.Connection):
+    """Conexión cuyos cursores son CursorMedido; el COMMIT también se mide"""
+
+    registro: SlowQueryLog = None
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        super().commit()
+        self.registro.registrar(self, "COMMIT", (), time.perf_counter() - inicio)
+
+
+def configuracion_entorno() -> Optional[SlowQueryLog]:
+    """El registro pedido por ATOMIC_SLOW_QUERY_MS / ATOMIC_SLOW_QUERY_LOG, o None"""
+    umbral = os.environ.get("ATOMIC_SLOW_QUERY_MS")
+    if not umbral:
+        return None
+    return SlowQueryLog(float(umbral), os.environ.get("ATOMIC_SLOW_QUERY_LOG") or None)
@@ -0,0 +1,290 @@
+"""
+Capa de Sketches Poblacionales
+Mantiene t-digests e HyperLogLogs incrementales para comparar a un usuario con
+toda la población sin recorrer el histórico de todos en cada render
+"""
+
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from utils.sketches import TDigest, HyperLogLog, TIPOS_SKETCH
+
+
+class SketchStore:
+    """
+    Sketches persistidos en la tabla `sketches`, alimentados desde
+    los triggers de agregados de habitos_completados vía `sketch_pendientes`.
+
+    Un día entra a los t-digests una sola vez, cuando ya está cerrado
+    (fecha < hoy); así los cambios durante el día no se cuentan dos veces.
+    Las ediciones posteriores de días ya consolidados se ignoran.
+    """
+
+    METRICAS = ('porcentaje', 'puntos', 'promedio_30d')
+    DIAS_PROMEDIO = 30
+
+    def __init__(self, db, shard: str = "0", compresion: float = 100.0):
+        """
+        Args:
+            db: DatabaseManager de la base de datos a resumir
+            shard: Identificador de este shard (para combinar con otros)
+            compresion: Compresión de los t-digests
+        """
+        self.db = db
+        self.shard = shard
+        self.compresion = compresion
+
+    # ========================
+    # CONSOLIDACIÓN
+    # ========================
+
+    def consolidar(self, hasta: date = None) -> int:
+        """
+        Incorpora a los sketches los días pendientes anteriores a `hasta`
+
+        Returns:
+            Número de valores usuario-día incorporados
+        """
+        hasta = hasta or date.today()
+        conn = self.db._get_connection()
+        try:
+            if conn.execute(
+                "SELECT 1 FROM sketch_pendientes WHERE fecha < ? LIMIT 1", (hasta.isoformat(),)
+            ).fetchone() is None:
+                return 0
+
+            fila = conn.execute(
+                "SELECT consolidado_hasta FROM sketch_estado WHERE shard = ?", (self.shard,)
+            ).fetchone()
+            if fila and fila['consolidado_hasta']:
+                conn.execute(
+                    "DELETE FROM sketch_pendientes WHERE fecha < ?", (fila['consolidado_hasta'],)
+                )
+
+            pendientes = conn.execute("""
+                SELECT usuario_id, fecha, puntos, porcentaje
+                FROM sketch_pendientes
+                WHERE fecha < ?
+                ORDER BY fecha
+            """, (hasta.isoformat(),)).fetchall()
+
+            por_fecha: Dict[str, List[sqlite3.Row]] = {}
+            for row in pendientes:
+                por_fecha.setdefault(row['fecha'], []).append(row)
+
+            for fecha_iso, filas in por_fecha.items():
+                self._consolidar_dia(conn, date.fromisoformat(fecha_iso), filas)
+
+            conn.execute("DELETE FROM sketch_pendientes WHERE fecha < ?", (hasta.isoformat(),))
+            conn.execute("""
+                INSERT OR REPLACE INTO sketch_estado (shard, consolidado_hasta)
+                VALUES (?, ?)
+            """, (self.shard, hasta.isoformat()))
+            conn.commit()
+            return len(pendientes)
+        except Exception as e:
+            print(f"Error consolidando sketches: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+
+    def _consolidar_dia(self, conn: sqlite3.Connection, fecha: date, filas: List[sqlite3.Row]):
+        """Agrega los valores cerrados de un día a sus sketches"""
+        fecha_iso = fecha.isoformat()
+        porcentajes = self._cargar(conn, f"porcentaje:{fecha_iso}", 'tdigest')
+        puntos = self._cargar(conn, f"puntos:{fecha_iso}", 'tdigest')
+        activos_dia = self._cargar(conn, f"dau:{fecha_iso}", 'hll')
+        activos_semana = self._cargar(conn, f"wau:{self._clave_semana(fecha)}", 'hll')
+
+        for fila in filas:
+            porcentajes.agregar(fila['porcentaje'])
+            puntos.agregar(fila['puntos'])
+            if fila['puntos'] > 0:
+                activos_dia.agregar(fila['usuario_id'])
+                activos_semana.agregar(fila['usuario_id'])
+
+        # Promedio móvil de 30 días de los usuarios que registraron ese día
+        promedios = self._cargar(conn, f"promedio_30d:{fecha_iso}", 'tdigest')
+        cursor = conn.execute("""
+            SELECT AVG(r.porcentaje_cumplimiento) AS promedio
+            FROM registros r
+            JOIN sketch_pendientes p ON p.usuario_id = r.usuario_id AND p.fecha = ?
+            WHERE r.fecha >= ? AND r.fecha <= ?
+            GROUP BY r.usuario_id
+        """, (fecha_iso, (fecha - timedelta(days=self.DIAS_PROMEDIO)).isoformat(), fecha_iso))
+        promedios.agregar_varios(row['promedio'] for row in cursor)
+
+        self._guardar(conn, f"porcentaje:{fecha_iso}", porcentajes)
+        self._guardar(conn, f"puntos:{fecha_iso}", puntos)
+        self._guardar(conn, f"promedio_30d:{fecha_iso}", promedios)
+        self._guardar(conn, f"dau:{fecha_iso}", activos_dia)
+        self._guardar(conn, f"wau:{self._clave_semana(fecha)}", activos_semana)
+
+    def _cargar(self, conn: sqlite3.Connection, nombre: str, tipo: str):
+        """Carga el sketch de este shard o crea uno vacío"""
+        row = conn.execute(
+            "SELECT datos FROM sketches WHERE nombre = ? AND shard = ?", (nombre, self.shard)
+        ).fetchone()
+        if row:
+            return TIPOS_SKETCH[tipo].deserializar(row['datos'])
+        return TDigest(self.compresion) if tipo == 'tdigest' else HyperLogLog()
+
+    def _guardar(self, conn: sqlite3.Connection, nombre: str, sketch):
+        """Persiste un sketch de este shard"""
+        tipo = 'tdigest' if isinstance(sketch, TDigest) else 'hll'
+        conn.execute("""
+            INSERT OR REPLACE INTO sketches (nombre, shard, tipo, datos, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (nombre, self.shard, tipo, sketch.serializar()))
+
+    @staticmethod
+    def _clave_semana(fecha: date) -> str:
+        """Clave ISO de la semana (ej: 2025-W07)"""
+        año, semana, _ = fecha.isocalendar()
+        return f"{año}-W{semana:02d}"
+
+    # ========================
+    # CONSULTAS
+    # ========================
+
+    def _combinar_rango(self, prefijo: str, desde: date, hasta: date, tipo: str):
+        """Combina los sketches de todos los shards entre dos fechas (inclusive)"""
+        self.consolidar()
+        conn = self.db._get_connection()
+        try:
+            cursor = conn.execute("""
+                SELECT datos FROM sketches
+                WHERE nombre >= ? AND nombre <= ?
+            """, (f"{prefijo}:{desde.isoformat()}", f"{prefijo}:{hasta.isoformat()}"))
+            combinado = TDigest(self.compresion) if tipo == 'tdigest' else HyperLogLog()
+            for row in cursor:
+                combinado.combinar(TIPOS_SKETCH[tipo].deserializar(row['datos']))
+            return combinado
+        finally:
+            conn.close()
+
+    def _digest(self, metrica: str, desde: date = None, hasta: date = None) -> TDigest:
+        """Digest poblacional de una métrica en un rango de días cerrados"""
+        if metrica not in self.METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica}")
+        hasta = hasta or date.today() - timedelta(days=1)
+        if metrica == 'promedio_30d':
+            # Cada día ya resume 30 días: basta con el último día consolidado
+            desde = desde or hasta
+        else:
+            desde = desde or hasta - timedelta(days=self.DIAS_PROMEDIO - 1)
+        return self._combinar_rango(metrica, desde, hasta, 'tdigest')
+
+    def rango_percentil(self, metrica: str, valor: float, desde: date = None, hasta: date = None) -> Optional[float]:
+        """
+        Porcentaje aproximado de la población con un valor menor o igual
+
+        Args:
+            metrica: 'porcentaje', 'puntos' o 'promedio_30d'
+            valor: Valor a ubicar en la distribución
+            desde, hasta: Rango de días cerrados (default: últimos 30 días)
+
+        Returns:
+            Percentil 0-100 o None si no hay datos poblacionales
+        """
+        digest = self._digest(metrica, desde, hasta)
+        if digest.total == 0:
+            return None
+        return digest.cdf(valor) * 100
+
+    def cuantiles(self, metrica: str, qs: List[float] = (0.25, 0.5, 0.75, 0.9),
+                  desde: date = None, hasta: date = None) -> Dict[float, Optional[float]]:
+        """
+        Cuantiles aproximados de la distribución poblacional
+
+        Returns:
+            Dict {q: valor}
+        """
+        digest = self._digest(metrica, desde, hasta)
+        return {q: digest.cuantil(q) for q in qs}
+
+    def posicion_usuario(self, usuario_id: str, hoy: date = None) -> Dict:
+        """
+        Ubica el promedio de 30 días de un usuario en la población
+        (ej: "tu promedio está en el top 12%")
+
+        Returns:
+            Dict con promedio del usuario, percentil y top (100 - percentil)
+        """
+        hoy = hoy or date.today()
+        historico = self.db.para_usuario(usuario_id).obtener_historico(dias=self.DIAS_PROMEDIO)
+        if not historico:
+            return {'promedio': 0.0, 'percentil': None, 'top': None}
+
+        promedio = sum(r['porcentaje_cumplimiento'] for r in historico) / len(historico)
+        percentil = self.rango_percentil('promedio_30d', promedio, hasta=hoy - timedelta(days=1))
+        return {
+            'promedio': promedio,
+            'percentil': percentil,
+            'top': None if percentil is None else max(0.0, 100 - percentil)
+        }
+
+    def usuarios_activos_dia(self, fecha: date = None) -> int:
+        """Usuarios distintos con puntos en un día (aproximado para días cerrados)"""
+        fecha = fecha or date.today()
+        hll = self._combinar_rango('dau', fecha, fecha, 'hll')
+        self._agregar_pendientes(hll, fecha, fecha)
+        return hll.contar()
+
+    def usuarios_activos_semana(self, fecha: date = None) -> int:
+        """Usuarios distintos con puntos en la semana ISO de la fecha"""
+        fecha = fecha or date.today()
+        clave = self._clave_semana(fecha)
+        self.consolidar()
+        conn = self.db._get_connection()
+        try:
+            hll = HyperLogLog()
+            for row in conn.execute("SELECT datos FROM sketches WHERE nombre = ?", (f"wau:{clave}",)):
+                hll.combinar(HyperLogLog.deserializar(row['datos']))
+        finally:
+            conn.close()
+        lunes = fecha - timedelta(days=fecha.weekday())
+        self._agregar_pendientes(hll, lunes, lunes + timedelta(days=6))
+        return hll.contar()
+
+    def _agregar_pendientes(self, hll: HyperLogLog, desde: date, hasta: date):
+        """Suma al HyperLogLog los usuarios activos de días aún abiertos"""
+        conn = self.db._get_connection()
+        try:
+            cursor = conn.execute("""
+                SELECT DISTINCT usuario_id FROM sketch_pendientes
+                WHERE fecha >= ? AND fecha <= ? AND puntos > 0
+            """, (desde.isoformat(), hasta.isoformat()))
+            for row in cursor:
+                hll.agregar(row['usuario_id'])
+        finally:
+            conn.close()
+
+    # ========================
+    # SHARDS
+    # ========================
+
+    def importar_shard(self, ruta_db: str) -> int:
+        """
+        Copia los sketches de otra base de datos (otro shard) a esta.
+        Las consultas combinan automáticamente todos los shards presentes.
+
+        Returns:
+            Número de sketches importados
+        """
+        conn = self.db._get_connection()
+        try:
+            conn.execute("ATTACH DATABASE ? AS shard_remoto", (ruta_db,))
+            cursor = conn.execute("""
+                INSERT OR REPLACE INTO sketches (nombre, shard, tipo, datos, updated_at)
+                SELECT nombre, shard, tipo, datos, updated_at
+                FROM shard_remoto.sketches
+                WHERE shard != ?
+            """, (self.shard,))
+            conn.commit()
+            conn.execute("DETACH DATABASE shard_remoto")
+            return cursor.rowcount
+        finally:
+            conn.close()
@@ -0,0 +1,139 @@
+"""
+Sincronización Offline por Deltas
+Los clientes (teléfono, widget) acumulan marcar/desmarcar sin conexión y los
+envían en lote, cada operación con su clave de idempotencia y la hora del
+cliente. El lote se aplica en una transacción (DatabaseManager.aplicar_operaciones:
+por día y hábito gana la operación más reciente) y la misma respuesta trae
+todo lo que cambió desde la versión que tenía el cliente: días, rachas y
+perfil. Volver después de una semana sin conexión cuesta un solo viaje.
+
+La versión es opaca para el cliente: "<último evento del usuario>:<último día cerrado>"
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from database.day_closer import DayCloser
+from database.db_manager import DatabaseManager
+
+# Operaciones aceptadas por lote
+MAX_OPERACIONES = 2000
+
+# Una hora del cliente más adelantada que esto respecto del servidor se recorta a "ahora"
+# (un reloj adelantado ganaría todos los conflictos)
+TOLERANCIA_RELOJ = timedelta(minutes=5)
+
+TIPOS = ('marcar', 'desmarcar')
+
+
+def formatear_version(ultimo_evento: int, cerrado_hasta: Optional[date]) -> str:
+    return f"{ultimo_evento}:{cerrado_hasta.isoformat() if cerrado_hasta else ''}"
+
+
+def leer_version(version: Optional[str]) -> Tuple[int, Optional[str]]:
+    """(último evento, último día cerrado); una versión ausente o ilegible pide el estado completo"""
+    try:
+        evento, _, cerrado = (version or "").partition(":")
+        return max(0, int(evento)), cerrado or None
+    except ValueError:
+        return 0, None
+
+
+class DeltaSync:
+    """Protocolo de sincronización sobre DatabaseManager para los hábitos de la configuración"""
+
+    def __init__(self, db: DatabaseManager, config: Dict):
+        """
+        Args:
+            db: Gestor de la base (se usa para_usuario con cada cliente)
+            config: Configuración de hábitos: bloque y puntos salen de acá, no del cliente
+        """
+        self.db = db
+        self.habitos = {h['id']: (bloque['id'], h['puntos'])
+                        for bloque in config['bloques'] for h in bloque['habitos']}
+        self.max_puntos = sum(puntos for _, puntos in self.habitos.values() if puntos > 0)
+
+    def normalizar(self, op: Dict, ahora: datetime) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Valida una operación del cliente
+
+        Returns:
+            (operación lista para aplicar_operaciones, None) o (None, motivo del rechazo)
+        """
+        if not isinstance(op, dict):
+            return None, "La operación debe ser un objeto"
+        clave = op.get('clave_idempotencia')
+        if not isinstance(clave, str) or not 0 < len(clave) <= 128:
+            return None, "Falta clave_idempotencia (texto de hasta 128 caracteres)"
+        if op.get('tipo') not in TIPOS:
+            return None, f"Tipo inválido: {op.get('tipo')}"
+        if op.get('habito_id') not in self.habitos:
+            return None, f"Hábito desconocido: {op.get('habito_id')}"
+        try:
+            fecha = date.fromisoformat(str(op.get('fecha')))
+            momento = datetime.fromisoformat(str(op.get('cliente_ts')))
+        except ValueError:
+            return None, "fecha (AAAA-MM-DD) y cliente_ts (ISO 8601) son obligatorios"
+
+        # La hora del hábito es la del reloj local del cliente; el conflicto se decide en UTC
+        hora = momento.time().isoformat()
+        utc = momento.astimezone(timezone.utc) if momento.tzinfo else momento.replace(tzinfo=timezone.utc)
+        utc = min(utc, ahora + TOLERANCIA_RELOJ)
+        bloque_id, puntos = self.habitos[op['habito_id']]
+        return {
+            'tipo': op['tipo'], 'fecha': fecha, 'habito_id': op['habito_id'], 'bloque_id': bloque_id,
+            'puntos': puntos, 'hora': hora, 'cliente_ts': utc.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            'clave_idempotencia': clave
+        }, None
+
+    def sincronizar(self, usuario_id: str, operaciones: Iterable[Dict] = (),
+                    version: Optional[str] = None) -> Optional[Dict]:
+        """
+        Aplica el lote y arma el delta desde `version`
+
+        Returns:
+            Dict con version nueva, resultados (uno por operación: aplicada,
+            duplicada, descartada o rechazada), dias, rachas, perfil (solo si
+            cambió el cierre diario o es el estado completo) y completo; None
+            si el lote no se pudo guardar (nada se aplicó)
+
+        Raises:
+            ValueError: Si el lote supera MAX_OPERACIONES
+        """
+        operaciones = list(operaciones)
+        if len(operaciones) > MAX_OPERACIONES:
+            raise ValueError(f"Máximo {MAX_OPERACIONES} operaciones por lote")
+        gestor = self.db.para_usuario(usuario_id)
+
+        ahora = datetime.now(timezone.utc)
+        resultados, validas, posiciones = [None] * len(operaciones), [], []
+        for i, op in enumerate(operaciones):
+            normalizada, motivo = self.normalizar(op, ahora)
+            if normalizada is None:
+                clave = op.get('clave_idempotencia') if isinstance(op, dict) else None
+                resultados[i] = {'clave_idempotencia': clave, 'estado': 'rechazada', 'motivo': motivo}
+            else:
+                validas.append(normalizada)
+                posiciones.append(i)
+        if validas:
+            aplicadas = gestor.aplicar_operaciones(validas, self.max_puntos)
+            if aplicadas is None:
+                return None
+            for i, resultado in zip(posiciones, aplicadas):
+                resultados[i] = resultado
+
+        # El cierre se lee antes que los cambios: en la carrera se repite el perfil, no se pierde
+        cerrado_hasta = DayCloser(gestor).marca_de_agua()['cerrado_hasta']
+        desde, cerrado_cliente = leer_version(version)
+        cambios = gestor.obtener_cambios(desde)
+        completo = desde == 0
+        delta = {
+            'version': formatear_version(cambios['ultimo_evento'], cerrado_hasta),
+            'completo': completo,
+            'resultados': resultados,
+            'dias': cambios['dias'],
+            'rachas': cambios['rachas']
+        }
+        if completo or cerrado_cliente != (cerrado_hasta.isoformat() if cerrado_hasta else None):
+            delta['perfil'] = gestor.obtener_perfil()
+        return delta
@@ -0,0 +1,185 @@
+"""
+Búfer de Escrituras
+Junta los marcar/desmarcar de una ráfaga de clics y los guarda en una sola
+transacción (DatabaseManager.aplicar_operaciones). Por (usuario, fecha,
+hábito) solo queda el resultado neto: marcar y desmarcar el mismo hábito
+dentro de la ventana no escribe nada.
+
+El guardado ocurre cuando pasa `ventana` sin clics nuevos, nunca más tarde
+que `max_demora` desde el primer clic pendiente, al llamar vaciar() y al
+cerrar el proceso (atexit). La interfaz muestra el cambio sin esperar.
+"""
+
+import atexit
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from database.db_manager import DatabaseManager
+
+# Segundos sin clics nuevos antes de guardar la ráfaga
+VENTANA_SEGUNDOS = 0.25
+
+# Un clic nunca espera más que esto para llegar a la base, aunque la ráfaga siga
+MAX_DEMORA_SEGUNDOS = 1.0
+
+
+class WriteBuffer:
+    """
+    Frente de escritura para marcar_habito/desmarcar_habito. Un hilo daemon
+    guarda los lotes; las operaciones de un lote que falla vuelven a la cola
+    (salvo que ya haya un clic más nuevo del mismo hábito)
+    """
+
+    def __init__(self, db: DatabaseManager, max_puntos: int = 175,
+                 ventana: float = VENTANA_SEGUNDOS, max_demora: float = MAX_DEMORA_SEGUNDOS):
+        """
+        Args:
+            db: Gestor de la base (se usa para_usuario con otros usuarios)
+            max_puntos: Puntos máximos del día para las métricas
+            ventana: Segundos sin clics que cierran la ráfaga
+            max_demora: Segundos máximos entre un clic y su guardado
+        """
+        self.db = db
+        self.max_puntos = max_puntos
+        self.ventana = ventana
+        self.max_demora = max_demora
+        # (usuario, fecha, hábito) -> operación neta + 'base' (estado guardado antes de la ráfaga)
+        self._pendientes: Dict[Tuple[str, str, str], Dict] = {}
+        self._en_vuelo: Set[Tuple[str, str, str]] = set()
+        self._primero: Optional[float] = None
+        self._ultimo: Optional[float] = None
+        self._condicion = threading.Condition()
+        self._vaciando = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._cerrado = False
+        self.operaciones = 0
+        self.colapsadas = 0
+        self.transacciones = 0
+        atexit.register(self.cerrar)
+
+    def marcar(self, fecha: date, habito_id: str, bloque_id: str, puntos: int, usuario_id: str = None):
+        """Encola marcar_habito (se guarda en el próximo lote)"""
+        self._encolar('marcar', fecha, habito_id, bloque_id, puntos, usuario_id)
+
+    def desmarcar(self, fecha: date, habito_id: str, usuario_id: str = None):
+        """Encola desmarcar_habito (se guarda en el próximo lote)"""
+        self._encolar('desmarcar', fecha, habito_id, None, 0, usuario_id)
+
+    def _encolar(self, tipo: str, fecha: date, habito_id: str, bloque_id: Optional[str], puntos: int,
+                 usuario_id: Optional[str]):
+        usuario_id = usuario_id or self.db.usuario_id
+        op = {
+            'tipo': tipo, 'fecha': fecha, 'habito_id': habito_id, 'bloque_id': bloque_id, 'puntos': puntos,
+            'hora': datetime.now().time().isoformat(),
+            'cliente_ts': datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            'clave_idempotencia': uuid.uuid4().hex
+        }
+        clave = (usuario_id, fecha.isoformat(), habito_id)
+        with self._condicion:
+            self.operaciones += 1
+            previa = self._pendientes.get(clave)
+            # El primer clic de la ráfaga dice cómo estaba guardado: marcar parte de desmarcado
+            base = previa['base'] if previa else tipo == 'desmarcar'
+            if previa:
+                self.colapsadas += 1
+            if (tipo == 'marcar') == base:
+                # Vuelve al estado guardado: no hay nada que escribir
+                self._pendientes.pop(clave, None)
+            else:
+                self._pendientes[clave] = {**op, 'base': base}
+
+            self._ultimo = time.monotonic()
+            if not self._pendientes:
+                self._primero = None
+            elif self._primero is None:
+                self._primero = self._ultimo
+            if self._cerrado:
+                directo = True
+            else:
+                directo = False
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._bucle, name="atomic-write-buffer", daemon=True)
+                    self._hilo.start()
+                self._condicion.notify()
+        if directo:
+            # Cerrado (el proceso está terminando): sin hilo, se guarda en el momento
+            self.vaciar()
+
+    def pendientes(self, usuario_id: str = None) -> Set[Tuple[str, str]]:
+        """(fecha ISO, hábito) con clics todavía sin guardar (incluye el lote en curso)"""
+        usuario_id = usuario_id or self.db.usuario_id
+        with self._condicion:
+            return {(fecha, habito) for usuario, fecha, habito in (*self._pendientes, *self._en_vuelo)
+                    if usuario == usuario_id}
+
+    def vaciar(self) -> bool:
+        """
+        Guarda ya todo lo pendiente, un lote por usuario
+
+        Returns:
+            False si algún lote falló (sus operaciones quedan en la cola)
+        """
+        with self._vaciando:
+            with self._condicion:
+                lote, self._pendientes = self._pendientes, {}
+                self._primero = None
+                self._en_vuelo = set(lote)
+            por_usuario: Dict[str, list] = {}
+            for clave, op in lote.items():
+                por_usuario.setdefault(clave[0], []).append(op)
+
+            ok = True
+            for usuario_id, ops in por_usuario.items():
+                gestor = self.db if usuario_id == self.db.usuario_id else self.db.para_usuario(usuario_id)
+                operaciones = [{k: v for k, v in op.items() if k != 'base'} for op in ops]
+                if gestor.aplicar_operaciones(operaciones, self.max_puntos) is not None:
+                    self.transacciones += 1
+                    continue
+                ok = False
+                with self._condicion:
+                    for op in ops:
+                        # Un clic más nuevo del mismo hábito manda sobre el que falló
+                        self._pendientes.setdefault((usuario_id, op['fecha'].isoformat(), op['habito_id']), op)
+                    if self._pendientes and self._primero is None:
+                        self._primero = time.monotonic()
+            with self._condicion:
+                self._en_vuelo = set()
+            return ok
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                while not self._cerrado:
+                    if self._primero is not None:
+                        limite = min(self._ultimo + self.ventana, self._primero + self.max_demora)
+                        espera = limite - time.monotonic()
+                        if espera <= 0:
+                            break
+                        self._condicion.wait(espera)
+                    else:
+                        self._condicion.wait()
+                if self._cerrado:
+                    return
+            if not self.vaciar():
+                # La base falló: reintentar después de la demora máxima, no en un bucle apretado
+                time.sleep(self.max_demora)
+
+    def cerrar(self):
+        """Detiene el hilo y guarda lo pendiente (idempotente; también corre al salir del proceso)"""
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify()
+            hilo = self._hilo
+        if hilo is not None and hilo is not threading.current_thread():
+            hilo.join()
+        self.vaciar()
+        atexit.unregister(self.cerrar)
+
+    def estadisticas(self) -> Dict:
+        """Clics recibidos, cuántos se colapsaron con otro y transacciones hechas"""
+        with self._condicion:
+            return {'operaciones': self.operaciones, 'colapsadas': self.colapsadas,
+                    'transacciones': self.transacciones, 'pendientes': len(self._pendientes)}
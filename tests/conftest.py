@@ -0,0 +1,17 @@
+"""
+Fixtures compartidas: cada test trabaja sobre una base SQLite nueva en tmp_path
+"""
+
+import pytest
+
+from database.db_manager import DatabaseManager
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "tracker.db")
+
+
+@pytest.fixture
+def db(db_path):
+    return DatabaseManager(db_path)
@@ -0,0 +1,108 @@
+"""
+Los agregados de registros (puntos, porcentaje y total de hábitos que
+mantienen los triggers) siempre coinciden con un recálculo completo desde
+habitos_completados, nivel caliente más años archivados
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from benchmarks.bench_triggers import diferencias, toggles_aleatorios
+from database.cold_storage import ColdStorage
+from database.event_log import EventLog
+from database.importer import HistoricalImporter
+
+HOY = date.today()
+ARCHIVADO = date(2020, 6, 15)
+
+
+def _registro(db, fecha: date) -> dict:
+    return db.obtener_metricas_dia(fecha)
+
+
+def _importar(db, fecha: date, *habitos, max_puntos: int = 175):
+    HistoricalImporter(db).importar(
+        {'fecha': fecha.isoformat(), 'habito_id': h, 'bloque_id': 'x', 'puntos': p, 'max_puntos': max_puntos}
+        for h, p in habitos
+    )
+
+
+@pytest.fixture
+def storage(db, tmp_path):
+    return ColdStorage(db, directorio=str(tmp_path / "frio"))
+
+
+def test_marcar(db, db_path):
+    db.marcar_habito(HOY, 'tender_cama', 'fase1_arranque', 15)
+    db.marcar_habito(HOY, 'agua', 'fase1_arranque', 10)
+    assert _registro(db, HOY) == {'puntos': 25, 'porcentaje': 25 * 100.0 / 175, 'habitos': 2}
+    assert diferencias(db_path) == []
+
+
+def test_remarcar_con_otros_puntos(db, db_path):
+    db.marcar_habito(HOY, 'tender_cama', 'fase1_arranque', 15)
+    db.marcar_habito(HOY, 'tender_cama', 'fase1_arranque', 40)
+    assert _registro(db, HOY) == {'puntos': 40, 'porcentaje': 40 * 100.0 / 175, 'habitos': 1}
+    assert diferencias(db_path) == []
+
+
+def test_desmarcar(db, db_path):
+    db.marcar_habito(HOY, 'tender_cama', 'fase1_arranque', 15)
+    db.marcar_habito(HOY, 'agua', 'fase1_arranque', 10)
+    db.desmarcar_habito(HOY, 'tender_cama')
+    db.desmarcar_habito(HOY, 'no_marcado')
+    assert _registro(db, HOY) == {'puntos': 10, 'porcentaje': 10 * 100.0 / 175, 'habitos': 1}
+    assert diferencias(db_path) == []
+
+
+def test_cambio_de_max_puntos(db, db_path):
+    db.marcar_habito(HOY, 'tender_cama', 'fase1_arranque', 100, max_puntos=175)
+    db.marcar_habito(HOY, 'agua', 'fase1_arranque', 50, max_puntos=355)
+    assert _registro(db, HOY)['porcentaje'] == 150 * 100.0 / 355
+    db.desmarcar_habito(HOY, 'agua', max_puntos=100)
+    assert _registro(db, HOY)['porcentaje'] == 100.0
+    assert diferencias(db_path) == []
+
+
+def test_importar(db, db_path):
+    db.marcar_habito(HOY, 'tender_cama', 'fase1_arranque', 15)
+    _importar(db, HOY, ('tender_cama', 20), ('agua', 10), max_puntos=355)
+    _importar(db, HOY - timedelta(days=1), ('agua', 10))
+    assert _registro(db, HOY) == {'puntos': 30, 'porcentaje': 30 * 100.0 / 355, 'habitos': 2}
+    assert diferencias(db_path) == []
+
+    db.marcar_habito(HOY, 'meditar', 'fase1_arranque', 5, max_puntos=355)
+    assert _registro(db, HOY)['puntos'] == 35
+    assert diferencias(db_path) == []
+
+
+def test_rehidratar_y_archivar(db, db_path, storage):
+    db.marcar_habito(ARCHIVADO, 'tender_cama', 'fase1_arranque', 15)
+    db.marcar_habito(ARCHIVADO, 'agua', 'fase1_arranque', 10)
+    db.marcar_habito(ARCHIVADO + timedelta(days=1), 'agua', 'fase1_arranque', 10)
+    assert storage.archivar() == {2020: 3}
+    assert diferencias(db_path) == []
+
+    # Escribir un día archivado lo rehidrata: el día se suma entero
+    db.marcar_habito(ARCHIVADO, 'meditar', 'fase1_arranque', 5)
+    db.desmarcar_habito(ARCHIVADO, 'tender_cama')
+    assert _registro(db, ARCHIVADO) == {'puntos': 15, 'porcentaje': 15 * 100.0 / 175, 'habitos': 2}
+    assert diferencias(db_path) == []
+
+    assert storage.archivar() == {2020: 2}
+    _importar(db, ARCHIVADO + timedelta(days=1), ('meditar', 5))
+    assert _registro(db, ARCHIVADO + timedelta(days=1))['puntos'] == 15
+    assert diferencias(db_path) == []
+
+    assert storage.archivar() == {2020: 2}
+    EventLog(db).reconstruir(procesos=1)
+    assert diferencias(db_path) == []
+    assert _registro(db, ARCHIVADO)['puntos'] == 15
+
+
+def test_toggles_aleatorios(db, db_path):
+    _importar(db, HOY - timedelta(days=3), ('habito_00', 20), ('habito_01', 30))
+    toggles_aleatorios(db, 400, random.Random(7))
+    assert diferencias(db_path) == []
@@ -0,0 +1,41 @@
+"""
+AsyncDatabaseManager sobre el pool de conexiones por hilo
+"""
+
+import asyncio
+from datetime import date
+
+from database.async_manager import AsyncDatabaseManager
+
+
+def _correr(corrutina):
+    return asyncio.run(corrutina)
+
+
+def test_lecturas_en_tuplas_no_afectan_al_hilo(db_path):
+    """Un método que lee tuplas no deja su row_factory en la conexión reutilizada"""
+    async def escenario():
+        # Un solo hilo: todas las llamadas reciben la misma conexión ociosa
+        async with AsyncDatabaseManager(db_path, hilos=1) as adb:
+            assert await adb.obtener_leaderboard() == [('default', 0, 0, None)]
+            assert (await adb.obtener_perfil())['usuario_id'] == 'default'
+
+            await adb.obtener_perfiles()
+            assert await adb.marcar_habito(date.today(), 'tender_cama', 'fase1_arranque', 15)
+
+            await adb.obtener_historico_usuarios()
+            assert await adb.obtener_habitos_dia(date.today()) == ['tender_cama']
+            assert (await adb.obtener_metricas_dia(date.today()))['puntos'] == 15
+
+    _correr(escenario())
+
+
+def test_conexiones_abiertas_se_descuentan(db_path):
+    async def escenario():
+        adb = AsyncDatabaseManager(db_path, hilos=2)
+        await asyncio.gather(*(adb.obtener_perfil() for _ in range(8)))
+        assert adb.db.pool.abiertas >= 1
+        await adb.cerrar()
+        return adb.db.pool.abiertas
+
+    assert _correr(escenario()) == 0
@@ -0,0 +1,35 @@
+"""
+Snapshot de reportes (database.backup.BackupManager)
+"""
+
+import threading
+from datetime import date, timedelta
+
+from database.backup import BackupManager, SnapshotDatabase
+
+
+def test_snapshot_viejo_se_refresca_en_segundo_plano(db, tmp_path):
+    gestor = BackupManager(db, directorio=str(tmp_path / "backups"), pausa=0)
+
+    # Sin snapshot: se lee la primaria mientras se crea el primero
+    assert not isinstance(gestor.snapshot_para_reportes(), SnapshotDatabase)
+    gestor._hilo.join()
+    assert isinstance(gestor.snapshot_para_reportes(), SnapshotDatabase)
+
+    db.marcar_habito(date.today(), 'tender_cama', 'fase1_arranque', 15)
+    fuentes = []
+
+    def sesion():
+        fuentes.append(gestor.snapshot_para_reportes(max_edad=timedelta(seconds=-1)))
+
+    # Varias sesiones a la vez con el snapshot vencido: todas leen el viejo, un solo refresco
+    sesiones = [threading.Thread(target=sesion) for _ in range(8)]
+    for hilo in sesiones:
+        hilo.start()
+    for hilo in sesiones:
+        hilo.join()
+    gestor._hilo.join()
+
+    assert all(f.obtener_habitos_dia(date.today()) in ([], ['tender_cama']) for f in fuentes)
+    assert gestor.snapshot_para_reportes().obtener_habitos_dia(date.today()) == ['tender_cama']
+    assert [r.name for r in (tmp_path / "backups").iterdir()] == ["snapshot.db"]
@@ -0,0 +1,77 @@
+"""
+Escrituras sobre años archivados en el nivel frío (database.cold_storage)
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from database.cold_storage import ColdStorage
+from database.event_log import EventLog
+from database.importer import HistoricalImporter
+
+DIA = date(2020, 3, 1)
+
+
+@pytest.fixture
+def storage(db, tmp_path):
+    db.marcar_habito(DIA, 'A', 'fase1_arranque', 10)
+    db.marcar_habito(DIA, 'B', 'fase1_arranque', 10)
+    storage = ColdStorage(db, directorio=str(tmp_path / "frio"))
+    assert storage.archivar() == {2020: 2}
+    return storage
+
+
+def test_importar_en_año_archivado(db, storage):
+    HistoricalImporter(db).importar([{'fecha': DIA.isoformat(), 'habito_id': 'C', 'bloque_id': 'x', 'puntos': 15}])
+    assert db.obtener_habitos_dia(DIA) == ['A', 'B', 'C']
+    assert db.obtener_metricas_dia(DIA) == {'puntos': 35, 'porcentaje': 20.0, 'habitos': 3}
+
+    db.marcar_habito(DIA, 'D', 'fase1_arranque', 5)
+    assert db.obtener_habitos_dia(DIA) == ['A', 'B', 'C', 'D']
+    assert db.obtener_metricas_dia(DIA)['puntos'] == 40
+
+    # Volver a archivar deja el día entero en el nivel frío
+    assert storage.archivar() == {2020: 4}
+    assert db.obtener_habitos_dia(DIA) == ['A', 'B', 'C', 'D']
+
+
+def _filas(db, tabla: str, ruta: str = None) -> int:
+    conn = db._get_connection()
+    try:
+        if ruta:
+            conn.execute("ATTACH DATABASE ? AS frio", (ruta,))
+        total = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+        if ruta:
+            conn.execute("DETACH DATABASE frio")
+        return total
+    finally:
+        conn.close()
+
+
+def test_replay_conserva_el_nivel_frio(db, storage):
+    db.marcar_habito(date.today(), 'A', 'fase1_arranque', 10)
+    EventLog(db).reconstruir(procesos=1)
+
+    assert _filas(db, "main.habitos_completados") == 1
+    assert _filas(db, "frio.habitos_completados", storage.ruta_año(2020)) == 2
+    assert storage.años_archivados() == {2020: storage.ruta_año(2020)}
+    assert db.obtener_habitos_dia(DIA) == ['A', 'B']
+    assert db.obtener_metricas_dia(DIA)['puntos'] == 20
+
+
+def test_importar_conserva_rachas_archivadas(db, tmp_path):
+    inicio = date(2020, 5, 1)
+    HistoricalImporter(db).importar(
+        {'fecha': (inicio + timedelta(days=i)).isoformat(), 'habito_id': 'A', 'bloque_id': 'x', 'puntos': 10}
+        for i in range(40)
+    )
+    assert db.obtener_racha_habito('A')['maxima'] == 40
+    assert ColdStorage(db, directorio=str(tmp_path / "frio")).archivar() == {2020: 40}
+
+    HistoricalImporter(db).importar([{'fecha': '2024-01-10', 'habito_id': 'A', 'bloque_id': 'x', 'puntos': 10}])
+    racha = db.obtener_racha_habito('A')
+    assert (racha['actual'], racha['maxima']) == (1, 40)
+
+    EventLog(db).reconstruir(procesos=1)
+    assert db.obtener_racha_habito('A') == racha
@@ -0,0 +1,44 @@
+"""
+El perfil solo suma días cerrados, lo escriba el cierre diario, el replay o el importador
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from database.day_closer import DayCloser
+from database.event_log import EventLog
+from database.importer import HistoricalImporter
+
+HOY = date.today()
+
+
+@pytest.fixture
+def cerrado(db):
+    db.marcar_habito(HOY - timedelta(days=1), 'tender_cama', 'fase1_arranque', 30)
+    db.marcar_habito(HOY, 'agua', 'fase1_arranque', 100)
+    DayCloser(db).cerrar()
+    assert db.obtener_perfil()['puntos_totales'] == 30
+    return db
+
+
+def test_replay_respeta_el_cierre(cerrado):
+    EventLog(cerrado).reconstruir(procesos=1)
+    perfil = cerrado.obtener_perfil()
+    assert (perfil['puntos_totales'], perfil['dias_activos']) == (30, 1)
+
+
+def test_importador_respeta_el_cierre(cerrado):
+    HistoricalImporter(cerrado).importar([
+        {'fecha': HOY.isoformat(), 'habito_id': 'meditar', 'bloque_id': 'x', 'puntos': 5},
+        {'fecha': (HOY - timedelta(days=2)).isoformat(), 'habito_id': 'meditar', 'bloque_id': 'x', 'puntos': 5},
+    ])
+    perfil = cerrado.obtener_perfil()
+    assert (perfil['puntos_totales'], perfil['dias_activos']) == (35, 2)
+
+
+def test_marca_de_agua_adelantada(db):
+    """Con días ya cerrados más allá de ayer, el corte es la marca de agua"""
+    cierre = DayCloser(db)
+    cierre.cerrar(HOY + timedelta(days=2))
+    assert cierre.hasta_vigente() == HOY + timedelta(days=1)
@@ -0,0 +1,83 @@
+"""
+t-digest y HyperLogLog (utils.sketches)
+"""
+
+import random
+
+import pytest
+
+from utils.sketches import HyperLogLog, TDigest
+
+
+def _digest(valores) -> TDigest:
+    digest = TDigest()
+    digest.agregar_varios(valores)
+    return digest
+
+
+def test_cdf_con_empates_en_el_minimo():
+    azar = random.Random(1)
+    digest = _digest([0.0] * 250 + [azar.uniform(0, 90) for _ in range(750)])
+    assert digest.cdf(-1) == 0.0
+    assert digest.cdf(0) == pytest.approx(0.25, abs=0.01)
+    assert digest.cdf(40) == pytest.approx(0.25 + 0.75 * 40 / 90, abs=0.02)
+    assert digest.cdf(digest.maximo) == 1.0
+
+
+def test_cdf_y_cuantiles_en_tercios():
+    digest = _digest([0] * 100 + [50] * 100 + [100] * 100)
+    assert digest.cdf(0) == pytest.approx(1 / 3)
+    assert digest.cdf(50) == pytest.approx(0.5)
+    assert digest.cdf(100) == 1.0
+    assert [digest.cuantil(q) for q in (0.2, 0.5, 0.8)] == [0, 50, 100]
+
+
+def test_cdf_con_empates_interiores():
+    """Porcentajes enteros: muchos usuarios en cada valor"""
+    azar = random.Random(2)
+    valores = [azar.randint(0, 10) for _ in range(20000)]
+    digest = _digest(valores)
+    for valor in (3, 5, 7):
+        rango_medio = (sum(v < valor for v in valores) + sum(v == valor for v in valores) / 2) / len(valores)
+        assert digest.cdf(valor) == pytest.approx(rango_medio, abs=0.01)
+    ordenados = sorted(valores)
+    for q in (0.25, 0.5, 0.9):
+        assert digest.cuantil(q) == ordenados[int(q * len(ordenados))]
+
+
+def test_combinar_shards():
+    azar = random.Random(3)
+    valores = [azar.gauss(50, 15) for _ in range(20000)]
+    combinado = _digest(valores[:7000]).combinar(_digest(valores[7000:]))
+    assert combinado.total == len(valores)
+    assert (combinado.minimo, combinado.maximo) == (min(valores), max(valores))
+
+    ordenados = sorted(valores)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        assert combinado.cuantil(q) == pytest.approx(ordenados[int(q * len(ordenados))], abs=0.5)
+    assert combinado.cdf(50) == pytest.approx(0.5, abs=0.01)
+
+    copia = TDigest.deserializar(combinado.serializar())
+    assert copia.cuantil(0.5) == combinado.cuantil(0.5)
+
+
+@pytest.mark.parametrize("cantidad", [100, 5000, 200000])
+def test_hyperloglog_error(cantidad):
+    hll = HyperLogLog()
+    for i in range(cantidad):
+        hll.agregar(f"usuario_{i}")
+    # precision=12: error típico ~1.6%, se tolera 3 desviaciones
+    assert abs(hll.contar() - cantidad) <= 0.05 * cantidad
+
+
+def test_hyperloglog_combinar():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(30000):
+        a.agregar(f"usuario_{i}")
+    for i in range(20000, 50000):
+        b.agregar(f"usuario_{i}")
+    union = HyperLogLog.deserializar(a.serializar()).combinar(b)
+    assert abs(union.contar() - 50000) <= 0.05 * 50000
+
+    with pytest.raises(ValueError):
+        a.combinar(HyperLogLog(precision=10))
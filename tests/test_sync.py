@@ -0,0 +1,44 @@
+"""
+Lotes de sincronización (DatabaseManager.aplicar_operaciones)
+"""
+
+from datetime import date
+
+
+def _op(habito_id: str, clave: str, cliente_ts: str = '2024-01-01 10:00:00.000000', tipo: str = 'marcar',
+        fecha: date = None) -> dict:
+    return {
+        'tipo': tipo, 'fecha': fecha or date.today(), 'habito_id': habito_id, 'bloque_id': 'fase1_arranque',
+        'puntos': 10, 'hora': '10:00:00', 'cliente_ts': cliente_ts, 'clave_idempotencia': clave
+    }
+
+
+def test_claves_de_idempotencia_por_usuario(db):
+    alice, bob = db.para_usuario('alice'), db.para_usuario('bob')
+    assert alice.aplicar_operaciones([_op('tender_cama', '1')])[0]['estado'] == 'aplicada'
+
+    # La misma clave de otro usuario no es un reintento
+    assert bob.aplicar_operaciones([_op('tender_cama', '1')])[0]['estado'] == 'aplicada'
+    assert bob.obtener_habitos_dia(date.today()) == ['tender_cama']
+
+    assert bob.aplicar_operaciones([_op('agua', '1')])[0]['estado'] == 'duplicada'
+    assert bob.obtener_habitos_dia(date.today()) == ['tender_cama']
+
+
+def test_lote_fallido_no_rehidrata(db, tmp_path):
+    from database.cold_storage import ColdStorage
+
+    dia = date(2020, 3, 1)
+    db.marcar_habito(dia, 'tender_cama', 'fase1_arranque', 10)
+    storage = ColdStorage(db, directorio=str(tmp_path / "frio"))
+    assert storage.archivar() == {2020: 1}
+
+    # La segunda operación falla (sin bloque_id): el lote entero se deshace
+    rota = _op('agua', 'b', fecha=dia)
+    del rota['bloque_id']
+    assert db.aplicar_operaciones([_op('meditar', 'a', fecha=dia), rota]) is None
+    assert storage.archivar() == {}  # Nada volvió al nivel caliente
+
+    assert db.aplicar_operaciones([_op('meditar', 'c', fecha=dia)])[0]['estado'] == 'aplicada'
+    assert db.obtener_habitos_dia(dia) == ['meditar', 'tender_cama']
+    assert db.obtener_metricas_dia(dia)['puntos'] == 20
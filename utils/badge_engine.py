@@ -0,0 +1,115 @@
+"""
+Motor de Badges por Eventos
+Evalúa los criterios de BADGES solo cuando cambian sus señales de entrada
+y persiste los desbloqueos en `badges_desbloqueados`
+"""
+
+from typing import Dict, Iterable, List, Set
+
+from utils.gamification import BADGES, SEÑALES_RACHA_HABITO
+
+
+class BadgeEngine:
+    """
+    Se suscribe a los eventos de escritura de DatabaseManager. Cada evento se
+    traduce en señales cambiadas (racha de un hábito, racha perfecta, días
+    activos) y solo se evalúan los badges que declaran esas señales.
+    Desbloquear es idempotente, así que reprocesar un evento no duplica nada.
+    """
+
+    def __init__(self, db, badges: Dict = None):
+        """
+        Args:
+            db: DatabaseManager cuyos eventos alimentan el motor
+            badges: Definición de badges (default: BADGES)
+        """
+        self.db = db
+        self.badges = badges or BADGES
+        self._por_señal: Dict[str, List[str]] = {}
+        for badge_id, info in self.badges.items():
+            for señal in info['señales']:
+                self._por_señal.setdefault(señal, []).append(badge_id)
+        db.suscribir(self._al_escribir)
+
+    @staticmethod
+    def señales_del_evento(evento: Dict) -> Dict[str, int]:
+        """Extrae de un evento de escritura las señales que cambiaron y su nuevo valor"""
+        señales = {}
+        if evento['tipo'] == 'marcar' and evento['habito_id'] in SEÑALES_RACHA_HABITO:
+            señales[SEÑALES_RACHA_HABITO[evento['habito_id']]] = evento['racha_habito']['actual']
+        leaderboard = evento.get('leaderboard')
+        if leaderboard and leaderboard.get('racha_recalculada'):
+            señales['racha_perfecta'] = leaderboard['racha_perfecta']
+        if evento['tipo'] == 'perfil':
+            señales['dias_activos'] = evento['perfil'].get('dias_activos', 0)
+        return señales
+
+    def _al_escribir(self, evento: Dict):
+        """Evalúa los badges afectados por un evento"""
+        señales = self.señales_del_evento(evento)
+        if señales:
+            self.evaluar(evento['usuario_id'], señales)
+
+    def evaluar(self, usuario_id: str, señales: Dict[str, int]) -> List[str]:
+        """
+        Evalúa los badges que dependen de las señales dadas
+
+        Args:
+            usuario_id: Usuario a evaluar
+            señales: Valores actuales de las señales que cambiaron
+
+        Returns:
+            IDs de badges recién desbloqueados
+        """
+        candidatos: Set[str] = set()
+        for señal in señales:
+            candidatos.update(self._por_señal.get(señal, []))
+        if not candidatos:
+            return []
+
+        gestor = self.db.para_usuario(usuario_id)
+        ya_desbloqueados = {b['badge_id'] for b in gestor.obtener_badges_desbloqueados()}
+        candidatos -= ya_desbloqueados
+        if not candidatos:
+            return []
+
+        # Completar señales faltantes (badges con varias entradas)
+        faltantes = {s for b in candidatos for s in self.badges[b]['señales']} - set(señales)
+        valores = {**self._leer_señales(gestor, faltantes), **señales}
+
+        desbloqueables = [b for b in candidatos if self.badges[b]['criterio'](valores)]
+        return gestor.desbloquear_badges(desbloqueables) if desbloqueables else []
+
+    def reevaluar(self, usuario_id: str) -> List[str]:
+        """Evalúa todos los badges con el estado actual (usuarios existentes o reparación)"""
+        gestor = self.db.para_usuario(usuario_id)
+        todas = {s for info in self.badges.values() for s in info['señales']}
+        return self.evaluar(usuario_id, self._leer_señales(gestor, todas))
+
+    @staticmethod
+    def _leer_señales(gestor, señales: Iterable[str]) -> Dict[str, int]:
+        """Lee de la base de datos el valor actual de las señales pedidas"""
+        señales = set(señales)
+        valores = {}
+        if 'dias_activos' in señales:
+            valores['dias_activos'] = gestor.obtener_perfil().get('dias_activos', 0)
+        if 'racha_perfecta' in señales:
+            valores['racha_perfecta'] = gestor.obtener_leaderboard_usuario()['racha_perfecta']
+        for habito_id, señal in SEÑALES_RACHA_HABITO.items():
+            if señal in señales:
+                valores[señal] = gestor.obtener_racha_habito(habito_id)['actual']
+        return valores
+
+    def badges_usuario(self, usuario_id: str) -> List[Dict]:
+        """Badges desbloqueados con su información de presentación (una lectura indexada)"""
+        return [
+            {
+                'id': fila['badge_id'],
+                'emoji': self.badges[fila['badge_id']]['emoji'],
+                'nombre': self.badges[fila['badge_id']]['nombre'],
+                'descripcion': self.badges[fila['badge_id']]['descripcion'],
+                'desbloqueado_en': fila['desbloqueado_en']
+            }
+            for fila in self.db.para_usuario(usuario_id).obtener_badges_desbloqueados()
+            if fila['badge_id'] in self.badges
+        ]
@@ -0,0 +1,143 @@
+"""
+Métricas en Lote para Múltiples Usuarios
+Calcula los KPIs del dashboard para N usuarios en una sola pasada agrupada
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.gamification import NIVELES
+
+
+class BatchMetricsCalculator:
+    """
+    Calcula los KPIs de muchos usuarios a la vez.
+    Los resultados coinciden con MetricsCalculator y GamificationSystem
+    aplicados usuario por usuario sobre obtener_historico(dias=90).
+    """
+
+    DIAS_HISTORICO = 90
+
+    @staticmethod
+    def calcular_kpis_usuarios(db, usuarios: Optional[Iterable[str]] = None,
+                               meta: float = 85.0, hoy: date = None) -> Dict[str, Dict]:
+        """
+        Calcula progreso de hoy, racha perfecta, meta semanal y nivel por usuario
+
+        Args:
+            db: DatabaseManager sobre la base de datos compartida
+            usuarios: IDs a incluir (default: todos los usuarios con perfil)
+            meta: Meta de porcentaje diario
+            hoy: Fecha de referencia (default: hoy)
+
+        Returns:
+            Dict {usuario_id: kpis}
+        """
+        hoy = hoy or date.today()
+        if usuarios is not None:
+            usuarios = list(usuarios)
+
+        historico = pd.DataFrame.from_records(
+            db.obtener_historico_usuarios(BatchMetricsCalculator.DIAS_HISTORICO, usuarios, hoy),
+            columns=['usuario_id', 'fecha', 'puntos_totales', 'porcentaje_cumplimiento']
+        )
+        perfiles = pd.DataFrame.from_records(
+            db.obtener_perfiles(usuarios),
+            columns=['usuario_id', 'puntos_totales', 'dias_activos']
+        ).set_index('usuario_id')
+
+        ids = pd.Index(usuarios if usuarios is not None else perfiles.index, name='usuario_id')
+
+        hoy_kpis = BatchMetricsCalculator._kpis_hoy(historico, hoy)
+        rachas = BatchMetricsCalculator._rachas_perfectas(historico, meta, hoy)
+        semana = BatchMetricsCalculator._estadisticas_semanales(historico, meta, hoy)
+        niveles = BatchMetricsCalculator._niveles(perfiles['puntos_totales'])
+
+        kpis = pd.DataFrame(index=ids)
+        kpis = kpis.join(hoy_kpis).join(semana).join(perfiles[['puntos_totales']], rsuffix='_perfil')
+        kpis[['total_dias', 'dias_meta']] = kpis[['total_dias', 'dias_meta']].fillna(0)
+        kpis['racha_perfecta'] = rachas.reindex(ids, fill_value=0)
+        kpis['nivel'] = niveles.reindex(ids, fill_value=1)
+        con_historico = set(historico['usuario_id'].unique())
+
+        resultado = {}
+        for fila in kpis.itertuples():
+            usuario_id = fila.Index
+            nivel = int(fila.nivel)
+
+            if usuario_id in con_historico:
+                dias_meta = int(fila.dias_meta)
+                total_dias = int(fila.total_dias)
+                stats_semana = {
+                    'dias_meta_cumplida': dias_meta,
+                    'total_dias': total_dias,
+                    'porcentaje_exito': (dias_meta / 7 * 100) if total_dias > 0 else 0,
+                    'dias_faltantes': 7 - dias_meta,
+                    'cumple_meta_semanal': dias_meta >= 6
+                }
+            else:
+                # Misma estructura que MetricsCalculator con histórico vacío
+                stats_semana = {
+                    'dias_meta_cumplida': 0,
+                    'total_dias': 0,
+                    'porcentaje_exito': 0.0,
+                    'dias_faltantes': 7
+                }
+
+            resultado[usuario_id] = {
+                'puntos_hoy': 0 if pd.isna(fila.puntos_totales) else int(fila.puntos_totales),
+                'porcentaje_hoy': 0.0 if pd.isna(fila.porcentaje_cumplimiento) else float(fila.porcentaje_cumplimiento),
+                'racha_perfecta': int(fila.racha_perfecta),
+                'semana': stats_semana,
+                'puntos_totales': 0 if pd.isna(fila.puntos_totales_perfil) else int(fila.puntos_totales_perfil),
+                'nivel': nivel,
+                'nombre_nivel': NIVELES[nivel]['nombre']
+            }
+
+        return resultado
+
+    @staticmethod
+    def _kpis_hoy(historico: pd.DataFrame, hoy: date) -> pd.DataFrame:
+        """Puntos y porcentaje del día de referencia por usuario"""
+        filas_hoy = historico[historico['fecha'] == hoy.isoformat()]
+        return filas_hoy.set_index('usuario_id')[['puntos_totales', 'porcentaje_cumplimiento']]
+
+    @staticmethod
+    def _rachas_perfectas(historico: pd.DataFrame, meta: float, hoy: date) -> pd.Series:
+        """
+        Racha de días consecutivos cumpliendo la meta contando desde hoy.
+        Un día cuenta si es el k-ésimo registro más reciente del usuario,
+        su fecha es hoy - k y cumple la meta; la racha se corta en el primero que falla.
+        """
+        if historico.empty:
+            return pd.Series(dtype='int64')
+
+        ordenado = historico.sort_values(['usuario_id', 'fecha'], ascending=[True, False])
+        dias_atras = (pd.Timestamp(hoy) - pd.to_datetime(ordenado['fecha'])).dt.days
+        posicion = ordenado.groupby('usuario_id').cumcount()
+
+        valido = ((dias_atras == posicion) & (ordenado['porcentaje_cumplimiento'] >= meta)).astype('int64')
+        return valido.groupby(ordenado['usuario_id']).cumprod().groupby(ordenado['usuario_id']).sum()
+
+    @staticmethod
+    def _estadisticas_semanales(historico: pd.DataFrame, meta: float, hoy: date) -> pd.DataFrame:
+        """Días registrados y días con meta cumplida en los últimos 7 días"""
+        inicio_semana = (hoy - timedelta(days=6)).isoformat()
+        semana = historico[historico['fecha'] >= inicio_semana]
+        return pd.DataFrame({
+            'total_dias': semana.groupby('usuario_id').size(),
+            'dias_meta': (semana['porcentaje_cumplimiento'] >= meta).groupby(semana['usuario_id']).sum()
+        }).fillna(0)
+
+    @staticmethod
+    def _niveles(puntos_totales: pd.Series) -> pd.Series:
+        """Nivel de cada usuario según sus puntos totales (ver GamificationSystem.calcular_nivel)"""
+        niveles = sorted(NIVELES.items(), key=lambda item: item[1]['puntos_requeridos'])
+        umbrales = np.array([info['puntos_requeridos'] for _, info in niveles])
+        ids_nivel = np.array([nivel for nivel, _ in niveles])
+
+        posicion = np.searchsorted(umbrales, puntos_totales.fillna(0).to_numpy(), side='right') - 1
+        return pd.Series(ids_nivel[np.clip(posicion, 0, None)], index=puntos_totales.index)
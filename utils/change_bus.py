@@ -0,0 +1,185 @@
+"""
+Bus de Cambios en Vivo
+Convierte los eventos de escritura de DatabaseManager en deltas por usuario
+(estado del hábito, métricas del día, rachas, badges, perfil) y los entrega
+a las sesiones abiertas de ese usuario: otra pestaña de Streamlit, el
+teléfono o un cliente de la API por SSE (api.server). Nadie consulta la base
+para enterarse de un cambio.
+
+Las escrituras de un usuario sin sesiones abiertas cuestan una búsqueda en
+un dict: el trabajo por evento es proporcional a los suscriptores de ese
+usuario, no a la cantidad de usuarios.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Deltas que una suscripción sin callback acumula antes de pedir una relectura
+CAPACIDAD = 64
+
+# Una suscripción sin callback que nadie lee en este tiempo se descarta sola
+# (las sesiones de Streamlit no avisan cuando se cierran)
+EXPIRACION_SEGUNDOS = 300
+
+
+class Suscripcion:
+    """
+    Cambios de un usuario para una sesión. Con `entregar` cada delta se pasa
+    al callback (en el hilo que escribió); sin callback se acumulan hasta
+    que la sesión los pide con pendientes()
+    """
+
+    def __init__(self, bus: 'ChangeBus', usuario_id: str, entregar: Optional[Callable[[Dict], None]] = None,
+                 capacidad: int = CAPACIDAD, releer: bool = False):
+        self.bus = bus
+        self.usuario_id = usuario_id
+        self.capacidad = capacidad
+        self._entregar = entregar
+        self._pendientes: deque = deque()
+        self._desbordada = releer
+        self.ultimo_acceso = time.monotonic()
+
+    def _recibir(self, delta: Dict):
+        if self._entregar is not None:
+            self._entregar(delta)
+        elif len(self._pendientes) >= self.capacidad:
+            self._pendientes.clear()
+            self._desbordada = True
+        else:
+            self._pendientes.append(delta)
+
+    def pendientes(self) -> Optional[List[Dict]]:
+        """
+        Retira los deltas acumulados desde la última llamada
+
+        Returns:
+            Lista de deltas (vacía si no hubo cambios), o None si se perdieron
+            por exceso y la sesión tiene que releer su estado
+        """
+        with self.bus._lock:
+            self.ultimo_acceso = time.monotonic()
+            if self._desbordada:
+                self._desbordada = False
+                return None
+            deltas = list(self._pendientes)
+            self._pendientes.clear()
+            return deltas
+
+    @property
+    def activa(self) -> bool:
+        return self.bus._activa(self)
+
+    def cancelar(self):
+        self.bus.cancelar(self)
+
+
+class ChangeBus:
+    """
+    Suscriptor de DatabaseManager que reparte deltas por usuario. Se crea
+    uno por proceso sobre el gestor compartido (como BadgeEngine y Leaderboard)
+    """
+
+    def __init__(self, db, expiracion: float = EXPIRACION_SEGUNDOS):
+        """
+        Args:
+            db: DatabaseManager cuyos eventos alimentan el bus
+            expiracion: Segundos sin lectura tras los que se descarta una suscripción sin callback
+        """
+        self.db = db
+        self.expiracion = expiracion
+        self._canales: Dict[str, Dict[int, Suscripcion]] = {}
+        self._lock = threading.Lock()
+        self.publicados = 0
+        self.entregados = 0
+        db.suscribir(self._al_escribir)
+
+    def suscribir(self, usuario_id: str, entregar: Optional[Callable[[Dict], None]] = None,
+                  capacidad: int = CAPACIDAD, releer: bool = False) -> Suscripcion:
+        """
+        Abre una suscripción a los cambios de un usuario
+
+        Args:
+            usuario_id: Usuario a seguir
+            entregar: Callback por delta (corre en el hilo de la escritura: no debe bloquear)
+            capacidad: Deltas acumulados como máximo si no hay callback
+            releer: La primera llamada a pendientes() retorna None (reemplaza a una suscripción vencida)
+        """
+        suscripcion = Suscripcion(self, usuario_id, entregar, capacidad, releer)
+        with self._lock:
+            self._canales.setdefault(usuario_id, {})[id(suscripcion)] = suscripcion
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion):
+        """Cierra una suscripción (idempotente)"""
+        with self._lock:
+            canal = self._canales.get(suscripcion.usuario_id)
+            if canal is not None:
+                canal.pop(id(suscripcion), None)
+                if not canal:
+                    del self._canales[suscripcion.usuario_id]
+
+    def _activa(self, suscripcion: Suscripcion) -> bool:
+        with self._lock:
+            return id(suscripcion) in self._canales.get(suscripcion.usuario_id, {})
+
+    def suscriptores(self, usuario_id: str = None) -> int:
+        """Suscripciones abiertas de un usuario, o de todos"""
+        with self._lock:
+            if usuario_id is not None:
+                return len(self._canales.get(usuario_id, {}))
+            return sum(len(canal) for canal in self._canales.values())
+
+    @staticmethod
+    def delta_del_evento(evento: Dict) -> Optional[Dict]:
+        """Traduce un evento de escritura al delta que ven los clientes (None si no les interesa)"""
+        tipo = evento.get('tipo')
+        if tipo in ('marcar', 'desmarcar'):
+            delta = {
+                'tipo': 'habito', 'usuario_id': evento['usuario_id'], 'fecha': evento['fecha'],
+                'habito_id': evento['habito_id'], 'completado': tipo == 'marcar',
+                'metricas': evento.get('metricas')
+            }
+            if 'racha_habito' in evento:
+                delta['racha_habito'] = evento['racha_habito']
+            if evento.get('leaderboard'):
+                delta['racha_perfecta'] = evento['leaderboard']['racha_perfecta']
+            return delta
+        if tipo == 'badges':
+            return {'tipo': 'badges', 'usuario_id': evento['usuario_id'], 'badges': evento['badges']}
+        if tipo == 'perfil':
+            return {'tipo': 'perfil', 'usuario_id': evento['usuario_id'], 'perfil': evento['perfil']}
+        return None
+
+    def _al_escribir(self, evento: Dict):
+        """Entrega el delta de un evento a las suscripciones de su usuario"""
+        # Lectura sin lock: un dict de Python no se corrompe y lo peor que pasa es
+        # no ver una suscripción abierta en este mismo instante
+        if not self._canales.get(evento.get('usuario_id')):
+            return
+        delta = self.delta_del_evento(evento)
+        if delta is None:
+            return
+
+        ahora = time.monotonic()
+        with self._lock:
+            canal = self._canales.get(delta['usuario_id'], {})
+            for clave, suscripcion in list(canal.items()):
+                if suscripcion._entregar is None and ahora - suscripcion.ultimo_acceso > self.expiracion:
+                    del canal[clave]
+            if not canal:
+                self._canales.pop(delta['usuario_id'], None)
+            destinos = list(canal.values())
+            self.publicados += 1
+            # Las acumuladas se llenan bajo el lock (pendientes() también lo toma)
+            for suscripcion in destinos:
+                if suscripcion._entregar is None:
+                    suscripcion._recibir(delta)
+        for suscripcion in destinos:
+            if suscripcion._entregar is not None:
+                try:
+                    suscripcion._recibir(delta)
+                except Exception as e:
+                    print(f"Error entregando cambio: {e}")
+        self.entregados += len(destinos)
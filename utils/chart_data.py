@@ -0,0 +1,198 @@
+"""
+Datos de Gráficos de Tendencia
+Series para el gráfico de tendencia con horizontes de 30 días a todo el
+histórico, siempre con la misma cantidad acotada de puntos:
+
+- Agregados por día, semana (lunes) y mes, calculados una vez por versión
+  de los datos del usuario (DatabaseManager.obtener_version_datos)
+- Cada horizonte usa la resolución más fina que no excede 4x el
+  presupuesto de puntos y se reduce al presupuesto con LTTB (Largest
+  Triangle Three Buckets), que conserva picos y caídas
+- Las series ya reducidas quedan en caché por (usuario, versión, hoy,
+  horizonte): repetir un horizonte no toca más que el índice de eventos
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+# Horizontes seleccionables: etiqueta -> días (None: todo el histórico)
+HORIZONTES = {
+    '30 días': 30,
+    '90 días': 90,
+    '6 meses': 182,
+    '12 meses': 365,
+    '3 años': 1095,
+    'Todo': None,
+}
+
+RESOLUCIONES = ('dia', 'semana', 'mes')
+
+# Puntos que llegan al navegador por gráfico, sea cual sea el horizonte
+PRESUPUESTO_PUNTOS = 120
+
+# Una resolución se usa si tiene hasta este múltiplo del presupuesto (LTTB reduce el resto)
+HOLGURA_RESOLUCION = 4
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], umbral: int) -> List[int]:
+    """
+    Largest Triangle Three Buckets: índices de `umbral` puntos que conservan
+    la forma de la serie (siempre incluye el primero y el último)
+    """
+    n = len(xs)
+    if umbral >= n or umbral < 3:
+        return list(range(n))
+
+    paso = (n - 2) / (umbral - 2)
+    elegidos = [0]
+    a = 0
+    for i in range(umbral - 2):
+        # Promedio del bucket siguiente (en la última vuelta, el último punto)
+        inicio_sig = int((i + 1) * paso) + 1
+        fin_sig = min(int((i + 2) * paso) + 1, n)
+        cantidad = fin_sig - inicio_sig
+        x_medio = sum(xs[inicio_sig:fin_sig]) / cantidad
+        y_medio = sum(ys[inicio_sig:fin_sig]) / cantidad
+
+        # Del bucket actual, el punto que forma el triángulo más grande con a y el promedio
+        mejor, mejor_area = -1, -1.0
+        for j in range(int(i * paso) + 1, int((i + 1) * paso) + 1):
+            area = abs((xs[a] - x_medio) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (y_medio - ys[a]))
+            if area > mejor_area:
+                mejor, mejor_area = j, area
+        elegidos.append(mejor)
+        a = mejor
+    elegidos.append(n - 1)
+    return elegidos
+
+
+def _inicio_periodo(fecha: date, resolucion: str) -> date:
+    if resolucion == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if resolucion == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+class ChartData:
+    """
+    Capa de datos del gráfico de tendencia. Las series retornadas se
+    comparten entre llamadas (caché): no modificarlas
+    """
+
+    def __init__(self, db, presupuesto: int = PRESUPUESTO_PUNTOS, max_entradas: int = 256):
+        """
+        Args:
+            db: DatabaseManager (se usa para_usuario con otros usuarios)
+            presupuesto: Puntos máximos por serie
+            max_entradas: Series reducidas en caché (las menos usadas se descartan)
+        """
+        self.db = db
+        self.presupuesto = presupuesto
+        self.max_entradas = max_entradas
+        self._agregados: OrderedDict = OrderedDict()  # usuario -> (versión, agregados por resolución)
+        self._series: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.calculos = 0
+
+    def serie(self, dias: Optional[int] = 30, usuario_id: str = None) -> Dict:
+        """
+        Serie del gráfico de tendencia para un horizonte
+
+        Args:
+            dias: Días hacia atrás desde hoy (None: todo el histórico)
+            usuario_id: Usuario (default: el del gestor)
+
+        Returns:
+            Dict con resolucion ('dia', 'semana' o 'mes'), fechas (inicio de
+            cada período, ISO), porcentajes (promedio del período), puntos
+            (suma), dias (días con registro) y total (períodos antes de LTTB)
+        """
+        gestor = self.db if usuario_id in (None, self.db.usuario_id) else self.db.para_usuario(usuario_id)
+        version = (gestor.obtener_version_datos(), date.today())
+        clave = (gestor.usuario_id, version, dias)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is not None:
+                self._series.move_to_end(clave)
+                self.aciertos += 1
+                return serie
+
+        serie = self._reducir(self._agregados_usuario(gestor, version), dias, version[1])
+        with self._lock:
+            self.calculos += 1
+            self._series[clave] = serie
+            if len(self._series) > self.max_entradas:
+                self._series.popitem(last=False)
+        return serie
+
+    def _agregados_usuario(self, gestor, version: tuple) -> Dict[str, Dict[str, list]]:
+        """Columnas por resolución de todo el histórico del usuario (una lectura por versión)"""
+        with self._lock:
+            guardado = self._agregados.get(gestor.usuario_id)
+        if guardado is not None and guardado[0] == version:
+            return guardado[1]
+
+        historico = gestor.obtener_historico(dias=None)
+        agregados = {}
+        for resolucion in RESOLUCIONES:
+            columnas = {'fechas': [], 'porcentajes': [], 'puntos': [], 'dias': []}
+            periodo_actual, suma = None, 0.0
+            for fila in historico:
+                periodo = _inicio_periodo(date.fromisoformat(fila['fecha']), resolucion)
+                if periodo != periodo_actual:
+                    if periodo_actual is not None:
+                        columnas['porcentajes'][-1] = suma / columnas['dias'][-1]
+                    periodo_actual, suma = periodo, 0.0
+                    columnas['fechas'].append(periodo)
+                    columnas['porcentajes'].append(0.0)
+                    columnas['puntos'].append(0)
+                    columnas['dias'].append(0)
+                suma += fila['porcentaje_cumplimiento'] or 0.0
+                columnas['puntos'][-1] += fila['puntos_totales'] or 0
+                columnas['dias'][-1] += 1
+            if periodo_actual is not None:
+                columnas['porcentajes'][-1] = suma / columnas['dias'][-1]
+            agregados[resolucion] = columnas
+
+        with self._lock:
+            self._agregados[gestor.usuario_id] = (version, agregados)
+            self._agregados.move_to_end(gestor.usuario_id)
+            if len(self._agregados) > self.max_entradas:
+                self._agregados.popitem(last=False)
+        return agregados
+
+    def _reducir(self, agregados: Dict[str, Dict[str, list]], dias: Optional[int], hoy: date) -> Dict:
+        """Recorta al horizonte en la resolución adecuada y aplica LTTB al presupuesto"""
+        desde = hoy - timedelta(days=dias) if dias is not None else None
+        for resolucion in RESOLUCIONES:
+            columnas = agregados[resolucion]
+            inicio = 0
+            if desde is not None:
+                # Primer período que todavía tiene días dentro del horizonte
+                limite = _inicio_periodo(desde, resolucion)
+                while inicio < len(columnas['fechas']) and columnas['fechas'][inicio] < limite:
+                    inicio += 1
+            total = len(columnas['fechas']) - inicio
+            if total <= self.presupuesto * HOLGURA_RESOLUCION or resolucion == RESOLUCIONES[-1]:
+                break
+
+        fechas = columnas['fechas'][inicio:]
+        porcentajes = columnas['porcentajes'][inicio:]
+        indices = lttb([f.toordinal() for f in fechas], porcentajes, self.presupuesto)
+        return {
+            'resolucion': resolucion,
+            'fechas': [fechas[i].isoformat() for i in indices],
+            'porcentajes': [porcentajes[i] for i in indices],
+            'puntos': [columnas['puntos'][inicio + i] for i in indices],
+            'dias': [columnas['dias'][inicio + i] for i in indices],
+            'total': total
+        }
+
+    def estadisticas(self) -> Dict:
+        """Series servidas desde la caché y series calculadas"""
+        with self._lock:
+            return {'aciertos': self.aciertos, 'calculos': self.calculos, 'en_cache': len(self._series)}
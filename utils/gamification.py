@@ -14,60 +14,79 @@ NIVELES = {
     5: {"nombre": "🏆 Leyenda", "puntos_requeridos": 5000, "descripcion": "Transformación completa"}
 }
 
+# Señales que alimentan los badges a partir de la racha de un hábito
+SEÑALES_RACHA_HABITO = {
+    "cero_celular_manana": "racha_cero_celular",
+    "cero_porno": "racha_cero_porno",
+    "peaje_ejercicio": "racha_peaje_ejercicio",
+    "dormir_temprano": "racha_dormir_temprano"
+}
+
 # Definición de badges/logros
+# "señales": entradas que lee el criterio; el BadgeEngine solo reevalúa un
+# badge cuando alguna de ellas cambia
 BADGES = {
     "primera_victoria": {
         "emoji": "🎯",
         "nombre": "Primera Victoria",
         "descripcion": "Completaste tu primer día",
+        "señales": ["dias_activos"],
         "criterio": lambda perfil: perfil.get('dias_activos', 0) >= 1
     },
     "semana_perfecta": {
         "emoji": "⭐",
         "nombre": "Semana Perfecta",
         "descripcion": "7 días seguidos >85%",
+        "señales": ["racha_perfecta"],
         "criterio": lambda perfil: perfil.get('racha_perfecta', 0) >= 7
     },
     "mes_consistente": {
         "emoji": "🥈",
         "nombre": "Mes Consistente",
         "descripcion": "30 días activos",
+        "señales": ["dias_activos"],
         "criterio": lambda perfil: perfil.get('dias_activos', 0) >= 30
     },
     "guerrero_matutino": {
         "emoji": "🌅",
         "nombre": "Guerrero Matutino",
         "descripcion": "30 días sin tocar celular al despertar",
+        "señales": ["racha_cero_celular"],
         "criterio": lambda perfil: perfil.get('racha_cero_celular', 0) >= 30
     },
     "ingeniero_atomico": {
         "emoji": "⚡",
         "nombre": "Ingeniero Atómico",
         "descripcion": "90 días de transformación",
+        "señales": ["dias_activos"],
         "criterio": lambda perfil: perfil.get('dias_activos', 0) >= 90
     },
     "pureza_mental": {
         "emoji": "🧠",
         "nombre": "Pureza Mental",
         "descripcion": "30 días racha Cero Porno",
+        "señales": ["racha_cero_porno"],
         "criterio": lambda perfil: perfil.get('racha_cero_porno', 0) >= 30
     },
     "domador_del_dota": {
         "emoji": "🎮",
         "nombre": "Domador del Dota",
         "descripcion": "30 días haciendo ejercicio antes de jugar",
+        "señales": ["racha_peaje_ejercicio"],
         "criterio": lambda perfil: perfil.get('racha_peaje_ejercicio', 0) >= 30
     },
     "crecimiento_muscular": {
         "emoji": "💪",
         "nombre": "Protocolo de Crecimiento",
         "descripcion": "30 días durmiendo antes de 22:30",
+        "señales": ["racha_dormir_temprano"],
         "criterio": lambda perfil: perfil.get('racha_dormir_temprano', 0) >= 30
     },
     "ano_leyenda": {
         "emoji": "💎",
         "nombre": "Año Legendario",
         "descripcion": "365 días de disciplina",
+        "señales": ["dias_activos"],
         "criterio": lambda perfil: perfil.get('dias_activos', 0) >= 365
     }
 }
@@ -89,6 +108,15 @@ class GamificationSystem:
         
         return nivel_actual, NIVELES[nivel_actual]
     
+    @staticmethod
+    def sql_nivel(columna: str) -> str:
+        """Expresión CASE de SQLite equivalente a calcular_nivel sobre `columna`"""
+        casos = " ".join(
+            f"WHEN {columna} >= {info['puntos_requeridos']} THEN {nivel}"
+            for nivel, info in sorted(NIVELES.items(), reverse=True)
+        )
+        return f"CASE {casos} ELSE 1 END"
+    
     @staticmethod
     def calcular_progreso_nivel(puntos_totales: int) -> Dict:
         """
@@ -101,6 +129,7 @@ class GamificationSystem:
         if nivel_actual == max(NIVELES.keys()):
             return {
                 'nivel': nivel_actual,
+                'nombre_nivel': info_actual['nombre'],
                 'puntos_actuales': puntos_totales,
                 'puntos_siguiente_nivel': puntos_totales,
                 'porcentaje': 100,
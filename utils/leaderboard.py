@@ -0,0 +1,239 @@
+"""
+Leaderboard entre Usuarios
+Ranking por puntos acumulados y racha perfecta con actualizaciones O(log n)
+"""
+
+import random
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+
+class _Nodo:
+    __slots__ = ('clave', 'prioridad', 'tamaño', 'izq', 'der')
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.prioridad = random.random()
+        self.tamaño = 1
+        self.izq = None
+        self.der = None
+
+
+def _tamaño(nodo: Optional[_Nodo]) -> int:
+    return nodo.tamaño if nodo else 0
+
+
+class OrderStatisticTree:
+    """
+    Treap con tamaños de subárbol: inserción, borrado, rango y selección
+    por posición en O(log n) esperado.
+    """
+
+    def __init__(self):
+        self._raiz: Optional[_Nodo] = None
+
+    def __len__(self) -> int:
+        return _tamaño(self._raiz)
+
+    @staticmethod
+    def _actualizar(nodo: _Nodo):
+        nodo.tamaño = 1 + _tamaño(nodo.izq) + _tamaño(nodo.der)
+
+    def _dividir(self, nodo: Optional[_Nodo], clave) -> Tuple[Optional[_Nodo], Optional[_Nodo]]:
+        """Separa en (claves < clave, claves >= clave)"""
+        if nodo is None:
+            return None, None
+        if nodo.clave < clave:
+            menor, mayor = self._dividir(nodo.der, clave)
+            nodo.der = menor
+            self._actualizar(nodo)
+            return nodo, mayor
+        menor, mayor = self._dividir(nodo.izq, clave)
+        nodo.izq = mayor
+        self._actualizar(nodo)
+        return menor, nodo
+
+    def _unir(self, a: Optional[_Nodo], b: Optional[_Nodo]) -> Optional[_Nodo]:
+        """Une dos treaps donde todas las claves de a son menores que las de b"""
+        if a is None or b is None:
+            return a or b
+        if a.prioridad > b.prioridad:
+            a.der = self._unir(a.der, b)
+            self._actualizar(a)
+            return a
+        b.izq = self._unir(a, b.izq)
+        self._actualizar(b)
+        return b
+
+    def insertar(self, clave):
+        """Inserta una clave (se asume única)"""
+        menor, mayor = self._dividir(self._raiz, clave)
+        self._raiz = self._unir(self._unir(menor, _Nodo(clave)), mayor)
+
+    def eliminar(self, clave):
+        """Elimina una clave si existe"""
+        menor, resto = self._dividir(self._raiz, clave)
+        if resto is not None:
+            primero, resto = self._separar_primero(resto)
+            if primero.clave != clave:
+                resto = self._unir(primero, resto)
+        self._raiz = self._unir(menor, resto)
+
+    def _separar_primero(self, nodo: _Nodo) -> Tuple[Optional[_Nodo], Optional[_Nodo]]:
+        """Separa el nodo de clave mínima del resto del treap"""
+        if nodo.izq is None:
+            resto = nodo.der
+            nodo.der = None
+            self._actualizar(nodo)
+            return nodo, resto
+        primero, nodo.izq = self._separar_primero(nodo.izq)
+        self._actualizar(nodo)
+        return primero, nodo
+
+    def contar_menores(self, clave) -> int:
+        """Número de claves estrictamente menores que clave"""
+        nodo, cuenta = self._raiz, 0
+        while nodo is not None:
+            if nodo.clave < clave:
+                cuenta += _tamaño(nodo.izq) + 1
+                nodo = nodo.der
+            else:
+                nodo = nodo.izq
+        return cuenta
+
+    def seleccionar(self, k: int):
+        """Clave en la posición k (0 = menor)"""
+        nodo = self._raiz
+        while nodo is not None:
+            izquierda = _tamaño(nodo.izq)
+            if k < izquierda:
+                nodo = nodo.izq
+            elif k == izquierda:
+                return nodo.clave
+            else:
+                k -= izquierda + 1
+                nodo = nodo.der
+        raise IndexError(k)
+
+
+class Leaderboard:
+    """
+    Ranking de usuarios por 'puntos' (acumulados en registros) y 'racha_perfecta'.
+
+    La tabla `leaderboard` es la fuente de verdad y DatabaseManager la mantiene
+    de forma incremental en cada marcar/desmarcar. Esta clase la carga una vez
+    en árboles de estadísticos de orden y se suscribe a los eventos de escritura,
+    de modo que cada cambio de puntaje cuesta O(log n) y no reordena la población.
+    """
+
+    METRICAS = ('puntos', 'racha_perfecta')
+
+    def __init__(self, db):
+        """
+        Args:
+            db: DatabaseManager cuyos eventos de escritura alimentan el ranking
+        """
+        self.db = db
+        self._lock = threading.Lock()
+        self._arboles = {metrica: OrderStatisticTree() for metrica in self.METRICAS}
+        self._valores: Dict[str, Dict[str, int]] = {}
+        self._racha_hasta: Dict[str, Optional[str]] = {}
+        self._expirado_en: Optional[date] = None
+        self.recargar()
+        db.suscribir(self._al_escribir)
+
+    def recargar(self):
+        """Reconstruye los árboles desde la tabla leaderboard"""
+        with self._lock:
+            self._arboles = {metrica: OrderStatisticTree() for metrica in self.METRICAS}
+            self._valores = {}
+            self._racha_hasta = {}
+            for usuario_id, puntos, racha, racha_hasta in self.db.obtener_leaderboard():
+                self._poner(usuario_id, puntos, racha, racha_hasta)
+            self._expirado_en = None
+
+    def _poner(self, usuario_id: str, puntos: int, racha: int, racha_hasta: Optional[str]):
+        """Inserta o reemplaza los valores de un usuario en ambos árboles"""
+        anteriores = self._valores.get(usuario_id)
+        nuevos = {'puntos': puntos, 'racha_perfecta': racha}
+        for metrica, arbol in self._arboles.items():
+            if anteriores is not None:
+                if anteriores[metrica] == nuevos[metrica]:
+                    continue
+                arbol.eliminar((-anteriores[metrica], usuario_id))
+            arbol.insertar((-nuevos[metrica], usuario_id))
+        self._valores[usuario_id] = nuevos
+        self._racha_hasta[usuario_id] = racha_hasta
+
+    def _al_escribir(self, evento: Dict):
+        """Aplica el cambio de puntaje de un evento de DatabaseManager"""
+        fila = evento.get('leaderboard')
+        if not fila:
+            return
+        with self._lock:
+            self._poner(evento['usuario_id'], fila['puntos'], fila['racha_perfecta'], fila['racha_hasta'])
+
+    def _expirar_rachas(self, hoy: date):
+        """Pone en cero (una vez por día) las rachas que ya no siguen vivas"""
+        if self._expirado_en == hoy:
+            return
+        for usuario_id in self.db.expirar_rachas_leaderboard(hoy):
+            if usuario_id in self._valores:
+                self._poner(usuario_id, self._valores[usuario_id]['puntos'], 0, None)
+        self._expirado_en = hoy
+
+    def _validar(self, metrica: str):
+        if metrica not in self.METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica}")
+
+    def _entrada(self, indice: int, metrica: str) -> Dict:
+        valor_negativo, usuario_id = self._arboles[metrica].seleccionar(indice)
+        return {
+            'posicion': self._arboles[metrica].contar_menores((valor_negativo, '')) + 1,
+            'usuario_id': usuario_id,
+            'valor': -valor_negativo
+        }
+
+    def top(self, n: int = 10, metrica: str = 'puntos', hoy: date = None) -> List[Dict]:
+        """
+        Los N primeros del ranking
+
+        Returns:
+            Lista de {posicion, usuario_id, valor}; los empates comparten posición
+        """
+        self._validar(metrica)
+        with self._lock:
+            self._expirar_rachas(hoy or date.today())
+            return [self._entrada(i, metrica) for i in range(min(n, len(self._arboles[metrica])))]
+
+    def posicion(self, usuario_id: str, metrica: str = 'puntos', hoy: date = None) -> Optional[int]:
+        """Posición (1 = primero) de un usuario, o None si no está en el ranking"""
+        self._validar(metrica)
+        with self._lock:
+            self._expirar_rachas(hoy or date.today())
+            if usuario_id not in self._valores:
+                return None
+            valor = self._valores[usuario_id][metrica]
+            return self._arboles[metrica].contar_menores((-valor, '')) + 1
+
+    def vecinos(self, usuario_id: str, metrica: str = 'puntos', k: int = 2, hoy: date = None) -> List[Dict]:
+        """
+        Los k usuarios por encima y por debajo de un usuario (incluido él)
+
+        Returns:
+            Lista de {posicion, usuario_id, valor} ordenada por ranking
+        """
+        self._validar(metrica)
+        with self._lock:
+            self._expirar_rachas(hoy or date.today())
+            if usuario_id not in self._valores:
+                return []
+            arbol = self._arboles[metrica]
+            indice = arbol.contar_menores((-self._valores[usuario_id][metrica], usuario_id))
+            inicio, fin = max(0, indice - k), min(len(arbol), indice + k + 1)
+            return [self._entrada(i, metrica) for i in range(inicio, fin)]
+
+    def total_usuarios(self) -> int:
+        """Número de usuarios en el ranking"""
+        return len(self._valores)
@@ -0,0 +1,231 @@
+"""
+Perfilado por Rerun
+Mide el tiempo de pared de cada sección de render, las llamadas y conexiones
+de DatabaseManager y los aciertos de caché de un rerun de Streamlit, para el
+panel de depuración de app.py (ATOMIC_PERF=1 o ?perf=1)
+
+Sin el panel activo no se envuelve nada: las secciones y las cachés de app.py
+se reemplazan en su namespace solo en los reruns perfilados (o con las
+métricas de utils.telemetry activas), y las clases se instrumentan la
+primera vez que alguien activa el panel.
+"""
+
+import functools
+import inspect
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional
+
+VARIABLE_ENTORNO = "ATOMIC_PERF"
+PARAMETRO_URL = "perf"
+_ACTIVOS = ("1", "true", "si", "sí")
+
+
+class RerunProfiler:
+    """Mediciones acumuladas durante un rerun (un hilo de script de Streamlit)"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.secciones: List[Dict] = []
+        self.llamadas: Dict[str, List[float]] = {}
+        self.conexiones: Dict[str, int] = {}
+        self.caches: Dict[str, List[int]] = {}
+        self.segundos_db = 0.0
+        self._profundidad = 0
+        self._profundidad_db = 0
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def resumen(self) -> Dict:
+        """Secciones, llamadas a la base, conexiones y cachés en filas listas para mostrar"""
+        return {
+            'total_ms': self.total_ms(),
+            'secciones': self.secciones,
+            'db': sorted(
+                ({'metodo': metodo, 'llamadas': int(n), 'total_ms': s * 1000} for metodo, (n, s) in
+                 self.llamadas.items()),
+                key=lambda fila: -fila['total_ms']
+            ),
+            'db_llamadas': int(sum(n for n, _ in self.llamadas.values())),
+            'db_ms': self.segundos_db * 1000,
+            'conexiones': dict(self.conexiones),
+            'caches': [
+                {'cache': nombre, 'llamadas': n, 'aciertos': n - fallos,
+                 'tasa': (n - fallos) / n if n else 0.0}
+                for nombre, (n, fallos) in self.caches.items()
+            ]
+        }
+
+
+_actual: ContextVar[Optional[RerunProfiler]] = ContextVar("perfil_rerun", default=None)
+
+# Callbacks (cache, fallo) de otros consumidores de los eventos de caché (utils.telemetry)
+_suscriptores_cache: List[Callable[[str, bool], None]] = []
+
+
+def habilitado(query_params=None) -> bool:
+    """El panel se activa con la variable de entorno o con el parámetro ?perf=1"""
+    if os.environ.get(VARIABLE_ENTORNO, "").lower() in _ACTIVOS:
+        return True
+    return query_params is not None and str(query_params.get(PARAMETRO_URL, "")).lower() in _ACTIVOS
+
+
+def iniciar_rerun(activo: bool) -> Optional[RerunProfiler]:
+    """
+    Abre (o descarta) el perfil del rerun en curso. Se llama siempre al
+    principio del script para que un rerun interrumpido no deje el anterior
+    """
+    perfil = RerunProfiler() if activo else None
+    _actual.set(perfil)
+    return perfil
+
+
+def actual() -> Optional[RerunProfiler]:
+    return _actual.get()
+
+
+def suscribir_cache(callback: Callable[[str, bool], None]):
+    """Registra un callback(cache, fallo) para cada llamada y cada fallo de caché instrumentados"""
+    if callback not in _suscriptores_cache:
+        _suscriptores_cache.append(callback)
+
+
+# ========================
+# SECCIONES Y CACHÉS DE APP.PY
+# ========================
+
+def _seccion(nombre: str, funcion: Callable) -> Callable:
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        perfil = _actual.get()
+        if perfil is None:
+            return funcion(*args, **kwargs)
+        fila = {'seccion': nombre, 'nivel': perfil._profundidad, 'ms': 0.0}
+        perfil.secciones.append(fila)
+        perfil._profundidad += 1
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            fila['ms'] = (time.perf_counter() - inicio) * 1000
+            perfil._profundidad -= 1
+    envoltura._perfilada = True
+    return envoltura
+
+
+def _contar_llamadas_cache(nombre: str, funcion: Callable) -> Callable:
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        perfil = _actual.get()
+        if perfil is not None:
+            perfil.caches.setdefault(nombre, [0, 0])[0] += 1
+        for callback in _suscriptores_cache:
+            callback(nombre, False)
+        return funcion(*args, **kwargs)
+    envoltura._perfilada = True
+    return envoltura
+
+
+def registrar_fallo_cache(nombre: str):
+    """Anota que la caché `nombre` tuvo que calcular su valor"""
+    perfil = _actual.get()
+    if perfil is not None:
+        perfil.caches.setdefault(nombre, [0, 0])[1] += 1
+    for callback in _suscriptores_cache:
+        callback(nombre, True)
+
+
+def fallo_cache(nombre: str) -> Callable:
+    """
+    Decorador para el cuerpo de una función cacheada (debajo de st.cache_data /
+    st.cache_resource): solo se ejecuta en los fallos, así que no cuesta nada
+    en los aciertos
+    """
+    def decorador(funcion: Callable) -> Callable:
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            registrar_fallo_cache(nombre)
+            return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def instrumentar_namespace(namespace: Dict, secciones: Iterable[str] = (), caches: Iterable[str] = ()):
+    """
+    Reemplaza en `namespace` (los globals del script) las funciones de render
+    por versiones cronometradas y las funciones cacheadas por versiones que
+    cuentan llamadas. Como Streamlit re-ejecuta el script en cada rerun, el
+    reemplazo dura solo el rerun perfilado.
+    """
+    for nombre in secciones:
+        if not getattr(namespace[nombre], '_perfilada', False):
+            namespace[nombre] = _seccion(nombre, namespace[nombre])
+    for nombre in caches:
+        if not getattr(namespace[nombre], '_perfilada', False):
+            namespace[nombre] = _contar_llamadas_cache(nombre, namespace[nombre])
+
+
+# ========================
+# CLASES (DATABASEMANAGER, BACKUPMANAGER)
+# ========================
+
+def _metodo_db(nombre: str, metodo: Callable) -> Callable:
+    @functools.wraps(metodo)
+    def envoltura(*args, **kwargs):
+        perfil = _actual.get()
+        if perfil is None:
+            return metodo(*args, **kwargs)
+        perfil._profundidad_db += 1
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            segundos = time.perf_counter() - inicio
+            perfil._profundidad_db -= 1
+            # El total de la base cuenta solo las llamadas externas (obtener_metricas_dia llama a otras)
+            if perfil._profundidad_db == 0:
+                perfil.segundos_db += segundos
+            acumulado = perfil.llamadas.setdefault(nombre, [0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += segundos
+    return envoltura
+
+
+def _conexion(clase: str, metodo: Callable) -> Callable:
+    @functools.wraps(metodo)
+    def envoltura(*args, **kwargs):
+        perfil = _actual.get()
+        if perfil is not None:
+            perfil.conexiones[clase] = perfil.conexiones.get(clase, 0) + 1
+        return metodo(*args, **kwargs)
+    return envoltura
+
+
+def instrumentar_clase(clase: type):
+    """
+    Envuelve (una sola vez) los métodos públicos definidos en la clase y su
+    _get_connection. Las envolturas solo miden cuando el hilo tiene un perfil
+    abierto; las demás sesiones pagan una lectura de ContextVar por llamada.
+    """
+    if clase.__dict__.get('_perf_instrumentada'):
+        return
+    for nombre, atributo in list(vars(clase).items()):
+        if nombre == '_get_connection':
+            setattr(clase, nombre, _conexion(clase.__name__, atributo))
+        elif not nombre.startswith('_') and inspect.isfunction(atributo):
+            setattr(clase, nombre, _metodo_db(nombre, atributo))
+    clase._perf_instrumentada = True
+
+
+def instrumentar_cache_metodo(clase: type, nombre: str, llamada: str, fallo: str):
+    """
+    Cuenta como caché `nombre` el método `llamada` de la clase, con `fallo`
+    como el método que solo corre cuando hay que regenerar el valor
+    """
+    if clase.__dict__.get('_perf_cache_' + nombre):
+        return
+    setattr(clase, llamada, _contar_llamadas_cache(nombre, getattr(clase, llamada)))
+    setattr(clase, fallo, fallo_cache(nombre)(getattr(clase, fallo)))
+    setattr(clase, '_perf_cache_' + nombre, True)
@@ -3,11 +3,15 @@ Sistema de Reportes Avanzados
 Genera análisis diario, semanal, mensual, trimestral, semestral y anual
 """
 
-import pandas as pd
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, List, Tuple
 import calendar
 
+# numpy y pandas se importan dentro de cada reporte: importar este módulo
+# (app, API, telemetría) no los carga hasta que un reporte con datos se calcula
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class ReportGenerator:
     """Generador de reportes avanzados para análisis temporal"""
@@ -69,11 +73,12 @@ class ReportGenerator:
         
         # Obtener datos de la semana
         historico = db.obtener_historico(dias=90)
-        df = pd.DataFrame(historico)
-        
-        if df.empty:
+        if not historico:
             return ReportGenerator._reporte_vacio('semanal')
         
+        import pandas as pd
+        df = pd.DataFrame(historico)
+        
         df['fecha'] = pd.to_datetime(df['fecha'])
         
         # Filtrar semana actual
@@ -130,11 +135,12 @@ class ReportGenerator:
         
         # Obtener datos
         historico = db.obtener_historico(dias=90)
-        df = pd.DataFrame(historico)
-        
-        if df.empty:
+        if not historico:
             return ReportGenerator._reporte_vacio('mensual')
         
+        import pandas as pd
+        df = pd.DataFrame(historico)
+        
         df['fecha'] = pd.to_datetime(df['fecha'])
         
         # Filtrar mes
@@ -193,11 +199,12 @@ class ReportGenerator:
         
         # Obtener datos
         historico = db.obtener_historico(dias=180)
-        df = pd.DataFrame(historico)
-        
-        if df.empty:
+        if not historico:
             return ReportGenerator._reporte_vacio('trimestral')
         
+        import pandas as pd
+        df = pd.DataFrame(historico)
+        
         df['fecha'] = pd.to_datetime(df['fecha'])
         
         # Filtrar trimestre
@@ -248,11 +255,12 @@ class ReportGenerator:
         ultimo_dia = date(año, mes_fin, calendar.monthrange(año, mes_fin)[1])
         
         historico = db.obtener_historico(dias=365)
-        df = pd.DataFrame(historico)
-        
-        if df.empty:
+        if not historico:
             return ReportGenerator._reporte_vacio('semestral')
         
+        import pandas as pd
+        df = pd.DataFrame(historico)
+        
         df['fecha'] = pd.to_datetime(df['fecha'])
         mask = (df['fecha'] >= pd.Timestamp(primer_dia)) & (df['fecha'] <= pd.Timestamp(ultimo_dia))
         sem_data = df[mask]
@@ -286,11 +294,12 @@ class ReportGenerator:
         ultimo_dia = date(año, 12, 31)
         
         historico = db.obtener_historico(dias=400)
-        df = pd.DataFrame(historico)
-        
-        if df.empty:
+        if not historico:
             return ReportGenerator._reporte_vacio('anual')
         
+        import pandas as pd
+        df = pd.DataFrame(historico)
+        
         df['fecha'] = pd.to_datetime(df['fecha'])
         mask = (df['fecha'] >= pd.Timestamp(primer_dia)) & (df['fecha'] <= pd.Timestamp(ultimo_dia))
         año_data = df[mask]
@@ -322,6 +331,62 @@ class ReportGenerator:
             'transformacion': ReportGenerator._analizar_transformacion_anual(año_data)
         }
     
+    @staticmethod
+    def generar_tendencia_multianual(lector) -> Dict:
+        """
+        Promedio mensual de cumplimiento de todo el histórico, año por año
+
+        Args:
+            lector: ArchiveReader (columnas mmap del archivo + cola viva)
+
+        Returns:
+            Dict {año: {mes: promedio_porcentaje}}
+        """
+        columnas = lector.columnas()
+        if len(columnas['fechas']) == 0:
+            return {}
+
+        import pandas as pd
+        df = pd.DataFrame({
+            'fecha': pd.to_datetime(columnas['fechas'] - date(1970, 1, 1).toordinal(), unit='D'),
+            'porcentaje_cumplimiento': columnas['porcentajes']
+        })
+        por_mes = df.groupby([df['fecha'].dt.year, df['fecha'].dt.month])['porcentaje_cumplimiento'].mean()
+
+        tendencia: Dict = {}
+        for (año, mes), promedio in por_mes.items():
+            tendencia.setdefault(int(año), {})[ReportGenerator.MESES_ES[int(mes)]] = round(float(promedio), 1)
+        return tendencia
+
+    @staticmethod
+    def generar_matriz_habitos(lector, año: int = None) -> Dict:
+        """
+        Tasa de cumplimiento por hábito y mes de un año
+
+        Args:
+            lector: ArchiveReader (columnas mmap del archivo + cola viva)
+            año: Año del reporte (default: actual)
+
+        Returns:
+            Dict {habito_id: {mes: porcentaje de días registrados con el hábito}}
+        """
+        if año is None:
+            año = date.today().year
+
+        matriz = lector.matriz_habitos(desde=date(año, 1, 1), hasta=date(año, 12, 31))
+        if len(matriz['fechas']) == 0:
+            return {}
+
+        import numpy as np
+        meses = np.array([date.fromordinal(int(f)).month for f in matriz['fechas']])
+        resultado = {}
+        for i, habito_id in enumerate(matriz['habitos']):
+            resultado[habito_id] = {
+                ReportGenerator.MESES_ES[int(mes)]: round(float(matriz['matriz'][meses == mes, i].mean() * 100), 1)
+                for mes in np.unique(meses)
+            }
+        return resultado
+
     # Métodos auxiliares
     
     @staticmethod
@@ -334,7 +399,7 @@ class ReportGenerator:
         }
     
     @staticmethod
-    def _calcular_tendencia(df: pd.DataFrame) -> str:
+    def _calcular_tendencia(df: 'pd.DataFrame') -> str:
         """Calcula si la tendencia es ascendente, descendente o estable"""
         if len(df) < 7:
             return "Insuficiente datos"
@@ -354,7 +419,7 @@ class ReportGenerator:
             return "➡️ Estable"
     
     @staticmethod
-    def _calcular_racha_maxima(df: pd.DataFrame) -> int:
+    def _calcular_racha_maxima(df: 'pd.DataFrame') -> int:
         """Calcula la racha máxima de días >85%"""
         if df.empty:
             return 0
@@ -382,7 +447,7 @@ class ReportGenerator:
         return racha_maxima
     
     @staticmethod
-    def _calcular_crecimiento_trimestral(df: pd.DataFrame) -> Dict:
+    def _calcular_crecimiento_trimestral(df: 'pd.DataFrame') -> Dict:
         """Analiza el crecimiento durante el trimestre"""
         if len(df) < 3:
             return {'mensaje': 'Insuficiente datos'}
@@ -403,7 +468,7 @@ class ReportGenerator:
         return crecimiento
     
     @staticmethod
-    def _analizar_transformacion_anual(df: pd.DataFrame) -> str:
+    def _analizar_transformacion_anual(df: 'pd.DataFrame') -> str:
         """Analiza la transformación durante el año"""
         if len(df) < 30:
             return "Año en progreso"
@@ -0,0 +1,241 @@
+"""
+Estructuras Probabilísticas (Sketches)
+t-digest para percentiles aproximados y HyperLogLog para contar usuarios únicos
+"""
+
+import hashlib
+import json
+import math
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+
+class TDigest:
+    """
+    t-digest con fusión (merging digest) para cuantiles aproximados.
+    Acepta inserciones incrementales y se puede combinar con otros digests.
+    """
+
+    def __init__(self, compresion: float = 100.0):
+        """
+        Args:
+            compresion: Parámetro delta; a mayor valor, más centroides y más precisión
+        """
+        self.compresion = compresion
+        self._medias: List[float] = []
+        self._pesos: List[float] = []
+        self._buffer: List[tuple] = []
+        self.total = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+
+    def agregar(self, valor: float, peso: float = 1.0):
+        """Agrega una observación al digest"""
+        self._buffer.append((float(valor), float(peso)))
+        self.total += peso
+        self.minimo = min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+        if len(self._buffer) >= self.compresion * 5:
+            self._comprimir()
+
+    def agregar_varios(self, valores: Iterable[float]):
+        """Agrega muchas observaciones de peso 1"""
+        for valor in valores:
+            self.agregar(valor)
+
+    def combinar(self, otro: 'TDigest') -> 'TDigest':
+        """Incorpora los centroides de otro digest (ej: otro shard)"""
+        if otro.total == 0:
+            return self
+        otro._comprimir()
+        self._buffer.extend(zip(otro._medias, otro._pesos))
+        self.total += otro.total
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+        self._comprimir()
+        return self
+
+    def _comprimir(self):
+        """Fusiona buffer y centroides respetando el límite de tamaño por cuantil"""
+        if not self._buffer:
+            return
+        puntos = sorted(list(zip(self._medias, self._pesos)) + self._buffer)
+        self._buffer = []
+
+        medias, pesos = [], []
+        acumulado = 0.0
+        media_actual, peso_actual = puntos[0]
+        for media, peso in puntos[1:]:
+            q = (acumulado + peso_actual + peso) / self.total
+            limite = 4 * self.total * q * (1 - q) / self.compresion
+            if peso_actual + peso <= max(1.0, limite):
+                peso_actual += peso
+                media_actual += (media - media_actual) * peso / peso_actual
+            else:
+                medias.append(media_actual)
+                pesos.append(peso_actual)
+                acumulado += peso_actual
+                media_actual, peso_actual = media, peso
+        medias.append(media_actual)
+        pesos.append(peso_actual)
+
+        self._medias, self._pesos = medias, pesos
+
+    def cuantil(self, q: float) -> Optional[float]:
+        """
+        Valor aproximado bajo el cual cae la fracción q de las observaciones
+
+        Returns:
+            Valor estimado o None si el digest está vacío
+        """
+        self._comprimir()
+        if self.total == 0:
+            return None
+        if q <= 0:
+            return self.minimo
+        if q >= 1:
+            return self.maximo
+        if len(self._medias) == 1:
+            return self._medias[0]
+
+        objetivo = q * self.total
+        acumulado = 0.0
+        for i, (media, peso) in enumerate(zip(self._medias, self._pesos)):
+            centro = acumulado + peso / 2
+            if objetivo < centro:
+                if i == 0:
+                    izquierda_valor, izquierda_pos = self.minimo, 0.0
+                else:
+                    izquierda_valor = self._medias[i - 1]
+                    izquierda_pos = acumulado - self._pesos[i - 1] / 2
+                return self._interpolar(objetivo, izquierda_pos, centro, izquierda_valor, media)
+            acumulado += peso
+        ultimo_centro = self.total - self._pesos[-1] / 2
+        return self._interpolar(objetivo, ultimo_centro, self.total, self._medias[-1], self.maximo)
+
+    def cdf(self, valor: float) -> float:
+        """
+        Fracción aproximada de observaciones menores o iguales a valor.
+        Los empates interiores cuentan la mitad, como en el rango percentil
+        clásico; en los extremos cuentan enteros (cdf(maximo) es 1 y
+        cdf(minimo) es la fracción de observaciones en el mínimo)
+        """
+        self._comprimir()
+        if self.total == 0 or valor < self.minimo:
+            return 0.0
+        if valor >= self.maximo:
+            return 1.0
+        if valor == self.minimo:
+            return self._peso_igual(valor) / self.total
+
+        # Centroides con media < valor, luego los que empatan con valor
+        inicio = bisect_left(self._medias, valor)
+        menores = sum(self._pesos[:inicio])
+        iguales = self._peso_igual(valor)
+        if iguales:
+            return (menores + iguales / 2) / self.total
+
+        # Entre los centros de los grupos vecinos (los centroides empatados se tratan como uno)
+        if inicio == 0:
+            valor_anterior, posicion_anterior = self.minimo, 0.0
+        else:
+            valor_anterior = self._medias[inicio - 1]
+            posicion_anterior = menores - self._peso_igual(valor_anterior) / 2
+        if inicio == len(self._medias):
+            valor_siguiente, posicion_siguiente = self.maximo, self.total
+        else:
+            valor_siguiente = self._medias[inicio]
+            posicion_siguiente = menores + self._peso_igual(valor_siguiente) / 2
+        return self._interpolar(valor, valor_anterior, valor_siguiente,
+                                posicion_anterior, posicion_siguiente) / self.total
+
+    def _peso_igual(self, valor: float) -> float:
+        """Peso de los centroides con media exactamente igual a valor"""
+        inicio = bisect_left(self._medias, valor)
+        return sum(p for m, p in zip(self._medias[inicio:], self._pesos[inicio:]) if m == valor)
+
+    @staticmethod
+    def _interpolar(x: float, x0: float, x1: float, y0: float, y1: float) -> float:
+        """Interpolación lineal protegida contra intervalos vacíos"""
+        if x1 == x0:
+            return (y0 + y1) / 2
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def serializar(self) -> bytes:
+        """Serializa el digest compacto a bytes (JSON)"""
+        self._comprimir()
+        return json.dumps({
+            'compresion': self.compresion,
+            'medias': self._medias,
+            'pesos': self._pesos,
+            'min': self.minimo if self.total else None,
+            'max': self.maximo if self.total else None
+        }).encode('utf-8')
+
+    @classmethod
+    def deserializar(cls, datos: bytes) -> 'TDigest':
+        """Reconstruye un digest serializado con serializar()"""
+        contenido = json.loads(datos)
+        digest = cls(contenido['compresion'])
+        digest._medias = contenido['medias']
+        digest._pesos = contenido['pesos']
+        digest.total = float(sum(digest._pesos))
+        if digest.total:
+            digest.minimo = contenido['min']
+            digest.maximo = contenido['max']
+        return digest
+
+
+class HyperLogLog:
+    """
+    HyperLogLog para estimar cardinalidad (ej: usuarios activos) con memoria fija.
+    Con precision=12 usa 4 KB y el error típico es ~1.6%.
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registros = bytearray(self.m)
+
+    def agregar(self, elemento: str):
+        """Agrega un elemento al conjunto"""
+        h = int.from_bytes(hashlib.blake2b(elemento.encode('utf-8'), digest_size=8).digest(), 'big')
+        indice = h >> (64 - self.precision)
+        resto = h & ((1 << (64 - self.precision)) - 1)
+        rango = (64 - self.precision) - resto.bit_length() + 1
+        if rango > self.registros[indice]:
+            self.registros[indice] = rango
+
+    def combinar(self, otro: 'HyperLogLog') -> 'HyperLogLog':
+        """Unión con otro HyperLogLog de la misma precisión"""
+        if otro.precision != self.precision:
+            raise ValueError("No se pueden combinar HyperLogLog de distinta precisión")
+        self.registros = bytearray(max(a, b) for a, b in zip(self.registros, otro.registros))
+        return self
+
+    def contar(self) -> int:
+        """Estimación del número de elementos distintos"""
+        alfa = 0.7213 / (1 + 1.079 / self.m)
+        estimado = alfa * self.m * self.m / sum(2.0 ** -r for r in self.registros)
+        vacios = self.registros.count(0)
+        if estimado <= 2.5 * self.m and vacios:
+            # Corrección para cardinalidades pequeñas (linear counting)
+            estimado = self.m * math.log(self.m / vacios)
+        return int(round(estimado))
+
+    def serializar(self) -> bytes:
+        """Serializa los registros (1 byte de precisión + m bytes)"""
+        return bytes([self.precision]) + bytes(self.registros)
+
+    @classmethod
+    def deserializar(cls, datos: bytes) -> 'HyperLogLog':
+        """Reconstruye un HyperLogLog serializado con serializar()"""
+        hll = cls(datos[0])
+        hll.registros = bytearray(datos[1:])
+        return hll
+
+
+TIPOS_SKETCH: Dict[str, type] = {
+    'tdigest': TDigest,
+    'hll': HyperLogLog
+}
@@ -0,0 +1,251 @@
+"""
+Telemetría en Formato Prometheus
+Histogramas de latencia por método y resultado para DatabaseManager,
+ReportGenerator y HabitValidator, y contadores de las cachés, expuestos en el
+formato de texto de Prometheus por HTTP local (/metrics) o en un archivo para
+el textfile collector de node_exporter
+
+Se activa con variables de entorno (sin ellas no se instrumenta nada):
+    ATOMIC_METRICS_PORT=9464               -> http://127.0.0.1:9464/metrics
+    ATOMIC_METRICS_FILE=/ruta/atomic.prom  -> reescrito cada ATOMIC_METRICS_INTERVAL s (15)
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database.db_manager import DatabaseManager
+from utils import profiling
+from utils.reports import ReportGenerator
+from utils.validators import HabitValidator
+
+# Límites superiores (segundos) de los buckets; las lecturas típicas están entre 0.2 y 5 ms
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+METRICAS = {
+    'atomic_db_seconds': "Latencia de los métodos públicos de DatabaseManager",
+    'atomic_report_seconds': "Latencia de ReportGenerator.generar_*",
+    'atomic_validator_seconds': "Latencia de las validaciones de HabitValidator",
+    'atomic_cache_requests_total': "Llamadas a funciones cacheadas",
+    'atomic_cache_misses_total': "Llamadas a funciones cacheadas que recalcularon su valor",
+}
+
+
+class Histograma:
+    """Conteos por bucket (no acumulados), suma y total de observaciones"""
+
+    __slots__ = ('conteos', 'suma', 'total', '_lock')
+
+    def __init__(self):
+        self.conteos = [0] * (len(BUCKETS) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, segundos: float):
+        i = bisect_left(BUCKETS, segundos)
+        with self._lock:
+            self.conteos[i] += 1
+            self.suma += segundos
+            self.total += 1
+
+    def leer(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.conteos), self.suma, self.total
+
+
+class RegistroMetricas:
+    """Histogramas por (métrica, method, outcome) y contadores por (métrica, cache)"""
+
+    def __init__(self):
+        self._histogramas: Dict[Tuple[str, str, str], Histograma] = {}
+        self._contadores: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def histograma(self, metrica: str, metodo: str, resultado: str) -> Histograma:
+        clave = (metrica, metodo, resultado)
+        histograma = self._histogramas.get(clave)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(clave, Histograma())
+        return histograma
+
+    def contar(self, metrica: str, cache: str, n: int = 1):
+        with self._lock:
+            self._contadores[(metrica, cache)] = self._contadores.get((metrica, cache), 0) + n
+
+    def exponer(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus (version 0.0.4)"""
+        # Copia bajo el lock: otros hilos agregan claves mientras se scrapea
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted(self._histogramas.items())
+        lineas = []
+        for metrica, ayuda in METRICAS.items():
+            tipo = 'counter' if metrica.endswith('_total') else 'histogram'
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} {tipo}"]
+            if tipo == 'counter':
+                for (nombre, cache), valor in contadores:
+                    if nombre == metrica:
+                        lineas.append(f'{metrica}{{cache="{cache}"}} {valor}')
+                continue
+            for (nombre, metodo, resultado), histograma in histogramas:
+                if nombre != metrica:
+                    continue
+                conteos, suma, total = histograma.leer()
+                etiquetas = f'method="{metodo}",outcome="{resultado}"'
+                acumulado = 0
+                for limite, conteo in zip(BUCKETS, conteos):
+                    acumulado += conteo
+                    lineas.append(f'{metrica}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f'{metrica}_bucket{{{etiquetas},le="+Inf"}} {total}')
+                lineas.append(f'{metrica}_sum{{{etiquetas}}} {suma:.9f}')
+                lineas.append(f'{metrica}_count{{{etiquetas}}} {total}')
+        return "\n".join(lineas) + "\n"
+
+    def escribir(self, ruta: str):
+        """Escribe la exposición de forma atómica (el collector nunca lee un archivo a medias)"""
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.exponer())
+        os.replace(temporal, ruta)
+
+
+REGISTRO = RegistroMetricas()
+
+
+# ========================
+# INSTRUMENTACIÓN
+# ========================
+
+def resultado_por_retorno(valor) -> str:
+    """DatabaseManager imprime el error y retorna False en vez de propagar"""
+    return "error" if valor is False else "ok"
+
+
+def resultado_validacion(valor) -> str:
+    """Las validaciones retornan (permitido, mensaje); rechazar no es un error"""
+    return "rejected" if isinstance(valor, tuple) and not valor[0] else "ok"
+
+
+def _medido(metrica: str, nombre: str, funcion: Callable, clasificar: Callable) -> Callable:
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            valor = funcion(*args, **kwargs)
+        except Exception:
+            REGISTRO.histograma(metrica, nombre, "exception").observar(time.perf_counter() - inicio)
+            raise
+        REGISTRO.histograma(metrica, nombre, clasificar(valor)).observar(time.perf_counter() - inicio)
+        return valor
+    return envoltura
+
+
+def instrumentar(clase: type, metrica: str, prefijo: str = "", clasificar: Callable = resultado_por_retorno):
+    """
+    Envuelve (una sola vez) los métodos públicos definidos en la clase cuyo
+    nombre empieza con `prefijo`, incluidos los @staticmethod
+    """
+    marca = '_metricas_' + metrica
+    if clase.__dict__.get(marca):
+        return
+    for nombre, atributo in list(vars(clase).items()):
+        if nombre.startswith('_') or not nombre.startswith(prefijo):
+            continue
+        if isinstance(atributo, staticmethod):
+            setattr(clase, nombre, staticmethod(_medido(metrica, nombre, atributo.__func__, clasificar)))
+        elif inspect.isfunction(atributo):
+            setattr(clase, nombre, _medido(metrica, nombre, atributo, clasificar))
+    setattr(clase, marca, True)
+
+
+def _al_usar_cache(cache: str, fallo: bool):
+    REGISTRO.contar('atomic_cache_misses_total' if fallo else 'atomic_cache_requests_total', cache)
+
+
+def instrumentar_todo():
+    """DatabaseManager, ReportGenerator, HabitValidator y los eventos de caché de utils.profiling"""
+    instrumentar(DatabaseManager, 'atomic_db_seconds')
+    instrumentar(ReportGenerator, 'atomic_report_seconds', prefijo='generar_')
+    instrumentar(HabitValidator, 'atomic_validator_seconds', clasificar=resultado_validacion)
+    profiling.suscribir_cache(_al_usar_cache)
+
+
+# ========================
+# EXPOSICIÓN
+# ========================
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = REGISTRO.exponer().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def servir(puerto: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sirve /metrics en un hilo daemon"""
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    threading.Thread(target=servidor.serve_forever, name="atomic-metrics", daemon=True).start()
+    return servidor
+
+
+def escribir_periodicamente(ruta: str, intervalo: float = 15.0) -> threading.Thread:
+    """Reescribe el archivo de métricas cada `intervalo` segundos en un hilo daemon"""
+    def bucle():
+        while True:
+            try:
+                REGISTRO.escribir(ruta)
+            except OSError as e:
+                print(f"Error escribiendo métricas en {ruta}: {e}")
+            time.sleep(intervalo)
+    hilo = threading.Thread(target=bucle, name="atomic-metrics-file", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def configuracion_entorno() -> Optional[Dict]:
+    """Puerto y/o archivo de las variables ATOMIC_METRICS_*, o None si no hay ninguno"""
+    puerto = os.environ.get("ATOMIC_METRICS_PORT")
+    archivo = os.environ.get("ATOMIC_METRICS_FILE")
+    if not puerto and not archivo:
+        return None
+    return {
+        'puerto': int(puerto) if puerto else None,
+        'archivo': archivo or None,
+        'intervalo': float(os.environ.get("ATOMIC_METRICS_INTERVAL", 15))
+    }
+
+
+def activar(puerto: Optional[int] = None, archivo: Optional[str] = None, intervalo: float = 15.0) -> Dict:
+    """
+    Instrumenta las clases y arranca la exposición pedida (una vez por proceso)
+
+    Returns:
+        Dict con servidor (o None) e hilo de archivo (o None)
+    """
+    instrumentar_todo()
+    servidor, hilo = None, None
+    if puerto:
+        try:
+            servidor = servir(puerto)
+        except OSError as e:
+            print(f"Error abriendo el puerto de métricas {puerto}: {e}")
+    if archivo:
+        hilo = escribir_periodicamente(archivo, intervalo)
+    return {'servidor': servidor, 'hilo': hilo}
+
@@ -0,0 +1,312 @@
+"""
+Trazas de Interacción
+Spans anidados con tiempos y atribución de llamadas a la base para seguir un
+clic de punta a punta: el rerun que detecta el checkbox, toggle_habito, las
+validaciones, marcar_habito y sus pasos internos, el reinicio de st.rerun y el
+re-render completo. Cada traza se guarda como JSON en database/traces y se
+exporta como pilas colapsadas (flamegraph.pl, speedscope) o como Chrome trace
+(chrome://tracing, Perfetto)
+
+Se activa con ATOMIC_TRACE=1 o ?trace=1; sin eso no se envuelve nada.
+
+Uso:
+    python -m utils.tracing database/traces/<traza>.json --formato colapsado > toggle.folded
+    python -m utils.tracing database/traces/<traza>.json --formato chrome -o toggle.trace.json
+    python -m utils.tracing --ultima --formato colapsado
+"""
+
+import argparse
+import functools
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+VARIABLE_ENTORNO = "ATOMIC_TRACE"
+PARAMETRO_URL = "trace"
+DIRECTORIO = "database/traces"
+CLAVE_SESION = "_traza_pendiente"
+
+# Trazas que se conservan en el directorio (se borran las más antiguas)
+MAX_TRAZAS = 50
+
+
+class Traza:
+    """
+    Spans de una interacción. Cada span guarda id, padre, nombre, inicio y
+    duración (µs desde el inicio de la traza), atributos y las llamadas a la
+    base hechas dentro de él (db_llamadas, db_ms: solo las externas, no las
+    que un método de DatabaseManager hace a otro)
+    """
+
+    def __init__(self, nombre: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.creada_en = datetime.now()
+        self._origen = time.perf_counter_ns()
+        self.spans: List[Dict] = []
+        self._pila: List[Dict] = []
+        self.raiz = self.abrir(nombre)
+
+    def _ahora_us(self) -> float:
+        return (time.perf_counter_ns() - self._origen) / 1000
+
+    def abrir(self, nombre: str, **atributos) -> Dict:
+        span = {
+            'id': len(self.spans), 'padre': self._pila[-1]['id'] if self._pila else None,
+            'nombre': nombre, 'inicio_us': self._ahora_us(), 'dur_us': None,
+            'hilo': threading.get_ident(), 'atributos': atributos, 'db_llamadas': 0, 'db_ms': 0.0
+        }
+        self.spans.append(span)
+        self._pila.append(span)
+        return span
+
+    def cerrar(self, span: Dict, db: bool = False):
+        """Cierra el span (y los que quedaron abiertos dentro); `db` lo atribuye a sus ancestros"""
+        if span['dur_us'] is not None:
+            # Ya cerrado por cerrar_hasta_raiz antes de st.rerun()
+            return
+        while self._pila:
+            abierto = self._pila.pop()
+            abierto['dur_us'] = self._ahora_us() - abierto['inicio_us']
+            if abierto is span:
+                break
+        if db and not any(s['atributos'].get('db') for s in self._pila):
+            for ancestro in self._pila:
+                ancestro['db_llamadas'] += 1
+                ancestro['db_ms'] += span['dur_us'] / 1000
+
+    def agregar(self, nombre: str, inicio_us: float, fin_us: float, **atributos):
+        """Span ya terminado (por ejemplo el reinicio entre dos reruns)"""
+        self.spans.append({
+            'id': len(self.spans), 'padre': self._pila[-1]['id'] if self._pila else None,
+            'nombre': nombre, 'inicio_us': inicio_us, 'dur_us': fin_us - inicio_us,
+            'hilo': threading.get_ident(), 'atributos': atributos, 'db_llamadas': 0, 'db_ms': 0.0
+        })
+
+    def cerrar_hasta_raiz(self):
+        while len(self._pila) > 1:
+            self.cerrar(self._pila[-1])
+
+    def terminar(self):
+        if self._pila:
+            self.cerrar(self.raiz)
+
+    def a_dict(self) -> Dict:
+        return {'id': self.id, 'creada_en': self.creada_en.isoformat(timespec='milliseconds'),
+                'spans': self.spans}
+
+    def guardar(self, directorio: str = DIRECTORIO) -> Optional[str]:
+        """Escribe la traza y recorta el directorio a MAX_TRAZAS; retorna la ruta"""
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            ruta = os.path.join(directorio, f"traza_{self.creada_en:%Y%m%d_%H%M%S}_{self.id}.json")
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump(self.a_dict(), f, ensure_ascii=False)
+            for vieja in sorted(glob.glob(os.path.join(directorio, "traza_*.json")))[:-MAX_TRAZAS]:
+                os.remove(vieja)
+            return ruta
+        except OSError as e:
+            print(f"Error guardando la traza {self.id}: {e}")
+            return None
+
+
+_actual: ContextVar[Optional[Traza]] = ContextVar("traza", default=None)
+
+
+def habilitado(query_params=None) -> bool:
+    """Las trazas se activan con la variable de entorno o con el parámetro ?trace=1"""
+    if os.environ.get(VARIABLE_ENTORNO, "").lower() in ("1", "true", "si", "sí"):
+        return True
+    return query_params is not None and str(query_params.get(PARAMETRO_URL, "")) in ("1", "true")
+
+
+def actual() -> Optional[Traza]:
+    return _actual.get()
+
+
+@contextmanager
+def span(nombre: str, **atributos):
+    """Span alrededor de un bloque; no hace nada si el hilo no tiene una traza abierta"""
+    traza = _actual.get()
+    if traza is None:
+        yield None
+        return
+    abierto = traza.abrir(nombre, **atributos)
+    try:
+        yield abierto
+    finally:
+        traza.cerrar(abierto)
+
+
+# ========================
+# CICLO DE VIDA EN STREAMLIT
+# ========================
+
+def iniciar_rerun(activo: bool, estado) -> Optional[Traza]:
+    """
+    Al principio del script: retoma la traza que dejó un toggle en
+    `estado` (st.session_state) o abre una nueva para este rerun
+    """
+    pendiente = estado.pop(CLAVE_SESION, None) if activo else None
+    if pendiente is not None:
+        traza, pausa_us = pendiente
+        _actual.set(traza)
+        traza.agregar("st.rerun", pausa_us, traza._ahora_us())
+        traza.abrir("rerun 2")
+        return traza
+    traza = Traza("interaccion") if activo else None
+    if traza is not None:
+        traza.abrir("rerun 1")
+    _actual.set(traza)
+    return traza
+
+
+def continuar_en_siguiente_rerun(estado):
+    """
+    Antes de st.rerun(): cierra los spans del rerun interrumpido y deja la
+    traza en la sesión para que el rerun siguiente la complete
+    """
+    traza = _actual.get()
+    if traza is None:
+        return
+    traza.cerrar_hasta_raiz()
+    estado[CLAVE_SESION] = (traza, traza._ahora_us())
+    _actual.set(None)
+
+
+def terminar_rerun(directorio: str = DIRECTORIO) -> Optional[str]:
+    """Al final del script: cierra y guarda la traza del rerun"""
+    traza = _actual.get()
+    if traza is None:
+        return None
+    _actual.set(None)
+    traza.terminar()
+    return traza.guardar(directorio)
+
+
+# ========================
+# INSTRUMENTACIÓN
+# ========================
+
+def _envolver(nombre: str, funcion: Callable, db: bool = False) -> Callable:
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        traza = _actual.get()
+        if traza is None:
+            return funcion(*args, **kwargs)
+        abierto = traza.abrir(nombre, db=True) if db else traza.abrir(nombre)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            traza.cerrar(abierto, db=db)
+    envoltura._trazada = True
+    return envoltura
+
+
+def instrumentar_namespace(namespace: Dict, nombres: Iterable[str]):
+    """Reemplaza funciones de los globals del script por versiones con span (solo este rerun)"""
+    for nombre in nombres:
+        if not getattr(namespace[nombre], '_trazada', False):
+            namespace[nombre] = _envolver(nombre, namespace[nombre])
+
+
+def instrumentar_clase(clase: type, privados: bool = False, db: bool = False):
+    """
+    Envuelve (una sola vez) los métodos de la clase con spans `Clase.metodo`;
+    con `privados` también los que empiezan con _ (los pasos internos de
+    marcar_habito). `db` marca sus spans como llamadas a la base.
+    """
+    marca = '_trazas_instrumentada'
+    if clase.__dict__.get(marca):
+        return
+    for nombre, atributo in list(vars(clase).items()):
+        if nombre.startswith('__') or (nombre.startswith('_') and not privados):
+            continue
+        etiqueta = f"{clase.__name__}.{nombre}"
+        if isinstance(atributo, staticmethod):
+            setattr(clase, nombre, staticmethod(_envolver(etiqueta, atributo.__func__, db)))
+        elif inspect.isfunction(atributo):
+            setattr(clase, nombre, _envolver(etiqueta, atributo, db))
+    setattr(clase, marca, True)
+
+
+# ========================
+# EXPORTACIÓN
+# ========================
+
+def a_pilas_colapsadas(spans: List[Dict]) -> str:
+    """
+    Formato de flamegraph.pl: una línea `raiz;hijo;nieto valor` por pila,
+    con el tiempo propio del span (sin sus hijos) en microsegundos
+    """
+    por_id = {s['id']: s for s in spans}
+    hijos: Dict[int, float] = {}
+    for s in spans:
+        if s['padre'] is not None:
+            hijos[s['padre']] = hijos.get(s['padre'], 0.0) + (s['dur_us'] or 0.0)
+
+    pilas: Dict[str, float] = {}
+    for s in spans:
+        nombres, actual = [], s
+        while actual is not None:
+            nombres.append(actual['nombre'].replace(";", ":").replace(" ", "_"))
+            actual = por_id.get(actual['padre'])
+        propio = max(0.0, (s['dur_us'] or 0.0) - hijos.get(s['id'], 0.0))
+        pila = ";".join(reversed(nombres))
+        pilas[pila] = pilas.get(pila, 0.0) + propio
+    return "\n".join(f"{pila} {round(valor)}" for pila, valor in pilas.items() if round(valor) > 0) + "\n"
+
+
+def a_chrome_trace(traza: Dict) -> Dict:
+    """Eventos completos (ph=X) del formato Trace Event de Chrome, en microsegundos"""
+    eventos = [
+        {
+            'name': s['nombre'], 'cat': 'db' if s['atributos'].get('db') else 'app', 'ph': 'X',
+            'ts': s['inicio_us'], 'dur': s['dur_us'] or 0.0, 'pid': 1, 'tid': 1,
+            'args': {**s['atributos'], 'hilo': s['hilo'], 'db_llamadas': s['db_llamadas'],
+                     'db_ms': round(s['db_ms'], 3)}
+        }
+        for s in traza['spans']
+    ]
+    return {'traceEvents': eventos, 'displayTimeUnit': 'ms', 'otherData': {'traza': traza['id']}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traza", nargs="?", help="Archivo JSON de la traza")
+    parser.add_argument("--ultima", action="store_true", help=f"Usar la traza más reciente de {DIRECTORIO}")
+    parser.add_argument("--formato", choices=("colapsado", "chrome"), default="colapsado")
+    parser.add_argument("-o", "--salida", default=None, help="Archivo de salida (default: stdout)")
+    args = parser.parse_args()
+
+    ruta = args.traza
+    if args.ultima:
+        trazas = sorted(glob.glob(os.path.join(DIRECTORIO, "traza_*.json")))
+        if not trazas:
+            parser.error(f"No hay trazas en {DIRECTORIO}")
+        ruta = trazas[-1]
+    if not ruta:
+        parser.error("Indicar una traza o --ultima")
+
+    with open(ruta, "r", encoding="utf-8") as f:
+        traza = json.load(f)
+    if args.formato == "colapsado":
+        texto = a_pilas_colapsadas(traza['spans'])
+    else:
+        texto = json.dumps(a_chrome_trace(traza))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto, end="")
+
+
+if __name__ == "__main__":
+    main()